@@ -86,3 +86,41 @@ def _chained(f):
         return self
 
     return wrapper
+
+
+def _lazy_container(name, factory):
+    """Internal function to define an attribute holding a container, such as
+    the profiles of a job, that is only created when the attribute is first
+    used. The container is stored in the attribute (or slot) :code:`name`,
+    which must be initialized to None.
+
+    .. code-block:: python
+
+        class Job:
+            __slots__ = ("_metadata",)
+
+            metadata = _lazy_container("_metadata", dict)
+
+            def __init__(self):
+                self._metadata = None
+
+    :param name: name of the attribute the container is stored in
+    :type name: str
+    :param factory: callable returning a new empty container
+    :type factory: Callable
+    :return: a property creating the container on first access
+    :rtype: property
+    """
+
+    def getter(self):
+        value = getattr(self, name)
+        if value is None:
+            value = factory()
+            setattr(self, name, value)
+
+        return value
+
+    def setter(self, value):
+        setattr(self, name, value)
+
+    return property(getter, setter)
@@ -10,6 +10,8 @@ from ._utils import _chained, _get_enum_str
 class MetadataMixin:
     """Derived class can have metadata assigned to it as key value pairs."""
 
+    __slots__ = ()
+
     @_chained
     def add_metadata(self, *args: Dict[str, Union[str, int, float, bool]], **kwargs):
         """
@@ -59,6 +61,8 @@ class HookMixin:
     specified by :py:class:`~Pegasus.api.mixins.EventType`, takes place.
     """
 
+    __slots__ = ()
+
     @_chained
     def add_shell_hook(self, event_type: EventType, cmd: str):
         """
@@ -224,6 +228,8 @@ def to_mb(value: str) -> int:
 
 
 class ProfileMixin:
+    __slots__ = ()
+
     @_chained
     def add_profiles(
         self,
@@ -76,6 +76,14 @@ class Properties:
         "pegasus.monitord.stdout.disable.parsing",
         "pegasus.monitord.encoding",
         "pegasus.monitord.arguments",
+        "pegasus.monitord.db.flush.mode",
+        "pegasus.monitord.db.cache.size",
+        "pegasus.monitord.db.queue.size",
+        "pegasus.monitord.parser.workers",
+        "pegasus.monitord.parser.pool",
+        "pegasus.monitord.events.buffer.size",
+        "pegasus.monitord.events.framing",
+        "pegasus.monitord.inotify",
         "pegasus.clusterer.job.aggregator",
         "pegasus.clusterer.job.aggregator.seqexec.log",
         "pegasus.clusterer.job.aggregator.seqexec.firstjobfail",
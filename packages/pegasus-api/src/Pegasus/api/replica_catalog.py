@@ -1,8 +1,10 @@
+import re
+import sys
 from collections import OrderedDict
 from pathlib import Path
-from typing import Dict, Optional, Set, Union
+from typing import Dict, List, Optional, Set, Tuple, Union
 
-from ._utils import _chained
+from ._utils import _chained, _lazy_container
 from .errors import DuplicateError
 from .mixins import MetadataMixin
 from .writable import Writable, _filter_out_nones
@@ -46,6 +48,10 @@ class File(MetadataMixin):
 
     """
 
+    __slots__ = ("lfn", "size", "_metadata")
+
+    metadata = _lazy_container("_metadata", dict)
+
     def __init__(self, lfn: str, size: Optional[int] = None):
         """
         :param lfn: a unique logical filename
@@ -58,8 +64,11 @@ class File(MetadataMixin):
                 "invalid lfn: {lfn}; lfn must be of type str".format(lfn=lfn)
             )
 
-        self.metadata = dict()
-        self.lfn = lfn
+        self._metadata = None
+
+        # the same lfn is usually given to several File objects, e.g. for the
+        # output of a job and for the input of the jobs that read it
+        self.lfn = sys.intern(lfn) if type(lfn) is str else lfn
         self.size = size
         if size:
             self.metadata["size"] = size
@@ -82,7 +91,7 @@ class File(MetadataMixin):
         return _filter_out_nones(
             {
                 "lfn": self.lfn,
-                "metadata": self.metadata if len(self.metadata) > 0 else None,
+                "metadata": self._metadata if self._metadata else None,
                 "size": self.size,
             }
         )
@@ -136,12 +145,20 @@ class ReplicaCatalog(Writable):
 
     _SUPPORTED_CHECKSUMS = {"sha256"}
 
+    # [0] in the pfn of a regex entry is replaced by the lfn matched, and [n]
+    # by the n-th group of the pattern
+    _PFN_GROUP = re.compile(r"\[(\d+)\]")
+
     def __init__(self):
         # Using key = (<lfn or pattern>, <is_regex>) to preserve insertion
         # order of entries while distinguishing between regex and
         # non regex entries
         self.entries = OrderedDict()
 
+        # compiled patterns of the regex entries, in insertion order, created
+        # on the first lookup after a regex entry is added
+        self._patterns = None
+
     @_chained
     def add_regex_replica(
         self,
@@ -207,6 +224,7 @@ class ReplicaCatalog(Writable):
         self.entries[(pattern, True)] = _ReplicaCatalogEntry(
             lfn=pattern, pfns={_PFN(site, pfn)}, metadata=metadata, regex=True
         )
+        self._patterns = None
 
     @_chained
     def add_replica(
@@ -277,14 +295,7 @@ class ReplicaCatalog(Writable):
             lfn = lfn.lfn
 
         # ensure supported checksum type given
-        if len(checksum) > 0:
-            for checksum_type in checksum:
-                if checksum_type.lower() not in ReplicaCatalog._SUPPORTED_CHECKSUMS:
-                    raise ValueError(
-                        "Invalid checksum: {}, supported checksum types are: {}".format(
-                            checksum_type, ReplicaCatalog._SUPPORTED_CHECKSUMS
-                        )
-                    )
+        ReplicaCatalog._check_checksum(checksum)
 
         # if an entry with the given lfn already exists, update it
         # else create and add a new one
@@ -301,6 +312,108 @@ class ReplicaCatalog(Writable):
                 regex=False,
             )
 
+    @staticmethod
+    def _check_checksum(checksum: Dict[str, str]):
+        """Ensure only supported checksum types are given
+
+        :param checksum: checksums by type
+        :type checksum: Dict[str, str]
+        :raises ValueError: an unsupported checksum type was given
+        """
+        for checksum_type in checksum:
+            if checksum_type.lower() not in ReplicaCatalog._SUPPORTED_CHECKSUMS:
+                raise ValueError(
+                    "Invalid checksum: {}, supported checksum types are: {}".format(
+                        checksum_type, ReplicaCatalog._SUPPORTED_CHECKSUMS
+                    )
+                )
+
+    def lookup(
+        self, lfn: Union[str, File], site: Optional[str] = None
+    ) -> List[Tuple[str, str]]:
+        r"""
+        lookup(self, lfn: Union[str, File], site: Optional[str] = None)
+        Get the replicas of a file. The entry for the lfn is used if there
+        is one, else the first regex entry, in the order they were added,
+        whose pattern matches the whole lfn.
+
+            .. code-block:: python
+
+                # Example
+                rc.add_replica("local", "f.a", "/Volumes/data/input/f.a")
+                rc.add_regex_replica("local", "alpha\.(csv|txt|xml)", "/Volumes/data/input/[1]/[0]")
+
+                rc.lookup("f.a")  # [("local", "/Volumes/data/input/f.a")]
+                rc.lookup("alpha.csv")  # [("local", "/Volumes/data/input/csv/alpha.csv")]
+
+        Lookups of lfns with an entry are a dict lookup, however large the
+        catalog is, and only the regex entries are evaluated otherwise.
+
+        :param lfn: logical file name
+        :type lfn: Union[str, File]
+        :param site: only get the replicas at this site, ignoring the entries without any, defaults to None
+        :type site: Optional[str]
+        :raises ValueError: the pattern of a regex entry is not a valid regular expression
+        :return: the (site, pfn) of each replica, sorted, or an empty list if there are none
+        :rtype: List[Tuple[str, str]]
+        """
+        if isinstance(lfn, File):
+            lfn = lfn.lfn
+
+        entry = self.entries.get((lfn, False))
+        if entry is not None:
+            return sorted(
+                (p.site, p.pfn) for p in entry.pfns if site is None or p.site == site
+            )
+
+        if self._patterns is None:
+            self._patterns = list()
+            for (pattern, regex), entry in self.entries.items():
+                if regex:
+                    try:
+                        self._patterns.append((re.compile(pattern), entry))
+                    except re.error as e:
+                        raise ValueError(
+                            "Invalid pattern: {}, {}".format(pattern, e)
+                        ) from e
+
+        for pattern, entry in self._patterns:
+            match = pattern.fullmatch(lfn)
+            if match is None:
+                continue
+
+            pfns = sorted(
+                (p.site, p.pfn) for p in entry.pfns if site is None or p.site == site
+            )
+            if pfns:
+                return [
+                    (
+                        pfn_site,
+                        ReplicaCatalog._PFN_GROUP.sub(
+                            lambda m: ReplicaCatalog._group(match, m), pfn
+                        ),
+                    )
+                    for pfn_site, pfn in pfns
+                ]
+
+        return []
+
+    @staticmethod
+    def _group(match, placeholder):
+        """Get the text matched by the group a [n] placeholder refers to
+
+        :param match: match of the lfn by the pattern of a regex entry
+        :type match: re.Match
+        :param placeholder: match of the placeholder in the pfn
+        :type placeholder: re.Match
+        :return: the group matched, or the placeholder if there is no such group
+        :rtype: str
+        """
+        try:
+            return match.group(int(placeholder.group(1))) or ""
+        except IndexError:
+            return placeholder.group(0)
+
     def __json__(self):
         return OrderedDict(
             [
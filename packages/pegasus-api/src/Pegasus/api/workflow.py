@@ -1,17 +1,16 @@
-import json
 from collections import OrderedDict, defaultdict
 from enum import Enum
-from functools import wraps
+from functools import partial, wraps
 from pathlib import Path
 from typing import Dict, List, Optional, TextIO, Union
 
-from ._utils import _chained, _get_enum_str
+from ._utils import _chained, _get_enum_str, _lazy_container
 from .errors import DuplicateError, NotFoundError, PegasusError
 from .mixins import HookMixin, MetadataMixin, ProfileMixin
 from .replica_catalog import File, ReplicaCatalog
 from .site_catalog import SiteCatalog
 from .transformation_catalog import Transformation, TransformationCatalog
-from .writable import Writable, _CustomEncoder, _filter_out_nones
+from .writable import Writable, _filter_out_nones
 
 from Pegasus.client._client import from_env
 
@@ -23,6 +22,27 @@ __all__ = ["AbstractJob", "Job", "SubWorkflow", "Workflow"]
 class AbstractJob(HookMixin, ProfileMixin, MetadataMixin):
     """An abstract representation of a workflow job"""
 
+    # workflows can have millions of jobs, so jobs have no __dict__, and the
+    # hooks, profiles and metadata, which most jobs do not have, are only
+    # created when they are used
+    __slots__ = (
+        "_id",
+        "node_label",
+        "args",
+        "_uses",
+        "stdout",
+        "stderr",
+        "stdin",
+        "_hooks",
+        "_profiles",
+        "_metadata",
+        "_workflow",
+    )
+
+    hooks = _lazy_container("_hooks", partial(defaultdict, list))
+    profiles = _lazy_container("_profiles", partial(defaultdict, dict))
+    metadata = _lazy_container("_metadata", dict)
+
     def __init__(self, _id: Optional[str] = None, node_label: Optional[str] = None):
         """
         :param _id: a unique id, if None is given then one will be assigned when this job is added to a :py:class:`~Pegasus.api.workflow.Workflow`, defaults to None
@@ -37,15 +57,31 @@ class AbstractJob(HookMixin, ProfileMixin, MetadataMixin):
         self._id = _id
         self.node_label = node_label
         self.args = list()
-        self.uses = set()
+        self._uses = set()
 
         self.stdout = None
         self.stderr = None
         self.stdin = None
 
-        self.hooks = defaultdict(list)
-        self.profiles = defaultdict(dict)
-        self.metadata = dict()
+        self._hooks = None
+        self._profiles = None
+        self._metadata = None
+
+        # workflow notified of the uses added to this job, to keep its
+        # dependency index up to date
+        self._workflow = None
+
+    @property
+    def uses(self):
+        return self._uses
+
+    @uses.setter
+    def uses(self, uses):
+        self._uses = uses
+
+        # the previous uses may have been indexed
+        if self._workflow is not None:
+            self._workflow._dependency_index = None
 
     @_chained
     def add_inputs(self, *input_files: File, bypass_staging: bool = False):
@@ -82,7 +118,10 @@ class AbstractJob(HookMixin, ProfileMixin, MetadataMixin):
                     )
                 )
 
-            self.uses.add(_input)
+            self._uses.add(_input)
+
+            if self._workflow is not None:
+                self._workflow._index_use(self, _input)
 
     def get_inputs(self):
         """Get this job's input :py:class:`~Pegasus.api.replica_catalog.File` s
@@ -131,7 +170,10 @@ class AbstractJob(HookMixin, ProfileMixin, MetadataMixin):
                     )
                 )
 
-            self.uses.add(output)
+            self._uses.add(output)
+
+            if self._workflow is not None:
+                self._workflow._index_use(self, output)
 
     def get_outputs(self):
         """Get this job's output :py:class:`~Pegasus.api.replica_catalog.File` objects
@@ -343,13 +385,13 @@ class AbstractJob(HookMixin, ProfileMixin, MetadataMixin):
                     arg.lfn if isinstance(arg, File) else arg for arg in self.args
                 ],
                 "uses": [use for use in self.uses],
-                "profiles": dict(self.profiles) if len(self.profiles) > 0 else None,
-                "metadata": self.metadata if len(self.metadata) > 0 else None,
+                "profiles": dict(self._profiles) if self._profiles else None,
+                "metadata": self._metadata if self._metadata else None,
                 "hooks": {
                     hook_name: [hook for hook in values]
-                    for hook_name, values in self.hooks.items()
+                    for hook_name, values in self._hooks.items()
                 }
-                if len(self.hooks) > 0
+                if self._hooks
                 else None,
             }
         )
@@ -378,6 +420,8 @@ class Job(AbstractJob):
 
     """
 
+    __slots__ = ("transformation", "namespace", "version")
+
     def __init__(
         self,
         transformation: Union[str, Transformation],
@@ -435,6 +479,8 @@ class SubWorkflow(AbstractJob):
     See :py:class:`~Pegasus.api.workflow.AbstractJob` for full list of available functions.
     """
 
+    __slots__ = ("type", "file")
+
     def __init__(
         self,
         file: Union[str, File],
@@ -485,6 +531,8 @@ class _LinkType(Enum):
 class _Use:
     """Internal class used to represent input and output files of a job"""
 
+    __slots__ = ("file", "_type", "stage_out", "register_replica", "bypass")
+
     def __init__(
         self,
         file,
@@ -531,7 +579,7 @@ class _Use:
         return _filter_out_nones(
             {
                 "lfn": self.file.lfn,
-                "metadata": self.file.metadata if len(self.file.metadata) > 0 else None,
+                "metadata": self.file._metadata if self.file._metadata else None,
                 "size": self.file.size,
                 "type": self._type,
                 "stageOut": self.stage_out,
@@ -541,9 +589,95 @@ class _Use:
         )
 
 
+class _DependencyIndex:
+    """Internal class used to index the jobs producing and consuming each file
+    of a workflow, so that dependencies can be inferred incrementally"""
+
+    __slots__ = ("producers", "consumers", "pending")
+
+    def __init__(self):
+        # lfn -> job producing the file; only a single job should produce it
+        self.producers = dict()
+
+        # lfn -> jobs consuming the file, by id(job), not yet made children of
+        # its producer; keyed so that jobs indexed again are not duplicated
+        self.consumers = defaultdict(dict)
+
+        # lfns with both a producer and consumers to link, in insertion order
+        self.pending = dict()
+
+    def add(self, job, lfn, link_type):
+        """Index a job using a file
+
+        :param job: job using the file
+        :type job: AbstractJob
+        :param lfn: lfn of the file
+        :type lfn: str
+        :param link_type: how the job uses the file, as a :py:class:`~Pegasus.api.workflow._LinkType` value
+        :type link_type: str
+        """
+        if link_type == _LinkType.INPUT.value:
+            self.consumers[lfn][id(job)] = job
+            if lfn in self.producers:
+                self.pending[lfn] = None
+        elif link_type == _LinkType.OUTPUT.value:
+            if lfn not in self.producers:
+                self.producers[lfn] = job
+                if lfn in self.consumers:
+                    self.pending[lfn] = None
+
+    def add_job(self, job):
+        """Index all the files used by a job
+
+        :param job: job to index
+        :type job: AbstractJob
+        """
+        if job.stdin:
+            self.add(job, job.stdin.lfn, _LinkType.INPUT.value)
+
+        if job.stdout:
+            self.add(job, job.stdout.lfn, _LinkType.OUTPUT.value)
+
+        if job.stderr:
+            self.add(job, job.stderr.lfn, _LinkType.OUTPUT.value)
+
+        for use in job.uses:
+            self.add(job, use.file.lfn, use._type)
+
+    def link(self, jobs, dependencies):
+        """Add the dependencies between the producer and the consumers of each
+        file indexed since the last call
+
+        :param jobs: jobs of the workflow, by id
+        :type jobs: dict
+        :param dependencies: dependencies of the workflow, by parent id
+        :type dependencies: dict
+        """
+        for lfn in self.pending:
+            parent = self.producers[lfn]
+            children_ids = {
+                child._id
+                for child in self.consumers.pop(lfn).values()
+                if jobs.get(child._id) is child
+            }
+
+            # jobs may have been removed from the workflow
+            if not children_ids or jobs.get(parent._id) is not parent:
+                continue
+
+            if parent._id not in dependencies:
+                dependencies[parent._id] = _JobDependency(parent._id, children_ids)
+            else:
+                dependencies[parent._id].children_ids.update(children_ids)
+
+        self.pending.clear()
+
+
 class _JobDependency:
     """Internal class used to represent a jobs dependencies within a workflow"""
 
+    __slots__ = ("parent_id", "children_ids")
+
     def __init__(self, parent_id, children_ids):
         self.parent_id = parent_id
         self.children_ids = children_ids
@@ -729,6 +863,14 @@ class Workflow(Writable, HookMixin, ProfileMixin, MetadataMixin):
         self.jobs = dict()
         self.dependencies = defaultdict(_JobDependency)
 
+        # files produced and consumed by the jobs, indexed as jobs and their
+        # uses are added, when dependencies are inferred
+        self._dependency_index = _DependencyIndex() if infer_dependencies else None
+
+        # jobs also added to another workflow, which is the one notified of
+        # their new uses, are indexed again each time dependencies are inferred
+        self._shared_jobs = list()
+
         self.site_catalog = None
         self.transformation_catalog = None
         self.replica_catalog = None
@@ -1106,6 +1248,26 @@ class Workflow(Writable, HookMixin, ProfileMixin, MetadataMixin):
 
             self.jobs[job._id] = job
 
+            if job._workflow is None:
+                job._workflow = self
+            elif job._workflow is not self:
+                self._shared_jobs.append(job)
+
+            if self._dependency_index is not None:
+                self._dependency_index.add_job(job)
+
+    def _index_use(self, job, use):
+        """Internal function called when a file is used by one of the jobs of
+        this workflow
+
+        :param job: the job using the file
+        :type job: AbstractJob
+        :param use: how the job uses the file
+        :type use: _Use
+        """
+        if self._dependency_index is not None:
+            self._dependency_index.add(job, use.file.lfn, use._type)
+
     def get_job(self, _id: str):
         """Retrieve the job with the given id
 
@@ -1303,78 +1465,20 @@ class Workflow(Writable, HookMixin, ProfileMixin, MetadataMixin):
     def _infer_dependencies(self):
         """Internal function for automatically computing dependencies based on
         Job input and output files. This is called when Workflow.infer_dependencies is
-        set to True.
+        set to True. Only the files used by jobs since the last call are linked,
+        using the index of the files produced and consumed by each job.
         """
 
         if self.infer_dependencies:
-            mapping = dict()
-
-            """
-            create a mapping:
-            {
-                <filename>: (set(), set())
-            }
-
-            where mapping[filename][0] are jobs that use this file as input
-            and mapping[filename][1] are jobs that use this file as output
-            """
-            for _id, job in self.jobs.items():
-                if job.stdin:
-                    if job.stdin.lfn not in mapping:
-                        mapping[job.stdin.lfn] = (set(), set())
-
-                    mapping[job.stdin.lfn][0].add(job)
-
-                if job.stdout:
-                    if job.stdout.lfn not in mapping:
-                        mapping[job.stdout.lfn] = (set(), set())
-
-                    mapping[job.stdout.lfn][1].add(job)
-
-                if job.stderr:
-                    if job.stderr.lfn not in mapping:
-                        mapping[job.stderr.lfn] = (set(), set())
-
-                    mapping[job.stderr.lfn][1].add(job)
-
-                """
-                for _input in job.inputs:
-                    if _input.file.lfn not in mapping:
-                        mapping[_input.file.lfn] = (set(), set())
-
-                    mapping[_input.file.lfn][0].add(job)
-
-                for output in job.outputs:
-                    if output.file.lfn not in mapping:
-                        mapping[output.file.lfn] = (set(), set())
-
-                    mapping[output.file.lfn][1].add(job)
-                """
-                for io in job.uses:
-                    if io.file.lfn not in mapping:
-                        mapping[io.file.lfn] = (set(), set())
-
-                    if io._type == _LinkType.INPUT.value:
-                        mapping[io.file.lfn][0].add(job)
-                    elif io._type == _LinkType.OUTPUT.value:
-                        mapping[io.file.lfn][1].add(job)
-
-            """
-            Go through the mapping and for each file add dependencies between the
-            job producing a file and the jobs consuming the file
-            """
-            for _, io in mapping.items():
-                inputs = io[0]
-
-                if len(io[1]) > 0:
-                    # only a single job should produce this file
-                    output = io[1].pop()
+            if self._dependency_index is None:
+                self._dependency_index = _DependencyIndex()
+                for _id, job in self.jobs.items():
+                    self._dependency_index.add_job(job)
+            else:
+                for job in self._shared_jobs:
+                    self._dependency_index.add_job(job)
 
-                    for _input in inputs:
-                        try:
-                            self.add_dependency(output, children=[_input])
-                        except DuplicateError:
-                            pass
+            self._dependency_index.link(self.jobs, self.dependencies)
 
     @_chained
     def write(self, file: Optional[Union[str, TextIO]] = None, _format: str = "yml"):
@@ -1422,17 +1526,17 @@ class Workflow(Writable, HookMixin, ProfileMixin, MetadataMixin):
         # are included in the Workflow which already contains 'pegasus'
         rc = None
         if self.replica_catalog is not None:
-            rc = json.loads(json.dumps(self.replica_catalog, cls=_CustomEncoder))
+            rc = self.replica_catalog.__json__()
             del rc["pegasus"]
 
         tc = None
         if self.transformation_catalog is not None:
-            tc = json.loads(json.dumps(self.transformation_catalog, cls=_CustomEncoder))
+            tc = self.transformation_catalog.__json__()
             del tc["pegasus"]
 
         sc = None
         if self.site_catalog is not None:
-            sc = json.loads(json.dumps(self.site_catalog, cls=_CustomEncoder))
+            sc = self.site_catalog.__json__()
             del sc["pegasus"]
 
         hooks = None
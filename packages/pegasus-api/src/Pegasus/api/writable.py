@@ -1,5 +1,6 @@
 import getpass
 import json
+import re
 from collections import OrderedDict
 from datetime import datetime
 from pathlib import Path
@@ -9,6 +10,15 @@ from Pegasus import yaml
 
 __all__ = ["Writable"]
 
+# Number of list items, e.g. jobs, converted and written at a time by the
+# streaming writers, which bounds the memory needed to write large documents
+_CHUNK_SIZE = 1000
+
+# Start of the lines that are not empty, after any of the yaml line breaks
+_YAML_LINE_START = re.compile(
+    r"(?:^|(?<=[\n\x85\u2028\u2029]))(?=[^\n\x85\u2028\u2029])"
+)
+
 
 class _CustomEncoder(json.JSONEncoder):
     def default(self, obj):
@@ -46,6 +56,134 @@ def _filter_out_nones(_dict):
     return OrderedDict([(k, v) for k, v in _dict.items() if v is not None])
 
 
+def _to_plain(obj):
+    """Helper function to convert an object into OrderedDicts, lists and scalars
+    by round tripping it through json, so that it is represented in yaml
+    exactly as if the whole document had been converted at once
+
+    :param obj: object to convert
+    :return: obj as OrderedDicts, lists and scalars
+    """
+    return json.loads(
+        json.dumps(obj, cls=_CustomEncoder), object_pairs_hook=OrderedDict
+    )
+
+
+def _is_streamable(value):
+    """Helper function to check whether a value can be written one list item,
+    or one mapping entry, at a time
+
+    :param value: value of a mapping entry
+    :return: whether value is a non empty list or a non empty dict with str keys
+    :rtype: bool
+    """
+    if isinstance(value, list):
+        return len(value) > 0
+
+    if isinstance(value, dict):
+        return len(value) > 0 and all(isinstance(k, str) for k in value)
+
+    return False
+
+
+def _dump_yaml(obj, indent):
+    """Helper function to dump obj as yaml, as it would be dumped when nested
+    indent spaces deep in a block mapping
+
+    :param obj: mapping or list to dump
+    :param indent: number of spaces the yaml is indented by
+    :type indent: int
+    :return: obj as yaml
+    :rtype: str
+    """
+    # the line width includes the indentation of nested blocks
+    text = yaml.dump(obj, allow_unicode=True, width=80 - indent)
+    if indent == 0:
+        return text
+
+    # the emitter only indents lines that are not empty
+    return _YAML_LINE_START.sub(" " * indent, text)
+
+
+def _write_yaml_mapping(file, mapping, indent=0):
+    """Helper function to write a mapping as a yaml block mapping, writing lists
+    in chunks of _CHUNK_SIZE items instead of converting the whole mapping
+
+    :param file: file object to write to
+    :type file: file
+    :param mapping: mapping to write
+    :type mapping: dict
+    :param indent: number of spaces the mapping is indented by, defaults to 0
+    :type indent: int, optional
+    """
+    for key, value in mapping.items():
+        if _is_streamable(value):
+            # "key: []" gives how the key itself is written
+            header = _dump_yaml(OrderedDict([(key, [])]), indent)
+            if header.endswith(" []\n") and header.count("\n") == 1:
+                file.write(header[:-4] + "\n")
+
+                if isinstance(value, list):
+                    # block sequences are not indented in block mappings
+                    for i in range(0, len(value), _CHUNK_SIZE):
+                        file.write(
+                            _dump_yaml(_to_plain(value[i : i + _CHUNK_SIZE]), indent)
+                        )
+                else:
+                    _write_yaml_mapping(file, value, indent + 2)
+
+                continue
+
+        file.write(_dump_yaml(_to_plain(OrderedDict([(key, value)])), indent))
+
+
+def _dump_json(obj, indent):
+    """Helper function to dump obj as json, as it would be dumped when nested
+    indent spaces deep
+
+    :param obj: object to dump
+    :param indent: number of spaces the json is indented by
+    :type indent: int
+    :return: obj as json
+    :rtype: str
+    """
+    text = json.dumps(obj, cls=_CustomEncoder, indent=4, ensure_ascii=False)
+    return text.replace("\n", "\n" + " " * indent)
+
+
+def _write_json_mapping(file, mapping, indent=0):
+    """Helper function to write a mapping as a json object, writing lists one
+    item at a time instead of encoding the whole mapping
+
+    :param file: file object to write to
+    :type file: file
+    :param mapping: mapping to write
+    :type mapping: dict
+    :param indent: number of spaces the mapping is indented by, defaults to 0
+    :type indent: int, optional
+    """
+    padding = " " * (indent + 4)
+    separator = "{\n"
+
+    for key, value in mapping.items():
+        file.write(separator + padding + _dump_json(key, 0) + ": ")
+        separator = ",\n"
+
+        if not _is_streamable(value):
+            file.write(_dump_json(value, indent + 4))
+        elif isinstance(value, list):
+            item_separator = "[\n"
+            for item in value:
+                file.write(item_separator + padding + "    ")
+                file.write(_dump_json(item, indent + 8))
+                item_separator = ",\n"
+            file.write("\n" + padding + "]")
+        else:
+            _write_json_mapping(file, value, indent + 4)
+
+    file.write("\n" + " " * indent + "}")
+
+
 class Writable:
     """Derived class can be serialized to a json or yaml file"""
 
@@ -81,20 +219,20 @@ class Writable:
             ]
         )
 
-        self_as_dict.update(
-            json.loads(
-                json.dumps(self, cls=_CustomEncoder), object_pairs_hook=OrderedDict
-            )
-        )
+        self_as_dict.update(self.__json__())
 
+        # the document is written one entry, or one chunk of list items, at
+        # a time so that large workflows are never held in memory as a whole
         if _format == "yml" or _format == "yaml":
-            # TODO: figure out how to get yaml.dump to recurse down into nested objects
-            # yaml.dump(_CustomEncoder().default(self), file, sort_keys=False)
-            yaml.dump(self_as_dict, file, allow_unicode=True)
-        else:
-            json.dump(
-                self_as_dict, file, cls=_CustomEncoder, indent=4, ensure_ascii=False
+            # file info is not converted, so its keys are sorted
+            file.write(
+                yaml.dump(
+                    {"x-pegasus": self_as_dict.pop("x-pegasus")}, allow_unicode=True
+                )
             )
+            _write_yaml_mapping(file, self_as_dict)
+        else:
+            _write_json_mapping(file, self_as_dict)
 
     def write(self, file: Optional[Union[str, TextIO]] = None, _format: str = "yml"):
         """Serialize this class as either yaml or json and write to the given
@@ -84,6 +84,16 @@ class TestFile:
     def test_repr(self):
         assert repr(File("a")) == "<File a>"
 
+    def test_lfn_interned(self):
+        assert File("f" + str(1)).lfn is File("f1").lfn
+
+    def test_lazy_metadata(self):
+        f = File("a")
+        assert f._metadata is None
+
+        f.add_metadata(key="value")
+        assert f.metadata == {"key": "value"}
+
     def test_tojson_with_metdata(self, convert_yaml_schemas_to_json, load_schema):
         result = File("lfn", size=2048).add_metadata(key="value").__json__()
         expected = {
@@ -300,6 +310,47 @@ class TestReplicaCatalog:
             "regex": True,
         }
 
+    @pytest.mark.parametrize(
+        "lfn, site, expected",
+        [
+            ("f.a", None, [("condorpool", "/f.a"), ("local", "/f.a")]),
+            (File("f.a"), "local", [("local", "/f.a")]),
+            ("f.b", None, [("local", "/f.b")]),
+            ("alpha.csv", None, [("local", "/data/csv/alpha.csv")]),
+            ("alpha.csv", "condorpool", [("condorpool", "/all/alpha.csv")]),
+            ("alpha.csvx", None, [("condorpool", "/all/alpha.csvx")]),
+            ("beta.txt", "local", []),
+        ],
+    )
+    def test_lookup(self, lfn, site, expected):
+        rc = (
+            ReplicaCatalog()
+            .add_replica("local", "f.a", "/f.a")
+            .add_replica("condorpool", "f.a", "/f.a")
+            .add_regex_replica("local", r"f\.(a|b)", "/[1]/[0]")
+            .add_replica("local", "f.b", "/f.b")
+            .add_regex_replica("local", r"alpha\.(csv|txt)", "/data/[1]/[0]")
+            .add_regex_replica("condorpool", ".*", "/all/[0]")
+        )
+
+        assert rc.lookup(lfn, site=site) == expected
+
+    def test_lookup_regex_added_after_lookup(self):
+        rc = ReplicaCatalog().add_regex_replica("local", "f.*", "/a/[0]")
+        assert rc.lookup("g.txt") == []
+
+        rc.add_regex_replica("local", "g(.*)", "/b/[1]/[2]")
+        assert rc.lookup("f.txt") == [("local", "/a/f.txt")]
+        assert rc.lookup("g.txt") == [("local", "/b/.txt/[2]")]
+
+    def test_lookup_invalid_pattern(self):
+        rc = ReplicaCatalog().add_regex_replica("local", "*.txt", "/path")
+
+        with pytest.raises(ValueError) as e:
+            rc.lookup("f.txt")
+
+        assert "Invalid pattern: *.txt" in str(e)
+
     def test_tojson(self, convert_yaml_schemas_to_json, load_schema):
         rc = ReplicaCatalog()
         rc.add_replica(
@@ -439,6 +439,26 @@ class TestJob:
         assert j.get_inputs() == {File("if"), File("stdin")}
         assert j.get_outputs() == {File("of"), File("stdout"), File("stderr")}
 
+    def test_lazy_containers(self):
+        j = Job("t1").add_args("-n5")
+
+        assert not hasattr(j, "__dict__")
+        assert j._hooks is None and j._profiles is None and j._metadata is None
+        assert "profiles" not in j.__json__()
+        assert j._profiles is None
+
+        j.add_env(JAVA_HOME="/opt/java")
+        j.profiles["condor"]["universe"] = "vanilla"
+        j.metadata = {"key": "value"}
+
+        assert j.profiles == {
+            "env": {"JAVA_HOME": "/opt/java"},
+            "condor": {"universe": "vanilla"},
+        }
+        assert j.hooks == {}
+        assert j.__json__()["metadata"] == {"key": "value"}
+        assert "hooks" not in j.__json__()
+
     def test_tojson_no_mixins(self):
         j = Job("t1", namespace="ns", node_label="label", _id="id", version="1")
         j.set_stdin("stdin")
@@ -998,6 +1018,71 @@ class TestWorkflow:
         assert wf.dependencies["j1"] == _JobDependency("j1", {"j2"})
         assert wf.dependencies["j2"] == _JobDependency("j2", {"j3"})
 
+    def test_infer_dependencies_incrementally(self):
+        wf = Workflow("wf")
+        j1 = Job("t1", _id="j1").add_outputs(File("f1"))
+        j2 = Job("t1", _id="j2").add_inputs(File("f1"))
+        wf.add_jobs(j1, j2)
+        wf._infer_dependencies()
+
+        assert wf.dependencies["j1"] == _JobDependency("j1", {"j2"})
+        assert not wf._dependency_index.pending
+
+        # uses added to jobs already in the workflow, consumer before producer
+        j3 = Job("t1", _id="j3").add_inputs(File("f2"))
+        wf.add_jobs(j3)
+        j2.add_outputs(File("f2"))
+        j3.add_inputs(File("f1"))
+        wf._infer_dependencies()
+
+        assert wf.dependencies["j1"] == _JobDependency("j1", {"j2", "j3"})
+        assert wf.dependencies["j2"] == _JobDependency("j2", {"j3"})
+
+    def test_infer_dependencies_uses_replaced(self):
+        wf = Workflow("wf")
+        j1 = Job("t1", _id="j1").add_outputs(File("f1"))
+        j2 = Job("t1", _id="j2")
+        wf.add_jobs(j1, j2)
+        wf._infer_dependencies()
+
+        j2.uses = {_Use(File("f1"), _LinkType.INPUT)}
+        wf._infer_dependencies()
+
+        assert wf.dependencies["j1"] == _JobDependency("j1", {"j2"})
+
+    def test_infer_dependencies_job_in_two_workflows(self):
+        wf1 = Workflow("wf1")
+        wf2 = Workflow("wf2")
+        j1 = Job("t1", _id="j1").add_outputs(File("f1"))
+        j2 = Job("t1", _id="j2")
+        wf1.add_jobs(j1, j2)
+        wf2.add_jobs(j1, j2)
+
+        j2.add_inputs(File("f1"))
+        wf1._infer_dependencies()
+        wf2._infer_dependencies()
+
+        assert wf1.dependencies["j1"] == _JobDependency("j1", {"j2"})
+        assert wf2.dependencies["j1"] == _JobDependency("j1", {"j2"})
+
+    def test_infer_dependencies_job_in_two_workflows_repeatedly(self):
+        wf1 = Workflow("wf1")
+        wf2 = Workflow("wf2")
+        j1 = Job("t1", _id="j1").add_inputs(File("f0")).add_outputs(File("f1"))
+        j2 = Job("t1", _id="j2").add_inputs(File("f1"))
+        wf1.add_jobs(j1, j2)
+        wf2.add_jobs(j1, j2)
+
+        for _ in range(3):
+            wf2._infer_dependencies()
+
+        # the shared jobs are indexed again, but not duplicated
+        assert {
+            lfn: list(jobs.values())
+            for lfn, jobs in wf2._dependency_index.consumers.items()
+        } == {"f0": [j1]}
+        assert wf2.dependencies["j1"] == _JobDependency("j1", {"j2"})
+
     def test_tojson(self, convert_yaml_schemas_to_json, load_schema, wf, expected_json):
         result = json.loads(json.dumps(wf, cls=_CustomEncoder))
 
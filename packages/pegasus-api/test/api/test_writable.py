@@ -1,12 +1,15 @@
 import getpass
 import json
 import os
+from collections import OrderedDict
 from io import StringIO
 from tempfile import TemporaryFile
 
 import pytest
 import yaml
 
+from Pegasus import yaml as pegasus_yaml
+from Pegasus.api import writable
 from Pegasus.api.writable import Writable, _CustomEncoder, _filter_out_nones
 
 
@@ -187,6 +190,56 @@ class TestWritable:
 
         assert "invalid _ext: bad_format" in str(e)
 
+    @pytest.mark.parametrize("_format", ["yml", "json"])
+    def test_internal_write_matches_whole_document(
+        self, writable_obj, mocker, monkeypatch, _format
+    ):
+        """Testing Writable._write writes lists in chunks, exactly as the whole
+        document would be written"""
+        monkeypatch.setattr(writable, "_CHUNK_SIZE", 2)
+        mocker.patch("getpass.getuser", return_value="user")
+
+        writable_obj.items.extend(["word " * 30, {"a": "1\n\n2", 3: [1.5, None]}])
+        writable_obj.catalog = OrderedDict(
+            [("empty", []), ("items", writable_obj.items), ("nested", {"a": "b"})]
+        )
+        writable_obj.__json__ = lambda: {
+            "name": writable_obj.name,
+            "items": writable_obj.items,
+            "catalog": writable_obj.catalog,
+            "empty": {},
+        }
+
+        with StringIO() as f:
+            writable_obj._write(f, _format)
+            result = f.getvalue()
+
+        document = OrderedDict(
+            [
+                (
+                    "x-pegasus",
+                    {
+                        "createdBy": "user",
+                        "createdOn": json.loads(result)["x-pegasus"]["createdOn"]
+                        if _format == "json"
+                        else yaml.safe_load(result)["x-pegasus"]["createdOn"],
+                        "apiLang": "python",
+                    },
+                )
+            ]
+        )
+        document.update(
+            json.loads(
+                json.dumps(writable_obj, cls=_CustomEncoder),
+                object_pairs_hook=OrderedDict,
+            )
+        )
+
+        if _format == "yml":
+            assert result == pegasus_yaml.dumps(document, allow_unicode=True)
+        else:
+            assert result == json.dumps(document, indent=4, ensure_ascii=False)
+
 
 def test_filter_out_nones():
     d = {"a": 1, "b": None}
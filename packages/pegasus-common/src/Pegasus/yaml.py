@@ -7,10 +7,24 @@ import io
 from collections import OrderedDict
 from functools import partial
 from pathlib import Path
-from typing import Dict
+from typing import Any, Container, Dict, Iterator, Tuple
 
 import yaml as _yaml
 import yaml.constructor
+from yaml.composer import ComposerError
+from yaml.constructor import ConstructorError
+from yaml.events import (
+    AliasEvent,
+    DocumentStartEvent,
+    MappingEndEvent,
+    MappingStartEvent,
+    ScalarEvent,
+    SequenceEndEvent,
+    SequenceStartEvent,
+    StreamEndEvent,
+    StreamStartEvent,
+)
+from yaml.nodes import ScalarNode
 
 try:
     from yaml import CSafeDumper as _Dumper
@@ -23,6 +37,7 @@ __all__ = (
     "load",
     "loads",
     "load_all",
+    "iter_items",
     "dump",
     "dumps",
     "dump_all",
@@ -108,6 +123,229 @@ def loads(s: str, *args, **kwargs) -> Dict:
 load_all = partial(_yaml.load_all, Loader=_Loader)
 
 
+class _EventConstructor:
+    """
+    Construct Python objects directly from the events of a YAML parser.
+
+    Composing nodes, and resolving the tag of each plain scalar in Python,
+    takes most of the time :func:`load` spends on large documents, so the
+    nodes are skipped and the plain scalars, which repeat a lot, are resolved
+    and constructed only once.
+    """
+
+    MERGE_KEY = "<<"
+
+    STR_TAG = "tag:yaml.org,2002:str"
+
+    def __init__(self, loader):
+        self.loader = loader
+        self.anchors = {}
+        self.scalars = {}
+
+    def construct(self, event):
+        """Construct the object starting with ``event``."""
+        event_type = type(event)
+
+        if event_type is ScalarEvent:
+            if event.tag is None:
+                if not event.implicit[0]:
+                    value = event.value
+                else:
+                    try:
+                        value = self.scalars[event.value]
+                    except KeyError:
+                        value = self.scalars[event.value] = self.construct_scalar(event)
+            else:
+                value = self.construct_scalar(event)
+
+            if event.anchor is not None:
+                self.anchors[event.anchor] = value
+
+            return value
+
+        elif event_type is MappingStartEvent:
+            return self.construct_mapping(event)
+
+        elif event_type is SequenceStartEvent:
+            value = []
+            if event.anchor is not None:
+                self.anchors[event.anchor] = value
+
+            get_event = self.loader.get_event
+            item = get_event()
+            while type(item) is not SequenceEndEvent:
+                value.append(self.construct(item))
+                item = get_event()
+
+            return value
+
+        elif event_type is AliasEvent:
+            try:
+                return self.anchors[event.anchor]
+            except KeyError:
+                raise ComposerError(
+                    None,
+                    None,
+                    "found undefined alias %r" % event.anchor,
+                    event.start_mark,
+                )
+
+        raise ComposerError(
+            None, None, "unexpected %s" % event_type.__name__, event.start_mark
+        )
+
+    def construct_scalar(self, event):
+        """Construct a scalar as :func:`load` does."""
+        tag = event.tag
+        if tag is None or tag == "!":
+            tag = self.loader.resolve(ScalarNode, event.value, event.implicit)
+
+        if tag == self.STR_TAG:
+            return event.value
+
+        return self.loader.construct_document(
+            ScalarNode(tag, event.value, event.start_mark, event.end_mark, event.style)
+        )
+
+    def construct_mapping(self, event):
+        """Construct a mapping, with its merge keys, as :func:`load` does."""
+        value = {}
+        if event.anchor is not None:
+            self.anchors[event.anchor] = value
+
+        # pairs of the merged mappings, the last merged taking precedence
+        merged = {}
+        get_event = self.loader.get_event
+        key_event = get_event()
+        while type(key_event) is not MappingEndEvent:
+            if (
+                type(key_event) is ScalarEvent
+                and key_event.tag is None
+                and key_event.implicit[0]
+                and key_event.value == self.MERGE_KEY
+            ):
+                merge = self.construct(get_event())
+                for m in reversed(merge) if isinstance(merge, list) else [merge]:
+                    if not isinstance(m, dict):
+                        raise ConstructorError(
+                            "while constructing a mapping",
+                            event.start_mark,
+                            "expected a mapping for merging, but found %s"
+                            % type(m).__name__,
+                            key_event.start_mark,
+                        )
+                    merged.update(m)
+            else:
+                key = self.construct(key_event)
+                try:
+                    value[key] = self.construct(get_event())
+                except TypeError:
+                    raise ConstructorError(
+                        "while constructing a mapping",
+                        event.start_mark,
+                        "found unhashable key",
+                        key_event.start_mark,
+                    )
+
+            key_event = get_event()
+
+        for k, v in merged.items():
+            value.setdefault(k, v)
+
+        return value
+
+
+def iter_items(stream, lazy: Container = frozenset()) -> Iterator[Tuple[Any, Any]]:
+    """
+    Deserialize ``stream`` (a ``str``, ``bytes`` or a ``.read()``-supporting file-like object containing a YAML document whose root is a mapping) to its ``(key, value)`` pairs, yielded as they are parsed.
+
+    Values of the keys in ``lazy`` that are sequences are yielded as iterators
+    over their items, constructed one at a time, so that long sequences never
+    have to be held in memory whole. Items not consumed before the next pair is
+    requested are skipped.
+
+    Values are constructed as :func:`load` constructs them.
+
+    :param stream: YAML document to deserialize
+    :type stream: Union[str, bytes, TextIO]
+    :param lazy: keys whose sequence values are yielded as iterators, defaults to none
+    :type lazy: Container
+    :raises yaml.YAMLError: the document is invalid or its root is not a mapping
+    :return: the pairs of the root mapping, in document order
+    :rtype: Iterator[Tuple[Any, Any]]
+    """
+    loader = _Loader(stream)
+    try:
+        constructor = _EventConstructor(loader)
+
+        for expected in (StreamStartEvent, DocumentStartEvent):
+            event = loader.get_event()
+            if type(event) is not expected:
+                raise ConstructorError(
+                    None, None, "expected a mapping", event.start_mark
+                )
+
+        event = loader.get_event()
+        if type(event) is not MappingStartEvent:
+            raise ConstructorError(
+                None,
+                None,
+                "expected a mapping, but found %s" % type(event).__name__,
+                event.start_mark,
+            )
+
+        key_event = loader.get_event()
+        while type(key_event) is not MappingEndEvent:
+            key = constructor.construct(key_event)
+            try:
+                is_lazy = key in lazy
+            except TypeError:
+                raise ConstructorError(
+                    "while constructing a mapping",
+                    None,
+                    "found unhashable key",
+                    key_event.start_mark,
+                )
+
+            event = loader.get_event()
+            if is_lazy and type(event) is SequenceStartEvent:
+                if event.anchor is None:
+                    items = _iter_sequence(constructor, event)
+                    yield key, items
+
+                    # skip the items not consumed
+                    for _ in items:
+                        pass
+                else:
+                    # the sequence may be referred to by an alias
+                    yield key, iter(constructor.construct(event))
+            else:
+                yield key, constructor.construct(event)
+
+            key_event = loader.get_event()
+
+        loader.get_event()
+        event = loader.get_event()
+        if type(event) is not StreamEndEvent:
+            raise ComposerError(
+                "expected a single document in the stream",
+                None,
+                "but found another document",
+                event.start_mark,
+            )
+    finally:
+        loader.dispose()
+
+
+def _iter_sequence(constructor, event):
+    """Yield the items of the sequence starting with ``event``."""
+    get_event = constructor.loader.get_event
+    item = get_event()
+    while type(item) is not SequenceEndEvent:
+        yield constructor.construct(item)
+        item = get_event()
+
+
 dump = partial(_yaml.dump, Dumper=_Dumper)
 
 
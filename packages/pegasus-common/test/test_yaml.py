@@ -2,8 +2,9 @@ from collections import OrderedDict
 from pathlib import Path
 
 import pytest
+import yaml
 
-from Pegasus.yaml import dumps, loads
+from Pegasus.yaml import dumps, iter_items, loads
 
 
 @pytest.mark.parametrize(
@@ -22,6 +23,47 @@ def test_loads(s, expected):
     assert rv["key"] == expected
 
 
+@pytest.mark.parametrize(
+    "s",
+    [
+        "key: 1\nl: [1, 2.5, true, yes, null, '1', 2018-10-10, !!str 2]\n",
+        "a: &a {k: 1, v: 2}\nb: {<<: *a, v: 3}\nc: *a\n",
+        "a: &a {k: 1}\nb: &b {k: 2, v: 2}\nc: {<<: [*a, *b]}\n",
+        "key: |\n  literal\n  text\n",
+        "{key: [1, 2], key2: {}}",
+    ],
+)
+def test_iter_items(s):
+    """Test :meth:`Pegasus.yaml.iter_items`."""
+    assert dict(iter_items(s)) == loads(s)
+
+
+def test_iter_items_lazy():
+    """Test :meth:`Pegasus.yaml.iter_items` with lazy sequences."""
+    s = "a: [1, 2]\nl: [{k: 1}, {k: 2}]\nm: &m [3]\nn: 4\n"
+    items = iter_items(s, lazy={"l", "m", "n"})
+
+    assert next(items) == ("a", [1, 2])
+
+    key, value = next(items)
+    assert key == "l" and not isinstance(value, list)
+    assert next(value) == {"k": 1}
+
+    # items not consumed are skipped
+    key, value = next(items)
+    assert key == "m" and list(value) == [3]
+    assert next(items) == ("n", 4)
+
+
+@pytest.mark.parametrize(
+    "s", ["- 1", "", "key: 1\n---\nkey: 2\n", "key: *undefined", "key: [1"]
+)
+def test_iter_items_invalid(s):
+    """Test :meth:`Pegasus.yaml.iter_items` with invalid documents."""
+    with pytest.raises(yaml.YAMLError):
+        list(iter_items(s))
+
+
 @pytest.mark.parametrize(
     "obj, expected",
     [
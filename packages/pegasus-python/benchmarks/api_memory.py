@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+
+"""
+Benchmarks the memory used by Pegasus.api workflows, as generated by
+workflow generator scripts before Workflow.write() is called.
+
+Two synthetic DAGs are built for each number of jobs:
+
+wide   a root job whose output is read by every other job, each writing its
+       own output, e.g. a parameter sweep
+deep   a chain of jobs, each reading the output of the previous one, e.g. a
+       pipeline
+
+Each job has arguments, one or two inputs and an output, and jobs refer to
+files shared with other jobs by creating their own File objects, as most
+generator scripts do. The memory allocated by the workflow is measured with
+tracemalloc.
+
+Usage: api_memory.py [options]
+"""
+
+##
+#  Copyright 2007-2021 University Of Southern California
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing,
+#  software distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+##
+
+import argparse
+import gc
+import time
+import tracemalloc
+
+from Pegasus.api import File, Job, Workflow
+
+
+def build_wide(num_jobs):
+    """
+    Returns a workflow with a root job, and num_jobs - 1 jobs reading its output.
+    """
+    wf = Workflow("wide")
+    wf.add_jobs(
+        Job("preprocess", _id="ID0000000")
+        .add_args("-o", "root.out")
+        .add_inputs(File("root.in"))
+        .add_outputs(File("root.out"))
+    )
+    for i in range(1, num_jobs):
+        out = File("sweep_%07d.out" % i)
+        wf.add_jobs(
+            Job("sweep", _id="ID%07d" % i)
+            .add_args("-i", "root.out", "-p", str(i), "-o", out)
+            .add_inputs(File("root.out"))
+            .add_outputs(out, stage_out=False)
+        )
+    return wf
+
+
+def build_deep(num_jobs):
+    """
+    Returns a workflow with a chain of num_jobs jobs.
+    """
+    wf = Workflow("deep")
+    for i in range(num_jobs):
+        out = File("stage_%07d.out" % i)
+        wf.add_jobs(
+            Job("stage", _id="ID%07d" % i)
+            .add_args("-i", "stage_%07d.out" % (i - 1), "-o", out)
+            .add_inputs(File("stage_%07d.out" % (i - 1)), File("config.txt"))
+            .add_outputs(out, stage_out=False)
+        )
+    return wf
+
+
+def measure(build, num_jobs):
+    """
+    Returns the memory allocated by the workflow build returns, its peak
+    while building, and the time it took to build.
+    """
+    gc.collect()
+    tracemalloc.start()
+    start = time.time()
+    wf = build(num_jobs)
+    elapsed = time.time() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del wf
+    return current, peak, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the memory used by Pegasus.api workflows"
+    )
+    parser.add_argument(
+        "-n",
+        "--jobs",
+        type=int,
+        action="append",
+        help="number of jobs in the workflow, repeatable (default 10000 and 100000)",
+    )
+    args = parser.parse_args()
+
+    print(
+        "%-6s %8s %12s %12s %10s %10s"
+        % ("dag", "jobs", "memory(MB)", "peak(MB)", "bytes/job", "time(s)")
+    )
+    for num_jobs in args.jobs or [10000, 100000]:
+        for name, build in [("wide", build_wide), ("deep", build_deep)]:
+            current, peak, elapsed = measure(build, num_jobs)
+            print(
+                "%-6s %8d %12.1f %12.1f %10d %10.2f"
+                % (
+                    name,
+                    num_jobs,
+                    current / 2 ** 20,
+                    peak / 2 ** 20,
+                    current / num_jobs,
+                    elapsed,
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+
+"""
+Benchmarks parsing kickstart output files, as pegasus-monitord does when a
+job ends.
+
+A clustered job output is generated for each number of tasks, with one YAML
+invocation record and one [cluster-task] record per task, a [cluster-summary]
+record and a pegasus-multipart integrity section, and it is parsed with
+Parser.parse_stampede() and Parser.parse_stdout_stderr().
+
+Usage: kickstart_parse.py [options]
+"""
+
+##
+#  Copyright 2007-2021 University Of Southern California
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing,
+#  software distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+##
+
+import argparse
+import datetime
+import hashlib
+import os
+import tempfile
+import time
+
+from monitord_synthetic import EXECUTABLE, KICKSTART_RECORD, LABEL, TRANSFORMATION
+
+from Pegasus.tools import kickstart_parser
+
+OUTPUT_FILE = """    {task_id}.out:
+      output: true
+      size: 1024
+      ctime: {start}
+      user: bench
+      sha256: {sha256}
+      checksum_timing: 0.010
+"""
+
+CLUSTER_TASK = (
+    '[cluster-task id={id}, start="{start}", duration={duration:.3f}, '
+    'status=0, line={id}, pid={pid}, app="{executable}"]\n'
+)
+
+CLUSTER_SUMMARY = (
+    '[cluster-summary stat="ok", lines={tasks}, tasks={tasks}, '
+    'succeeded={tasks}, failed=0, extra=0, start="{start}", '
+    'duration={duration:.3f}, pid=9999, app="/usr/bin/pegasus-cluster"]\n'
+)
+
+MULTIPART = """---------------pegasus-multipart
+- integrity_summary:
+    succeeded: {tasks}
+    failed: 0
+    duration: 0.182
+"""
+
+
+def write_clustered_output(path, num_tasks):
+    """
+    Writes the output of a clustered job with num_tasks tasks.
+    """
+    start = datetime.datetime(2020, 10, 19, 10, tzinfo=datetime.timezone.utc)
+    wf_stamp = start.isoformat(timespec="milliseconds")
+    duration = 1.0
+
+    with open(path, "w") as f:
+        for i in range(1, num_tasks + 1):
+            task_start = (start + datetime.timedelta(seconds=i)).isoformat(
+                timespec="milliseconds"
+            )
+            task_id = "ID%07d" % i
+            f.write(
+                KICKSTART_RECORD.format(
+                    start=task_start,
+                    duration=duration,
+                    utime=duration * 0.9,
+                    transformation=TRANSFORMATION,
+                    task_id=task_id,
+                    label=LABEL,
+                    wf_stamp=wf_stamp,
+                    host=i % 16 + 1,
+                    pid=10000 + i,
+                    executable=EXECUTABLE,
+                    sched_id="1000.0",
+                )
+            )
+            f.write(
+                OUTPUT_FILE.format(
+                    task_id=task_id,
+                    start=task_start,
+                    sha256=hashlib.sha256(task_id.encode()).hexdigest(),
+                )
+            )
+            f.write(
+                CLUSTER_TASK.format(
+                    id=i,
+                    start=task_start,
+                    duration=duration,
+                    pid=10000 + i,
+                    executable=EXECUTABLE,
+                )
+            )
+        f.write(
+            CLUSTER_SUMMARY.format(
+                tasks=num_tasks, start=wf_stamp, duration=num_tasks * duration
+            )
+        )
+        f.write(MULTIPART.format(tasks=num_tasks))
+
+
+def benchmark(path, method, repeat):
+    """
+    Returns the number of records and the best time of repeat parses of
+    path with the given Parser method.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        records = getattr(kickstart_parser.Parser(path), method)()
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return len(records), best
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark parsing clustered kickstart output files"
+    )
+    parser.add_argument(
+        "-n",
+        "--tasks",
+        type=int,
+        action="append",
+        help="number of tasks in the clustered job, repeatable (default 100 and 500)",
+    )
+    parser.add_argument(
+        "-r", "--repeat", type=int, default=5, help="number of parses, best is kept"
+    )
+    args = parser.parse_args()
+
+    print(
+        "%8s %-20s %9s %10s %13s"
+        % ("tasks", "method", "records", "time(s)", "records/sec")
+    )
+    with tempfile.TemporaryDirectory(prefix="kickstart-parse-") as tmp_dir:
+        for num_tasks in args.tasks or [100, 500]:
+            path = os.path.join(tmp_dir, "cluster-%d.out" % num_tasks)
+            write_clustered_output(path, num_tasks)
+            for method in ["parse_stampede", "parse_stdout_stderr"]:
+                records, elapsed = benchmark(path, method, args.repeat)
+                print(
+                    "%8d %-20s %9d %10.3f %13.0f"
+                    % (num_tasks, method, records, elapsed, records / elapsed)
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+
+"""
+Benchmarks pegasus-monitord by replaying recorded submit directories.
+
+Each submit directory is copied to a scratch directory, and replayed with
+pegasus-monitord -r --db-stats once for each destination:
+
+    sqlite-memory   in-memory SQLite database
+    sqlite-file     SQLite database file in the scratch directory
+    file            file event sink, with the default encoding
+
+For each run, the wall time, dagman.out lines/sec, events/sec, the time the
+stampede loader spent flushing to the database, the time spent in each
+dagman.out line handler and the peak RSS of pegasus-monitord are reported.
+
+Synthetic submit directories with N jobs can be generated with --jobs, to
+track how monitord scales as workflows grow.
+
+Usage: monitord_replay.py [options] [submit_dir ...]
+"""
+
+##
+#  Copyright 2007-2021 University Of Southern California
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing,
+#  software distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+##
+
+import argparse
+import glob
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from monitord_synthetic import generate_submit_dir
+
+DESTINATIONS = ["sqlite-memory", "sqlite-file", "file"]
+
+re_loader_perf = re.compile(
+    r"WorkflowLoader\(\d+\): Loader performance: .*insert_num=(\d+),.*"
+    r"flush_time=([0-9.e-]+), flush_num=(\d+)"
+)
+re_handler_perf = re.compile(
+    r"Handler performance: handler=(\S+), calls=(\d+), time=([0-9.e-]+)"
+)
+
+
+def find_monitord():
+    """
+    Returns the pegasus-monitord script of the Pegasus package being
+    benchmarked.
+    """
+    import Pegasus
+
+    for path in Pegasus.__path__:
+        monitord = os.path.join(path, "cli", "pegasus-monitord.py")
+        if os.path.isfile(monitord):
+            return monitord
+
+    raise RuntimeError("cannot find pegasus-monitord.py in %s" % Pegasus.__path__)
+
+
+def find_dagman_out(submit_dir):
+    dagman_outs = glob.glob(os.path.join(submit_dir, "*.dag.dagman.out"))
+    if len(dagman_outs) != 1:
+        raise RuntimeError(
+            "expected one .dag.dagman.out file in %s, found %d"
+            % (submit_dir, len(dagman_outs))
+        )
+    return dagman_outs[0]
+
+
+def count_lines(path):
+    with open(path, "rb") as f:
+        return sum(chunk.count(b"\n") for chunk in iter(lambda: f.read(1 << 20), b""))
+
+
+def count_dagman_out_lines(submit_dir):
+    """
+    Counts the lines of all the dagman.out files in the submit directory,
+    including the ones of sub-workflows.
+    """
+    lines = 0
+    for root, _, files in os.walk(submit_dir):
+        for name in files:
+            if name.endswith(".dagman.out"):
+                lines += count_lines(os.path.join(root, name))
+    return lines
+
+
+def run_monitord(monitord, dagman_out, dest, props_file, log_file):
+    """
+    Replays a workflow with pegasus-monitord, and returns its exit code, the
+    wall time and its peak RSS in KB.
+    """
+    cmd = [
+        sys.executable,
+        monitord,
+        "-r",
+        "--db-stats",
+        "--conf",
+        props_file,
+        "-d",
+        dest,
+        dagman_out,
+    ]
+
+    with open(log_file, "w") as log:
+        start = time.time()
+        process = subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT)
+        _, status, usage = os.wait4(process.pid, 0)
+        elapsed = time.time() - start
+
+    if os.WIFSIGNALED(status):
+        process.returncode = -os.WTERMSIG(status)
+    else:
+        process.returncode = os.WEXITSTATUS(status)
+    return process.returncode, elapsed, usage.ru_maxrss
+
+
+def parse_log(log_file):
+    """
+    Returns the number of events loaded, the loader flush time and count,
+    and the per-handler stats logged by pegasus-monitord --db-stats.
+    """
+    events, flush_time, flush_num = None, None, None
+    handlers = {}
+    with open(log_file) as log:
+        for line in log:
+            my_match = re_loader_perf.search(line)
+            if my_match:
+                events = int(my_match.group(1))
+                flush_time = float(my_match.group(2))
+                flush_num = int(my_match.group(3))
+                continue
+            my_match = re_handler_perf.search(line)
+            if my_match:
+                handlers[my_match.group(1)] = {
+                    "calls": int(my_match.group(2)),
+                    "time": float(my_match.group(3)),
+                }
+    return events, flush_time, flush_num, handlers
+
+
+def benchmark(monitord, submit_dir, dest_type, scratch_dir):
+    """
+    Replays a copy of a submit directory for one destination type, and
+    returns the results.
+    """
+    work_dir = tempfile.mkdtemp(prefix=dest_type + "-", dir=scratch_dir)
+    run_dir = os.path.join(work_dir, "submit")
+    shutil.copytree(submit_dir, run_dir, symlinks=True)
+    dagman_out = find_dagman_out(run_dir)
+
+    # Keep the dashboard events away from the user's master database
+    props_file = os.path.join(work_dir, "benchmark.properties")
+    with open(props_file, "w") as f:
+        f.write(
+            "pegasus.catalog.master.url = sqlite:///%s\n"
+            % os.path.join(work_dir, "master.db")
+        )
+
+    if dest_type == "sqlite-memory":
+        dest = "sqlite://"
+    elif dest_type == "sqlite-file":
+        dest = "sqlite:///%s" % os.path.join(work_dir, "stampede.db")
+    else:
+        dest = os.path.join(work_dir, "events.bp")
+
+    log_file = os.path.join(work_dir, "monitord.log")
+    exitcode, elapsed, maxrss = run_monitord(
+        monitord, dagman_out, dest, props_file, log_file
+    )
+
+    events, flush_time, flush_num, handlers = parse_log(log_file)
+    if dest_type == "file" and os.path.isfile(dest):
+        events = count_lines(dest)
+
+    lines = count_dagman_out_lines(run_dir)
+    return {
+        "submit_dir": submit_dir,
+        "dest": dest_type,
+        "exitcode": exitcode,
+        "log": log_file,
+        "wall_time": elapsed,
+        "lines": lines,
+        "lines_per_sec": lines / elapsed if elapsed > 0 else None,
+        "events": events,
+        "events_per_sec": events / elapsed if events and elapsed > 0 else None,
+        "flush_time": flush_time,
+        "flush_num": flush_num,
+        "handlers": handlers,
+        "peak_rss_kb": maxrss,
+    }
+
+
+def _fmt(value, fmt):
+    return "-" if value is None else fmt % value
+
+
+def print_results(results):
+    print(
+        "%-14s %8s %9s %11s %9s %11s %10s %12s"
+        % (
+            "dest",
+            "wall(s)",
+            "lines",
+            "lines/sec",
+            "events",
+            "events/sec",
+            "flush(s)",
+            "peak RSS(MB)",
+        )
+    )
+    for result in results:
+        print(
+            "%-14s %8.2f %9d %11s %9s %11s %10s %12.1f%s"
+            % (
+                result["dest"],
+                result["wall_time"],
+                result["lines"],
+                _fmt(result["lines_per_sec"], "%.0f"),
+                _fmt(result["events"], "%d"),
+                _fmt(result["events_per_sec"], "%.0f"),
+                _fmt(result["flush_time"], "%.2f"),
+                result["peak_rss_kb"] / 1024.0,
+                ""
+                if result["exitcode"] == 0
+                else "  (exit code %d, see %s)" % (result["exitcode"], result["log"]),
+            )
+        )
+
+    print()
+    print(
+        "%-14s %-30s %9s %10s %12s" % ("dest", "handler", "calls", "time(s)", "ms/call")
+    )
+    for result in results:
+        handlers = sorted(
+            result["handlers"].items(), key=lambda h: h[1]["time"], reverse=True
+        )
+        for name, stats in handlers:
+            print(
+                "%-14s %-30s %9d %10.3f %12.3f"
+                % (
+                    result["dest"],
+                    name,
+                    stats["calls"],
+                    stats["time"],
+                    1000.0 * stats["time"] / stats["calls"],
+                )
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark pegasus-monitord by replaying submit directories"
+    )
+    parser.add_argument(
+        "submit_dirs", nargs="*", metavar="submit_dir", help="recorded submit directory"
+    )
+    parser.add_argument(
+        "-n",
+        "--jobs",
+        type=int,
+        action="append",
+        default=[],
+        help="also benchmark a synthetic workflow with this many jobs, repeatable",
+    )
+    parser.add_argument(
+        "--fan-in",
+        type=int,
+        default=100,
+        help="number of jobs running at the same time in synthetic workflows",
+    )
+    parser.add_argument(
+        "-d",
+        "--dest",
+        choices=DESTINATIONS,
+        action="append",
+        help="destination to benchmark, repeatable (default all)",
+    )
+    parser.add_argument(
+        "-r",
+        "--repeat",
+        type=int,
+        default=1,
+        help="number of runs for each submit directory and destination",
+    )
+    parser.add_argument(
+        "--scratch-dir", help="directory for the runs (default a temporary directory)"
+    )
+    parser.add_argument(
+        "--keep", action="store_true", help="keep the scratch directory"
+    )
+    parser.add_argument("--json", metavar="FILE", help="also write results as JSON")
+    args = parser.parse_args()
+
+    if not args.submit_dirs and not args.jobs:
+        parser.error("a submit directory or --jobs is required")
+
+    monitord = find_monitord()
+    scratch_dir = args.scratch_dir or tempfile.mkdtemp(prefix="monitord-replay-")
+    os.makedirs(scratch_dir, exist_ok=True)
+
+    submit_dirs = [os.path.abspath(submit_dir) for submit_dir in args.submit_dirs]
+    for num_jobs in args.jobs:
+        submit_dir = os.path.join(scratch_dir, "synthetic-%d" % num_jobs)
+        generate_submit_dir(submit_dir, num_jobs, args.fan_in)
+        submit_dirs.append(submit_dir)
+
+    results = []
+    try:
+        for submit_dir in submit_dirs:
+            print("%s:" % submit_dir)
+            submit_results = []
+            for dest_type in args.dest or DESTINATIONS:
+                for _ in range(args.repeat):
+                    submit_results.append(
+                        benchmark(monitord, submit_dir, dest_type, scratch_dir)
+                    )
+            print_results(submit_results)
+            print()
+            results.extend(submit_results)
+    finally:
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(results, f, indent=2)
+        if (
+            args.keep
+            or args.scratch_dir
+            or any(result["exitcode"] != 0 for result in results)
+        ):
+            print("Runs are in %s" % scratch_dir)
+        else:
+            shutil.rmtree(scratch_dir)
+
+
+if __name__ == "__main__":
+    main()
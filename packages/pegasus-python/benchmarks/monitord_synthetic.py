@@ -0,0 +1,550 @@
+#!/usr/bin/env python3
+
+"""
+Generates a synthetic submit directory for benchmarking pegasus-monitord.
+
+The submit directory contains everything pegasus-monitord reads when
+replaying a workflow: the braindump and properties files, the .dag file,
+the static .bp file, a submit file and kickstart .out/.err files for each
+job, and the dagman.out file of a DAGMan run where every job succeeds.
+
+Usage: monitord_synthetic.py [options] submit_dir
+"""
+
+##
+#  Copyright 2007-2021 University Of Southern California
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing,
+#  software distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+##
+
+import argparse
+import datetime
+import os
+import uuid
+
+LABEL = "synthetic"
+TRANSFORMATION = "synthetic::process:1.0"
+EXECUTABLE = "/usr/bin/true"
+KICKSTART = "/usr/bin/pegasus-kickstart"
+EXITCODE = "/usr/bin/pegasus-exitcode"
+
+# Jobs are submitted by DAGMan in batches of this size
+SUBMIT_BATCH = 100
+
+BRAINDUMP = """user: bench
+submit_hostname: localhost
+root_wf_uuid: {wf_uuid}
+wf_uuid: {wf_uuid}
+dax: {label}.yml
+dax_label: {label}
+dax_index: 0
+dax_version: 5.0.0
+pegasus_wf_name: {label}-0
+timestamp: {timestamp}
+basedir: {submit_dir}
+submit_dir: {submit_dir}
+planner: /usr/bin/pegasus-plan
+planner_version: 5.1.0
+planner_arguments: "--dir {submit_dir} --sites local {label}.yml"
+jsd: jobstate.log
+properties: pegasus.properties
+rundir: {submit_dir}
+dag: {label}-0.dag
+type: dag
+"""
+
+SUBMIT_FILE = """universe = vanilla
+executable = {kickstart}
+arguments = "-n {transformation} -N {task_id} -R local -s {output} {executable}"
+output = {job_id}.out
+error = {job_id}.err
+log = {label}-0.log
++pegasus_site = "local"
++pegasus_wf_xformation = "{transformation}"
++pegasus_wf_dax_job_id = "{task_id}"
++pegasus_job_class = 1
++pegasus_cores = 1
+notification = NEVER
+queue
+"""
+
+KICKSTART_RECORD = """- invocation: True
+  version: 3.0
+  start: {start}
+  duration: {duration:.3f}
+  transformation: "{transformation}"
+  derivation: "{task_id}"
+  resource: "local"
+  wf-label: "{label}"
+  wf-stamp: "{wf_stamp}"
+  interface: eth0
+  hostaddr: 10.0.0.{host}
+  hostname: node{host}.example.com
+  pid: {pid}
+  uid: 1000
+  user: bench
+  gid: 1000
+  group: bench
+  umask: 0o0022
+  mainjob:
+    start: {start}
+    duration: {duration:.3f}
+    pid: {pid}
+    usage:
+      utime: {utime:.3f}
+      stime: 0.002
+      maxrss: 1300
+      minflt: 388
+      majflt: 0
+      nswap: 0
+      inblock: 0
+      outblock: 0
+      msgsnd: 0
+      msgrcv: 0
+      nsignals: 0
+      nvcsw: 23
+      nivcsw: 3
+    status:
+      raw: 0
+      regular_exitcode: 0
+    executable:
+      file_name: {executable}
+      mode: 0o100755
+      size: 23176
+      inode: 4214141
+      nlink: 1
+      blksize: 65536
+      blocks: 46
+      mtime: 2020-01-01T00:00:00-08:00
+      atime: 2020-01-01T00:00:00-08:00
+      ctime: 2020-01-01T00:00:00-08:00
+      uid: 0
+      user: root
+      gid: 0
+      group: root
+    argument_vector:
+      - -i
+      - {task_id}.in
+      - -o
+      - {task_id}.out
+    procs:
+  jobids:
+    condor: {sched_id}
+  cwd: /scratch/{label}
+  usage:
+    utime: 0.011
+    stime: 0.064
+    maxrss: 2276
+    minflt: 2482
+    majflt: 0
+    nswap: 0
+    inblock: 0
+    outblock: 0
+    msgsnd: 0
+    msgrcv: 0
+    nsignals: 0
+    nvcsw: 26
+    nivcsw: 6
+  machine:
+    page-size: 4096
+    uname_system: linux
+    uname_nodename: node{host}.example.com
+    uname_release: 3.10.0-957.5.1.el7.x86_64
+    uname_machine: x86_64
+    ram_total: 96504804
+    ram_free: 2545168
+    cpu_count: 64
+    cpu_speed: 2200
+    cpu_vendor: GenuineIntel
+    load_min1: 0.33
+    load_min5: 0.31
+    load_min15: 0.47
+  files:
+    stdout:
+      temporary_name: /tmp/ks.out.{pid}
+      descriptor: 3
+      mode: 0o100600
+      size: 12
+      inode: 4327756620
+      nlink: 1
+      blksize: 4096
+      blocks: 0
+      mtime: {start}
+      atime: {start}
+      ctime: {start}
+      uid: 1000
+      user: bench
+      gid: 1000
+      group: bench
+      data_truncated: false
+      data: |
+        processed {task_id}
+    stderr:
+      temporary_name: /tmp/ks.err.{pid}
+      descriptor: 4
+      mode: 0o100600
+      size: 0
+      inode: 4327868002
+      nlink: 1
+      blksize: 4096
+      blocks: 0
+      mtime: {start}
+      atime: {start}
+      ctime: {start}
+      uid: 1000
+      user: bench
+      gid: 1000
+      group: bench
+"""
+
+STATUS_TABLE = """{ts} Of {total} nodes total:
+{ts}  Done     Pre   Queued    Post   Ready   Un-Ready   Failed
+{ts}   ===     ===      ===     ===     ===        ===      ===
+{ts} {done:>5}       0 {queued:>8}       0 {ready:>7} {unready:>10}        0
+{ts} 0 job proc(s) currently held
+"""
+
+
+def _dagman_time(t):
+    return t.strftime("%m/%d/%y %H:%M:%S")
+
+
+def _iso_time(t):
+    return t.strftime("%Y-%m-%dT%H:%M:%S.000-00:00")
+
+
+def job_name(i):
+    return "process_ID%07d" % (i + 1)
+
+
+def task_name(i):
+    return "ID%07d" % (i + 1)
+
+
+def write_static_bp(f, wf_uuid, num_jobs, fan_in, ts):
+    for i in range(num_jobs):
+        f.write(
+            "ts=%s event=task.info level=INFO xwf.id=%s task.id=%s type=1 "
+            'type_desc=compute transformation=%s argv="-i %s.in -o %s.out"\n'
+            % (ts, wf_uuid, task_name(i), TRANSFORMATION, task_name(i), task_name(i))
+        )
+    for i in range(fan_in, num_jobs):
+        f.write(
+            "ts=%s event=task.edge level=INFO xwf.id=%s parent.task.id=%s "
+            "child.task.id=%s\n" % (ts, wf_uuid, task_name(i - fan_in), task_name(i))
+        )
+    for i in range(num_jobs):
+        f.write(
+            "ts=%s event=job.info level=INFO xwf.id=%s job.id=%s "
+            "submit_file=%s.sub type=1 type_desc=compute clustered=0 "
+            'max_retries=1 task_count=1 executable=%s argv="-n %s -N %s"\n'
+            % (
+                ts,
+                wf_uuid,
+                job_name(i),
+                job_name(i),
+                KICKSTART,
+                TRANSFORMATION,
+                task_name(i),
+            )
+        )
+    for i in range(fan_in, num_jobs):
+        f.write(
+            "ts=%s event=job.edge level=INFO xwf.id=%s parent.job.id=%s "
+            "child.job.id=%s\n" % (ts, wf_uuid, job_name(i - fan_in), job_name(i))
+        )
+    for i in range(num_jobs):
+        f.write(
+            "ts=%s event=wf.map.task_job level=INFO xwf.id=%s task.id=%s "
+            "job.id=%s\n" % (ts, wf_uuid, task_name(i), job_name(i))
+        )
+
+
+def write_dag(f, num_jobs, fan_in):
+    for i in range(num_jobs):
+        f.write("JOB %s %s.sub\n" % (job_name(i), job_name(i)))
+        f.write(
+            "SCRIPT POST %s %s -r $RETURN %s.out\n"
+            % (job_name(i), EXITCODE, job_name(i))
+        )
+        f.write("RETRY %s 1\n" % job_name(i))
+    for i in range(fan_in, num_jobs):
+        f.write("PARENT %s CHILD %s\n" % (job_name(i - fan_in), job_name(i)))
+
+
+def write_job_files(submit_dir, i, sched_id, start, duration, wf_stamp):
+    job_id = job_name(i)
+    with open(os.path.join(submit_dir, job_id + ".sub"), "w") as f:
+        f.write(
+            SUBMIT_FILE.format(
+                kickstart=KICKSTART,
+                transformation=TRANSFORMATION,
+                task_id=task_name(i),
+                output=task_name(i) + ".out",
+                executable=EXECUTABLE,
+                job_id=job_id,
+                label=LABEL,
+            )
+        )
+
+    # Job outputs are rotated by the POST script
+    with open(os.path.join(submit_dir, job_id + ".out.000"), "w") as f:
+        f.write(
+            KICKSTART_RECORD.format(
+                start=_iso_time(start),
+                duration=duration,
+                utime=duration * 0.9,
+                transformation=TRANSFORMATION,
+                task_id=task_name(i),
+                label=LABEL,
+                wf_stamp=wf_stamp,
+                host=i % 16 + 1,
+                pid=10000 + i,
+                executable=EXECUTABLE,
+                sched_id=sched_id,
+            )
+        )
+    with open(os.path.join(submit_dir, job_id + ".err.000"), "w") as f:
+        pass
+
+
+def write_dagman_out(f, submit_dir, num_jobs, fan_in, start):
+    """
+    Writes the dagman.out file of a DAGMan run. Jobs run in waves of fan_in
+    jobs, each depending on the job fan_in positions before it.
+    Returns the time DAGMan finished.
+    """
+    t = start
+    ts = _dagman_time(t)
+    dag = "%s-0.dag" % LABEL
+    f.write(
+        "{ts} ******************************************************\n"
+        "{ts} ** condor_scheduniv_exec.1000.0 (CONDOR_DAGMAN) STARTING UP\n"
+        "{ts} ** /usr/bin/condor_dagman\n"
+        "{ts} ** SubsystemInfo: name=DAGMAN type=DAGMAN(10) class=DAEMON(1)\n"
+        "{ts} ** Configuration: subsystem:DAGMAN local:<NONE> class:DAEMON\n"
+        "{ts} ** $CondorVersion: 8.8.9 May 06 2020 BuildID: 503970 PackageID: "
+        "8.8.9-1 $\n"
+        "{ts} ** $CondorPlatform: x86_64_CentOS7 $\n"
+        "{ts} ** PID = 12345\n"
+        "{ts} ** Log last touched time unavailable (No such file or directory)\n"
+        "{ts} ******************************************************\n"
+        "{ts} Using config source: /etc/condor/condor_config\n"
+        "{ts} DaemonCore: command socket at <127.0.0.1:9618>\n"
+        "{ts} DAGMAN_USE_STRICT setting: 1\n"
+        "{ts} DAGMAN_MAX_JOBS_SUBMITTED setting: 0\n"
+        "{ts} DAGMAN_MAX_SUBMITS_PER_INTERVAL setting: {batch}\n"
+        "{ts} DAGMAN_USER_LOG_SCAN_INTERVAL setting: 5\n"
+        "{ts} Default node log file is: <{submit_dir}/{dag}.nodes.log>\n"
+        "{ts} DAG Lockfile will be written to {dag}.lock\n"
+        "{ts} DAG Input file is {dag}\n"
+        "{ts} Parsing 1 dagfiles\n"
+        "{ts} Parsing {dag} ...\n"
+        "{ts} Dag contains {num_jobs} total jobs\n"
+        "{ts} Sleeping for 3 seconds to ensure ProcessId uniqueness\n"
+        "{ts} Bootstrapping...\n"
+        "{ts} Number of pre-completed nodes: 0\n"
+        "{ts} MultiLogFiles: truncating log file "
+        "{submit_dir}/{dag}.nodes.log\n"
+        "{ts} DAG status: 0 (DAG_STATUS_OK)\n"
+        "{ts} Of {num_jobs} nodes total:\n"
+        "{ts} Registering condor_event_timer...\n".format(
+            ts=ts,
+            batch=SUBMIT_BATCH,
+            submit_dir=submit_dir,
+            dag=dag,
+            num_jobs=num_jobs,
+        )
+    )
+
+    done = 0
+    sched_id = 1001
+    wf_stamp = _iso_time(start)
+    for wave_start in range(0, num_jobs, fan_in):
+        wave = range(wave_start, min(wave_start + fan_in, num_jobs))
+        jobs = []
+        for i in wave:
+            ts = _dagman_time(t)
+            f.write(
+                "{ts} Submitting HTCondor Node {job} job(s)...\n"
+                "{ts} Adding a DAGMan workflow log {submit_dir}/{dag}.nodes.log\n"
+                "{ts} Masking the events recorded in the DAGMAN workflow log\n"
+                "{ts} Mask for workflow log is 0,1,2,4,5,7,9,10,11,12,13,16,17,24,"
+                "27,35,36\n"
+                "{ts} submitting: /usr/bin/condor_submit -a dag_node_name' '=' '"
+                "{job} -a +DAGManJobId' '=' '1000 -a DAGManJobId' '=' '1000 "
+                "{job}.sub\n"
+                "{ts} \tFrom submit: Submitting job(s).\n"
+                "{ts} \tFrom submit: 1 job(s) submitted to cluster {sched_id}.\n"
+                "{ts} \tassigned HTCondor ID ({sched_id}.0.0)\n".format(
+                    ts=ts,
+                    job=job_name(i),
+                    submit_dir=submit_dir,
+                    dag=dag,
+                    sched_id=sched_id,
+                )
+            )
+            jobs.append((i, sched_id))
+            sched_id += 1
+            if len(jobs) % SUBMIT_BATCH == 0:
+                f.write(
+                    "%s Just submitted %d jobs this cycle...\n" % (ts, SUBMIT_BATCH)
+                )
+                t += datetime.timedelta(seconds=5)
+
+        t += datetime.timedelta(seconds=5)
+        ts = _dagman_time(t)
+        for i, job_sched_id in jobs:
+            f.write(
+                "{ts} Event: ULOG_SUBMIT for HTCondor Node {job} ({id}.0.0) "
+                "{{{ts}}}\n"
+                "{ts} Number of idle job procs: 1\n".format(
+                    ts=ts, job=job_name(i), id=job_sched_id
+                )
+            )
+
+        t += datetime.timedelta(seconds=5)
+        ts = _dagman_time(t)
+        for i, job_sched_id in jobs:
+            f.write(
+                "{ts} Event: ULOG_EXECUTE for HTCondor Node {job} ({id}.0.0) "
+                "{{{ts}}}\n"
+                "{ts} Number of idle job procs: 0\n".format(
+                    ts=ts, job=job_name(i), id=job_sched_id
+                )
+            )
+
+        job_start = t
+        duration = 10 + wave_start % 7
+        t += datetime.timedelta(seconds=duration + 1)
+        ts = _dagman_time(t)
+        for i, job_sched_id in jobs:
+            write_job_files(
+                submit_dir, i, "%d.0" % job_sched_id, job_start, duration, wf_stamp
+            )
+            f.write(
+                "{ts} Event: ULOG_JOB_TERMINATED for HTCondor Node {job} "
+                "({id}.0.0) {{{ts}}}\n"
+                "{ts} Number of idle job procs: 0\n"
+                "{ts} Node {job} job proc ({id}.0.0) completed successfully.\n"
+                "{ts} Node {job} job completed\n"
+                "{ts} Running POST script of Node {job}...\n".format(
+                    ts=ts, job=job_name(i), id=job_sched_id
+                )
+            )
+
+        t += datetime.timedelta(seconds=5)
+        ts = _dagman_time(t)
+        for i, job_sched_id in jobs:
+            f.write(
+                "{ts} Event: ULOG_POST_SCRIPT_TERMINATED for HTCondor Node {job} "
+                "({id}.0.0) {{{ts}}}\n"
+                "{ts} POST Script of node {job} completed successfully.\n"
+                "{ts} Node {job} completed\n".format(
+                    ts=ts, job=job_name(i), id=job_sched_id
+                )
+            )
+
+        done += len(jobs)
+        f.write(
+            STATUS_TABLE.format(
+                ts=ts,
+                total=num_jobs,
+                done=done,
+                queued=0,
+                ready=0,
+                unready=num_jobs - done,
+            )
+        )
+
+    t += datetime.timedelta(seconds=5)
+    ts = _dagman_time(t)
+    f.write(
+        "{ts} All jobs Completed!\n"
+        "{ts} Note: 0 total job deferrals because of -MaxJobs limit (0)\n"
+        "{ts} Note: 0 total job deferrals because of -MaxIdle limit (1000)\n"
+        "{ts} Note: 0 total job deferrals because of node category throttles\n"
+        "{ts} Note: 0 total PRE script deferrals because of -MaxPre limit (20)\n"
+        "{ts} Note: 0 total POST script deferrals because of -MaxPost limit (20)\n"
+        "{ts} DAG status: 0 (DAG_STATUS_OK)\n"
+        "{ts} Of {num_jobs} nodes total:\n"
+        "{ts} **** condor_scheduniv_exec.1000.0 (condor_DAGMAN) pid 12345 "
+        "EXITING WITH STATUS 0\n".format(ts=ts, num_jobs=num_jobs)
+    )
+    return t
+
+
+def generate_submit_dir(submit_dir, num_jobs, fan_in=100):
+    """
+    Generates a synthetic submit directory for a workflow of num_jobs jobs,
+    where each job depends on the job fan_in positions before it. Returns
+    the path to the dagman.out file.
+    """
+    if num_jobs < 1:
+        raise ValueError("num_jobs must be at least 1")
+    if fan_in < 1:
+        raise ValueError("fan_in must be at least 1")
+
+    submit_dir = os.path.abspath(submit_dir)
+    os.makedirs(submit_dir, exist_ok=True)
+
+    wf_uuid = str(uuid.uuid4())
+    start = datetime.datetime(2020, 10, 19, 10, 0, 0)
+
+    with open(os.path.join(submit_dir, "braindump.yml"), "w") as f:
+        f.write(
+            BRAINDUMP.format(
+                wf_uuid=wf_uuid,
+                label=LABEL,
+                timestamp=start.strftime("%Y%m%dT%H%M%S+0000"),
+                submit_dir=submit_dir,
+            )
+        )
+
+    with open(os.path.join(submit_dir, "pegasus.properties"), "w") as f:
+        f.write("# synthetic workflow for benchmarking pegasus-monitord\n")
+
+    with open(os.path.join(submit_dir, "%s-0.static.bp" % LABEL), "w") as f:
+        write_static_bp(f, wf_uuid, num_jobs, fan_in, _iso_time(start))
+
+    with open(os.path.join(submit_dir, "%s-0.dag" % LABEL), "w") as f:
+        write_dag(f, num_jobs, fan_in)
+
+    dagman_out = os.path.join(submit_dir, "%s-0.dag.dagman.out" % LABEL)
+    with open(dagman_out, "w") as f:
+        write_dagman_out(f, submit_dir, num_jobs, fan_in, start)
+
+    return dagman_out
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate a synthetic submit directory for pegasus-monitord"
+    )
+    parser.add_argument("submit_dir", help="directory to generate")
+    parser.add_argument(
+        "-n", "--jobs", type=int, default=1000, help="number of jobs (default 1000)"
+    )
+    parser.add_argument(
+        "--fan-in",
+        type=int,
+        default=100,
+        help="number of jobs running at the same time (default 100)",
+    )
+    args = parser.parse_args()
+
+    print(generate_submit_dir(args.submit_dir, args.jobs, args.fan_in))
+
+
+if __name__ == "__main__":
+    main()
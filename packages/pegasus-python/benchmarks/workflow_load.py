@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+"""
+Benchmarks loading workflow files with Pegasus.workflow.load(), as
+pegasus-graphviz and workflow validators do.
+
+The wide and deep DAGs of api_memory.py are written as YAML and JSON for each
+number of jobs, then loaded back. The load time, the memory allocated by the
+loaded workflow and its peak while loading, as traced by tracemalloc, are
+reported.
+
+Usage: workflow_load.py [options]
+"""
+
+##
+#  Copyright 2007-2021 University Of Southern California
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing,
+#  software distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+##
+
+import argparse
+import gc
+import os
+import tempfile
+import time
+import tracemalloc
+
+from api_memory import build_deep, build_wide
+
+from Pegasus import workflow
+
+
+def measure(path, trace):
+    """
+    Returns the number of jobs of the workflow loaded from path, the time it
+    took, and the memory allocated by the workflow and its peak while loading
+    if trace is True.
+    """
+    gc.collect()
+    if trace:
+        tracemalloc.start()
+    start = time.time()
+    with open(path) as f:
+        wf = workflow.load(f)
+    elapsed = time.time() - start
+    current, peak = tracemalloc.get_traced_memory() if trace else (0, 0)
+    if trace:
+        tracemalloc.stop()
+    return len(wf.jobs), elapsed, current, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark loading workflow files with Pegasus.workflow.load"
+    )
+    parser.add_argument(
+        "-n",
+        "--jobs",
+        type=int,
+        action="append",
+        help="number of jobs in the workflow, repeatable (default 10000 and 100000)",
+    )
+    parser.add_argument(
+        "--no-trace",
+        dest="trace",
+        action="store_false",
+        help="do not trace memory, which slows loading down",
+    )
+    args = parser.parse_args()
+
+    print(
+        "%-6s %-5s %8s %10s %10s %12s %12s"
+        % ("dag", "fmt", "jobs", "size(MB)", "time(s)", "memory(MB)", "peak(MB)")
+    )
+    with tempfile.TemporaryDirectory(prefix="workflow-load-") as tmp_dir:
+        for num_jobs in args.jobs or [10000, 100000]:
+            for name, build in [("wide", build_wide), ("deep", build_deep)]:
+                wf = build(num_jobs)
+                for _format in ["yml", "json"]:
+                    path = os.path.join(tmp_dir, "%s-%d.%s" % (name, num_jobs, _format))
+                    wf.write(path, _format=_format)
+                    jobs, elapsed, current, peak = measure(path, args.trace)
+                    print(
+                        "%-6s %-5s %8d %10.1f %10.2f %12.1f %12.1f"
+                        % (
+                            name,
+                            _format,
+                            jobs,
+                            os.path.getsize(path) / 2 ** 20,
+                            elapsed,
+                            current / 2 ** 20,
+                            peak / 2 ** 20,
+                        )
+                    )
+                del wf
+
+
+if __name__ == "__main__":
+    main()
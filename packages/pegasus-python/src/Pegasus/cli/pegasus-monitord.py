@@ -39,7 +39,7 @@ import traceback
 
 from Pegasus.db import connection
 from Pegasus.monitoring import event_output as eo
-from Pegasus.monitoring import notifications
+from Pegasus.monitoring import filewatch, notifications, parsepool
 from Pegasus.monitoring.workflow import MONITORD_RECOVER_FILE, Workflow
 from Pegasus.tools import properties, utils
 
@@ -101,6 +101,7 @@ re_parse_condor_logfile_insane = re.compile(r"\d{2}\s{3,}(\S+)")
 re_parse_multiline_files = re.compile(r"All DAG node user log files:")
 re_parse_dagman_aborted = re.compile(r"Received SIGUSR1")
 re_parse_job_held = re.compile(r"\s*Hold reason:(.*)")
+re_parse_recovery_mode = re.compile(re.escape("Running in RECOVERY mode..."))
 
 # Constants
 MONITORD_WF_RETRY_FILE = (
@@ -132,6 +133,15 @@ keep_state = (
     0  # Flag for keeping a Workflow's state across several DAGMan start/stop cycles
 )
 db_stats = False  # collect and print database stats at the end of execution
+handler_stats = None  # calls and time spent per dagman.out handler, with db_stats
+db_flush_mode = None  # How the stampede loader writes batched events to the database
+db_cache_size = None  # Maximum entries per loader lookup cache per workflow
+db_queue_size = None  # Events queued for the loader thread (0 loads events inline)
+parser_workers = 0  # Workers parsing job outputs in the background (0 parses inline)
+parser_pool_type = "thread"  # Whether the job output parsers are threads or processes
+job_output_pool = None  # Parses job outputs when jobs terminate
+events_buffer_size = None  # Bytes of events buffered by the file and TCP sinks
+events_framing = None  # Framing of the events written by the file and TCP sinks
 no_events = False  # Flag for disabling event output altogether
 event_dest = None  # URL containing the destination of the events
 dashboard_event_dest = (
@@ -148,6 +158,8 @@ notifications_timeout = (
 )
 store_stdout_stderr = True  # Flag for storing jobs' stdout and stderr in our output
 fast_start_mode = True  # Flag to indicate that only sleep once monitord has caught up with the dagman.out file
+use_inotify = True  # Flag to wake up as soon as a dagman.out file changes
+file_watcher = None  # Watches the dagman.out files while monitord sleeps
 wf_event_sink = None  # Where wf events go
 out = None  # .dag.dagman.out file from command-line
 run = None  # run directory from command-line dagman.out file
@@ -214,6 +226,27 @@ def finish_stampede_loader():
     logger.info("DB flushing ended")
 
 
+def close_job_output_pool():
+    """
+    This function stops the workers parsing job outputs in the background.
+    """
+    if job_output_pool is not None:
+        job_output_pool.close()
+
+
+def log_handler_stats():
+    """
+    This function is called by the atexit module when monitord exits,
+    when database stats are enabled. It logs the number of calls and
+    the time spent in each dagman.out line handler.
+    """
+    for name, (calls, elapsed) in sorted(handler_stats.items()):
+        logger.info(
+            "Handler performance: handler=%s, calls=%d, time=%s"
+            % (name, calls, elapsed)
+        )
+
+
 class WorkflowEntry:
     """
     Class used to store one workflow entry
@@ -399,7 +432,7 @@ grp.add_option(
     action="store",
     dest="enc",
     metavar="FORMAT",
-    help="How to encode log events: bson | json| bp (default=bp)",
+    help="How to encode log events: bson | json | msgpack | bp (default=bp)",
 )
 parser.add_option_group(grp)
 
@@ -549,6 +582,9 @@ if options.disable_subworkflows is not None:
     follow_subworkflows = False
 if options.db_stats is not None:
     db_stats = options.db_stats
+    if db_stats:
+        handler_stats = {}
+        atexit.register(log_handler_stats)
 if options.keep_state is not None:
     keep_state = options.keep_state
 if options.skip_stdout is not None:
@@ -599,6 +635,74 @@ dashboard_event_dest = connection.url_by_properties(
     rundir_properties=top_level_prop_file,
 )
 
+inotify_property = props.property("pegasus.monitord.inotify")
+if inotify_property is not None:
+    use_inotify = utils.make_boolean(inotify_property)
+
+if props.property("pegasus.monitord.db.flush.mode") is not None:
+    # Get the stampede loader flush mode from property
+    db_flush_mode = props.property("pegasus.monitord.db.flush.mode")
+
+if props.property("pegasus.monitord.db.cache.size") is not None:
+    # Get the stampede loader cache size from property
+    try:
+        db_cache_size = int(props.property("pegasus.monitord.db.cache.size"))
+    except ValueError:
+        logger.warning(
+            "invalid value for pegasus.monitord.db.cache.size: %s... using default..."
+            % props.property("pegasus.monitord.db.cache.size")
+        )
+
+if props.property("pegasus.monitord.db.queue.size") is not None:
+    # Get the size of the queue of events for the stampede loader thread
+    try:
+        db_queue_size = int(props.property("pegasus.monitord.db.queue.size"))
+    except ValueError:
+        logger.warning(
+            "invalid value for pegasus.monitord.db.queue.size: %s... using default..."
+            % props.property("pegasus.monitord.db.queue.size")
+        )
+
+if props.property("pegasus.monitord.parser.workers") is not None:
+    # Get the number of workers parsing job outputs in the background
+    try:
+        parser_workers = int(props.property("pegasus.monitord.parser.workers"))
+    except ValueError:
+        logger.warning(
+            "invalid value for pegasus.monitord.parser.workers: %s... using default..."
+            % props.property("pegasus.monitord.parser.workers")
+        )
+
+if props.property("pegasus.monitord.parser.pool") is not None:
+    # Get whether job outputs are parsed by threads or processes
+    if props.property("pegasus.monitord.parser.pool") in parsepool.POOL_TYPES:
+        parser_pool_type = props.property("pegasus.monitord.parser.pool")
+    else:
+        logger.warning(
+            "invalid value for pegasus.monitord.parser.pool: %s... using default..."
+            % props.property("pegasus.monitord.parser.pool")
+        )
+
+if props.property("pegasus.monitord.events.buffer.size") is not None:
+    # Get the number of bytes of events buffered by the file and TCP sinks
+    try:
+        events_buffer_size = int(props.property("pegasus.monitord.events.buffer.size"))
+    except ValueError:
+        logger.warning(
+            "invalid value for pegasus.monitord.events.buffer.size: %s... using default..."
+            % props.property("pegasus.monitord.events.buffer.size")
+        )
+
+if props.property("pegasus.monitord.events.framing") is not None:
+    # Get how the events written by the file and TCP sinks are framed
+    if props.property("pegasus.monitord.events.framing") in eo.FRAMING:
+        events_framing = props.property("pegasus.monitord.events.framing")
+    else:
+        logger.warning(
+            "invalid value for pegasus.monitord.events.framing: %s... using default..."
+            % props.property("pegasus.monitord.events.framing")
+        )
+
 if options.enc is not None:
     # Get encoding from command-line options
     encoding = options.enc
@@ -735,6 +839,334 @@ def add(wf, jobid, event, sched_id=None, status=None, reason=None):
     return my_job_submit_seq
 
 
+#
+# --- dagman.out line handlers ------------------------------------------------------------
+#
+
+
+def dagman_out_event(wf, my_expr, log_line):
+    # Found ULOG Event
+    # groups = jobid, event, sched_id
+    my_event = my_expr.group(1)
+    my_jobid = my_expr.group(2)
+    my_sched_id = my_expr.group(3)
+    my_job_submit_seq = add(wf, my_jobid, my_event, sched_id=my_sched_id)
+    if my_event == "SUBMIT" and follow_subworkflows is True:
+        # For SUBMIT ULOG events, check if this is a sub-workflow
+        my_new_dagman_out = wf.has_subworkflow(my_jobid, wf_retry_dict)
+        # Ok, return result to main loop
+        return (my_new_dagman_out, my_jobid, my_job_submit_seq)
+
+
+def dagman_out_job_submit(wf, my_expr, log_line):
+    # Found a DAGMan job submit event
+    # groups = jobid
+    add(wf, my_expr.group(1), "DAGMAN_SUBMIT")
+
+
+def dagman_out_job_submit_error(wf, my_expr, log_line):
+    # Found a DAGMan job submit error event
+    if wf._last_submitted_job is not None:
+        add(wf, wf._last_submitted_job, "SUBMIT_FAILED")
+    else:
+        logger.warning("found submit error in dagman.out, but last job is not set")
+
+
+def dagman_out_script_running(wf, my_expr, log_line):
+    # Pre scripts are not regular Condor event
+    # Starting of scripts is not a regular Condor event
+    # groups = script, jobid
+    my_script = my_expr.group(1).upper()
+    my_jobid = my_expr.group(2)
+    add(wf, my_jobid, "%s_SCRIPT_STARTED" % (my_script))
+
+
+def dagman_out_script_done(wf, my_expr, log_line):
+    # groups = script, jobid
+    my_script = my_expr.group(1).upper()
+    my_jobid = my_expr.group(2)
+    if my_script == "PRE":
+        # Special case for PRE_SCRIPT_TERMINATED, as Condor
+        # does not generate a PRE_SCRIPT_TERMINATED ULOG event
+        add(wf, my_jobid, "PRE_SCRIPT_TERMINATED")
+    if re_parse_script_successful.search(log_line) is not None:
+        # Remember success with artificial jobstate
+        add(wf, my_jobid, "%s_SCRIPT_SUCCESS" % (my_script), status=0)
+    elif re_parse_script_failed.search(log_line) is not None:
+        # Remember failure with artificial jobstate
+        my_expr = re_parse_script_failed.search(log_line)
+        # groups = exit code (error status)
+        try:
+            my_exit_code = int(my_expr.group(1))
+        except ValueError:
+            # Unable to convert exit code to integer -- should not happen
+            logger.warning("unable to convert exit code to integer!")
+            my_exit_code = 1
+        add(wf, my_jobid, "%s_SCRIPT_FAILURE" % (my_script), status=my_exit_code)
+    else:
+        # Ignore
+        logger.warning("unknown pscript state: %s" % (log_line[-14:]))
+
+
+def dagman_out_job_failed(wf, my_expr, log_line):
+    # Job has failed
+    # groups = jobid, schedid, jobstatus
+    my_jobid = my_expr.group(1)
+    my_sched_id = my_expr.group(2)
+    my_expr.group(3)
+    try:
+        my_jobstatus = int(my_expr.group(4))
+    except ValueError:
+        # Unable to convert exit code to integet -- should not happen
+        logger.warning("unable to convert exit code to integer!")
+        my_jobstatus = 1
+    # remember failure with artificial jobstate
+    add(wf, my_jobid, "JOB_FAILURE", sched_id=my_sched_id, status=my_jobstatus)
+
+
+def dagman_out_job_successful(wf, my_expr, log_line):
+    # Job succeeded
+    my_jobid = my_expr.group(1)
+    my_sched_id = my_expr.group(2)
+    # remember success with artificial jobstate
+    add(wf, my_jobid, "JOB_SUCCESS", sched_id=my_sched_id, status=0)
+
+
+def dagman_out_dagman_finished(wf, my_expr, log_line):
+    # DAG finished -- done parsing
+    # groups = exit code
+    try:
+        wf._dagman_exit_code = int(my_expr.group(1))
+    except ValueError:
+        # Cannot convert exit code to integer!
+        logger.warning("cannot convert DAGMan's exit code to integer!")
+        wf._dagman_exit_code = 0
+        wf._monitord_exit_code = 1
+    logger.info(
+        "DAGMan {} finished with exit code {}".format(
+            wf._dag_file_name, wf._dagman_exit_code
+        )
+    )
+    # Send info to database
+    wf.change_wf_state("end")
+
+
+def dagman_out_dagman_condor_id(wf, my_expr, log_line):
+    # DAGMan starting, capture its condor id
+    wf._dagman_condor_id = my_expr.group(1)
+    if not keep_state:
+        # Initialize workflow parameters
+        wf.start_wf()
+
+
+def dagman_out_dagman_pid(wf, my_expr, log_line):
+    # DAGMan's pid, but only set pid if not running in replay mode
+    # (otherwise pid may belong to another process)
+    # groups = DAGMan's pid
+    try:
+        wf._dagman_pid = int(my_expr.group(1))
+    except ValueError:
+        logger.critical("cannot set pid: %s" % (my_expr.group(1)))
+        sys.exit(42)
+    logger.info("DAGMan runs at pid %d" % (wf._dagman_pid))
+
+
+def dagman_out_dag_name(wf, my_expr, log_line):
+    # Found the dag filename, read dag, and generate start event for the database
+    my_dag = my_expr.group(1)
+    # Parse dag file
+    logger.info("using dag %s" % (my_dag))
+
+    # PM-1334 potential fix. we parse dag file now in workflow constructor when we determine
+    # there is a new workflow to track
+    # wf.parse_dag_file(my_dag)
+
+    # Send the delayed workflow start event to database
+    wf.change_wf_state("start")
+
+
+def dagman_out_condor_version(wf, my_expr, log_line):
+    # Version of this logfile format
+    # groups = condor version, condor major
+    my_condor_version = my_expr.group(1)
+    my_condor_major = int(my_expr.group(2))
+    my_condor_minor = int(my_expr.group(3))
+    my_condor_patch = int(my_expr.group(4))
+    wf.set_dagman_version(my_condor_major, my_condor_minor, my_condor_patch)
+    logger.info(
+        "Using DAGMan version %s %d" % (my_condor_version, wf.get_dagman_version())
+    )
+
+
+def dagman_out_condor_logfile(wf, my_expr, log_line):
+    # Condor common log file location, DAGMan 6.6
+    wf._condorlog = my_expr.group(1)
+    logger.info("Condor writes its logfile to %s" % (wf._condorlog))
+
+    # Make a symlink for NFS-secured files
+    my_log, my_base = utils.out2log(wf._run_dir, wf._out_file)
+    if os.path.islink(my_log):
+        logger.info("symlink %s already exists" % (my_log))
+    elif os.access(my_log, os.R_OK):
+        logger.info("%s is a regular file, not touching" % (my_base))
+    else:
+        logger.info("trying to create local symlink to common log")
+        if os.access(wf._condorlog, os.R_OK) or not os.access(wf._condorlog, os.F_OK):
+            if os.access(my_log, os.R_OK):
+                try:
+                    os.rename(my_log, "%s.bak" % (my_log))
+                except OSError:
+                    logger.warning("error renaming {} to {}.bak".format(my_log, my_log))
+            try:
+                os.symlink(wf._condorlog, my_log)
+            except OSError:
+                logger.info("unable to symlink %s" % (wf._condorlog))
+            else:
+                logger.info("symlink {} -> {}".format(wf._condorlog, my_log))
+        else:
+            logger.info("%s exists but is not readable!" % (wf._condorlog))
+    # We only expect one of such files
+    wf._multiline_file_flag = False
+
+
+def dagman_out_multiline_files(wf, my_expr, log_line):
+    # Multiline user log files, DAGMan > 6.6
+    wf._multiline_file_flag = True
+
+
+def dagman_out_recovery_mode(wf, my_expr, log_line):
+    # Entering recovery mode, skip lines until we reach the end
+    logger.info("Enabling DAGMAN RECOVERY MODE")
+    wf._skipping_recovery_lines = True
+
+
+def dagman_out_dagman_aborted(wf, my_expr, log_line):
+    # PM-767 dagman was aborted. just log in monitord log
+    # eventually the dagman exit line will trigger failure in the DB
+    logger.warning(
+        "DAGMan was aborted for workflow running in directory %s" % wf._run_dir
+    )
+    wf._current_state_reason = "DAGMan aborted as it received SIGUSR1 signal."
+
+
+def dagman_out_job_held(wf, my_expr, log_line):
+    # PM-749  figure out reason for job held
+    my_held_reason = my_expr.group(1)
+
+    # figure out which job  was held
+    # the log line has no info. so try to fallback on last job
+    last_job = wf._last_known_job
+    if last_job is None or last_job._job_state != "JOB_HELD":
+        logger.error(
+            "Last known job %s is not held. Parsed  held job with reason %s "
+            % (last_job, my_held_reason)
+        )
+
+    # PM-749 insert a new JOB_HELD_REASON event that connects to held job
+    my_event = "JOB_HELD_REASON"
+    my_jobid = last_job._exec_job_id
+    my_sched_id = last_job._sched_id
+    add(wf, my_jobid, my_event, sched_id=my_sched_id, reason=my_held_reason)
+
+
+# Handlers for the timestamped dagman.out lines, in order of precedence. Each
+# entry has a keyword the line must contain for the regular expression to
+# match (None if there is no such keyword), the regular expression, the
+# handler, and an optional condition on the workflow for the entry to be used.
+# A line is dispatched to the first entry whose keyword, condition and regular
+# expression all match.
+DAGMAN_OUT_HANDLERS = [
+    ("ULOG_", re_parse_event, dagman_out_event, None),
+    ("Submitting ", re_parse_job_submit, dagman_out_job_submit, None),
+    (
+        "submit attempt failed",
+        re_parse_job_submit_error,
+        dagman_out_job_submit_error,
+        None,
+    ),
+    (" script of ", re_parse_script_running, dagman_out_script_running, None),
+    (" Script of ", re_parse_script_done, dagman_out_script_done, None),
+    (" job proc ", re_parse_job_failed, dagman_out_job_failed, None),
+    (" job proc ", re_parse_job_successful, dagman_out_job_successful, None),
+    ("EXITING WITH STATUS", re_parse_dagman_finished, dagman_out_dagman_finished, None),
+    ("STARTING UP", re_parse_dagman_condor_id, dagman_out_dagman_condor_id, None),
+    ("PID = ", re_parse_dagman_pid, dagman_out_dagman_pid, lambda wf: not replay_mode),
+    ("Parsing ", re_parse_dag_name, dagman_out_dag_name, None),
+    ("CondorVersion", re_parse_condor_version, dagman_out_condor_version, None),
+    (
+        "Condor log will be written to",
+        re_parse_condor_logfile,
+        dagman_out_condor_logfile,
+        None,
+    ),
+    (
+        None,
+        re_parse_condor_logfile_insane,
+        dagman_out_condor_logfile,
+        lambda wf: wf._multiline_file_flag is True,
+    ),
+    (
+        "All DAG node user log files:",
+        re_parse_multiline_files,
+        dagman_out_multiline_files,
+        None,
+    ),
+    (
+        "Running in RECOVERY mode...",
+        re_parse_recovery_mode,
+        dagman_out_recovery_mode,
+        None,
+    ),
+    ("Received SIGUSR1", re_parse_dagman_aborted, dagman_out_dagman_aborted, None),
+    ("Hold reason:", re_parse_job_held, dagman_out_job_held, None),
+]
+
+# Matches any of the handler keywords, most dagman.out lines contain none
+re_dagman_out_keywords = re.compile(
+    "|".join(
+        re.escape(keyword)
+        for keyword in sorted(
+            {k for k, _, _, _ in DAGMAN_OUT_HANDLERS if k is not None},
+            key=len,
+            reverse=True,
+        )
+    )
+)
+
+
+def dispatch_dagman_out(wf, log_line):
+    """
+    Finds the keywords in a timestamped dagman.out line in a single scan, and
+    calls the first matching handler. Returns the handler's result, or None
+    if the line does not match any handler.
+    """
+    keywords = set(re_dagman_out_keywords.findall(log_line))
+    if not keywords and wf._multiline_file_flag is not True:
+        # Noise, nothing to do
+        return None
+
+    for keyword, regex, handler, condition in DAGMAN_OUT_HANDLERS:
+        if keyword is not None and keyword not in keywords:
+            continue
+        if condition is not None and not condition(wf):
+            continue
+        my_expr = regex.search(log_line)
+        if my_expr is None:
+            continue
+        if handler_stats is None:
+            return handler(wf, my_expr, log_line)
+
+        start = time.time()
+        try:
+            return handler(wf, my_expr, log_line)
+        finally:
+            my_stats = handler_stats.setdefault(handler.__name__, [0, 0.0])
+            my_stats[0] += 1
+            my_stats[1] += time.time() - start
+
+    return None
+
+
 def process_dagman_out(wf, log_line):
     """
     This function processes a log line from the dagman.out file and
@@ -833,230 +1265,7 @@ def process_dagman_out(wf, log_line):
             return
 
         # Search for more content
-        if re_parse_event.search(log_line) is not None:
-            # Found ULOG Event
-            my_expr = re_parse_event.search(log_line)
-            # groups = jobid, event, sched_id
-            my_event = my_expr.group(1)
-            my_jobid = my_expr.group(2)
-            my_sched_id = my_expr.group(3)
-            my_job_submit_seq = add(wf, my_jobid, my_event, sched_id=my_sched_id)
-            if my_event == "SUBMIT" and follow_subworkflows is True:
-                # For SUBMIT ULOG events, check if this is a sub-workflow
-                my_new_dagman_out = wf.has_subworkflow(my_jobid, wf_retry_dict)
-                # Ok, return result to main loop
-                return (my_new_dagman_out, my_jobid, my_job_submit_seq)
-        elif re_parse_job_submit.search(log_line) is not None:
-            # Found a DAGMan job submit event
-            my_expr = re_parse_job_submit.search(log_line)
-            # groups = jobid
-            add(wf, my_expr.group(1), "DAGMAN_SUBMIT")
-        elif re_parse_job_submit_error.search(log_line) is not None:
-            # Found a DAGMan job submit error event
-            if wf._last_submitted_job is not None:
-                add(wf, wf._last_submitted_job, "SUBMIT_FAILED")
-            else:
-                logger.warning(
-                    "found submit error in dagman.out, but last job is not set"
-                )
-        elif re_parse_script_running.search(log_line) is not None:
-            # Pre scripts are not regular Condor event
-            # Starting of scripts is not a regular Condor event
-            my_expr = re_parse_script_running.search(log_line)
-            # groups = script, jobid
-            my_script = my_expr.group(1).upper()
-            my_jobid = my_expr.group(2)
-            add(wf, my_jobid, "%s_SCRIPT_STARTED" % (my_script))
-        elif re_parse_script_done.search(log_line) is not None:
-            my_expr = re_parse_script_done.search(log_line)
-            # groups = script, jobid
-            my_script = my_expr.group(1).upper()
-            my_jobid = my_expr.group(2)
-            if my_script == "PRE":
-                # Special case for PRE_SCRIPT_TERMINATED, as Condor
-                # does not generate a PRE_SCRIPT_TERMINATED ULOG event
-                add(wf, my_jobid, "PRE_SCRIPT_TERMINATED")
-            if re_parse_script_successful.search(log_line) is not None:
-                # Remember success with artificial jobstate
-                add(wf, my_jobid, "%s_SCRIPT_SUCCESS" % (my_script), status=0)
-            elif re_parse_script_failed.search(log_line) is not None:
-                # Remember failure with artificial jobstate
-                my_expr = re_parse_script_failed.search(log_line)
-                # groups = exit code (error status)
-                try:
-                    my_exit_code = int(my_expr.group(1))
-                except ValueError:
-                    # Unable to convert exit code to integer -- should not happen
-                    logger.warning("unable to convert exit code to integer!")
-                    my_exit_code = 1
-                add(
-                    wf, my_jobid, "%s_SCRIPT_FAILURE" % (my_script), status=my_exit_code
-                )
-            else:
-                # Ignore
-                logger.warning("unknown pscript state: %s" % (log_line[-14:]))
-        elif re_parse_job_failed.search(log_line) is not None:
-            # Job has failed
-            my_expr = re_parse_job_failed.search(log_line)
-            # groups = jobid, schedid, jobstatus
-            my_jobid = my_expr.group(1)
-            my_sched_id = my_expr.group(2)
-            my_expr.group(3)
-            try:
-                my_jobstatus = int(my_expr.group(4))
-            except ValueError:
-                # Unable to convert exit code to integet -- should not happen
-                logger.warning("unable to convert exit code to integer!")
-                my_jobstatus = 1
-            # remember failure with artificial jobstate
-            add(wf, my_jobid, "JOB_FAILURE", sched_id=my_sched_id, status=my_jobstatus)
-        elif re_parse_job_successful.search(log_line) is not None:
-            # Job succeeded
-            my_expr = re_parse_job_successful.search(log_line)
-            my_jobid = my_expr.group(1)
-            my_sched_id = my_expr.group(2)
-            # remember success with artificial jobstate
-            add(wf, my_jobid, "JOB_SUCCESS", sched_id=my_sched_id, status=0)
-        elif re_parse_dagman_finished.search(log_line) is not None:
-            # DAG finished -- done parsing
-            my_expr = re_parse_dagman_finished.search(log_line)
-            # groups = exit code
-            try:
-                wf._dagman_exit_code = int(my_expr.group(1))
-            except ValueError:
-                # Cannot convert exit code to integer!
-                logger.warning("cannot convert DAGMan's exit code to integer!")
-                wf._dagman_exit_code = 0
-                wf._monitord_exit_code = 1
-            logger.info(
-                "DAGMan {} finished with exit code {}".format(
-                    wf._dag_file_name, wf._dagman_exit_code
-                )
-            )
-            # Send info to database
-            wf.change_wf_state("end")
-        elif re_parse_dagman_condor_id.search(log_line) is not None:
-            # DAGMan starting, capture its condor id
-            my_expr = re_parse_dagman_condor_id.search(log_line)
-            wf._dagman_condor_id = my_expr.group(1)
-            if not keep_state:
-                # Initialize workflow parameters
-                wf.start_wf()
-        elif re_parse_dagman_pid.search(log_line) is not None and not replay_mode:
-            # DAGMan's pid, but only set pid if not running in replay mode
-            # (otherwise pid may belong to another process)
-            my_expr = re_parse_dagman_pid.search(log_line)
-            # groups = DAGMan's pid
-            try:
-                wf._dagman_pid = int(my_expr.group(1))
-            except ValueError:
-                logger.critical("cannot set pid: %s" % (my_expr.group(1)))
-                sys.exit(42)
-            logger.info("DAGMan runs at pid %d" % (wf._dagman_pid))
-        elif re_parse_dag_name.search(log_line) is not None:
-            # Found the dag filename, read dag, and generate start event for the database
-            my_expr = re_parse_dag_name.search(log_line)
-            my_dag = my_expr.group(1)
-            # Parse dag file
-            logger.info("using dag %s" % (my_dag))
-
-            # PM-1334 potential fix. we parse dag file now in workflow constructor when we determine
-            # there is a new workflow to track
-            # wf.parse_dag_file(my_dag)
-
-            # Send the delayed workflow start event to database
-            wf.change_wf_state("start")
-        elif re_parse_condor_version.search(log_line) is not None:
-            # Version of this logfile format
-            my_expr = re_parse_condor_version.search(log_line)
-            # groups = condor version, condor major
-            my_condor_version = my_expr.group(1)
-            my_condor_major = int(my_expr.group(2))
-            my_condor_minor = int(my_expr.group(3))
-            my_condor_patch = int(my_expr.group(4))
-            wf.set_dagman_version(my_condor_major, my_condor_minor, my_condor_patch)
-            logger.info(
-                "Using DAGMan version %s %d"
-                % (my_condor_version, wf.get_dagman_version())
-            )
-        elif (
-            re_parse_condor_logfile.search(log_line) is not None
-            or wf._multiline_file_flag is True
-            and re_parse_condor_logfile_insane.search(log_line) is not None
-        ):
-            # Condor common log file location, DAGMan 6.6
-            if re_parse_condor_logfile.search(log_line) is not None:
-                my_expr = re_parse_condor_logfile.search(log_line)
-            else:
-                my_expr = re_parse_condor_logfile_insane.search(log_line)
-            wf._condorlog = my_expr.group(1)
-            logger.info("Condor writes its logfile to %s" % (wf._condorlog))
-
-            # Make a symlink for NFS-secured files
-            my_log, my_base = utils.out2log(wf._run_dir, wf._out_file)
-            if os.path.islink(my_log):
-                logger.info("symlink %s already exists" % (my_log))
-            elif os.access(my_log, os.R_OK):
-                logger.info("%s is a regular file, not touching" % (my_base))
-            else:
-                logger.info("trying to create local symlink to common log")
-                if os.access(wf._condorlog, os.R_OK) or not os.access(
-                    wf._condorlog, os.F_OK
-                ):
-                    if os.access(my_log, os.R_OK):
-                        try:
-                            os.rename(my_log, "%s.bak" % (my_log))
-                        except OSError:
-                            logger.warning(
-                                "error renaming {} to {}.bak".format(my_log, my_log)
-                            )
-                    try:
-                        os.symlink(wf._condorlog, my_log)
-                    except OSError:
-                        logger.info("unable to symlink %s" % (wf._condorlog))
-                    else:
-                        logger.info("symlink {} -> {}".format(wf._condorlog, my_log))
-                else:
-                    logger.info("%s exists but is not readable!" % (wf._condorlog))
-            # We only expect one of such files
-            wf._multiline_file_flag = False
-        elif re_parse_multiline_files.search(log_line) is not None:
-            # Multiline user log files, DAGMan > 6.6
-            wf._multiline_file_flag = True
-        elif log_line.find("Running in RECOVERY mode...") >= 0:
-            # Entering recovery mode, skip lines until we reach the end
-            logger.info("Enabling DAGMAN RECOVERY MODE")
-            wf._skipping_recovery_lines = True
-            return
-        elif re_parse_dagman_aborted.search(log_line) is not None:
-            # PM-767 dagman was aborted. just log in monitord log
-            # eventually the dagman exit line will trigger failure in the DB
-            logger.warning(
-                "DAGMan was aborted for workflow running in directory %s" % wf._run_dir
-            )
-            wf._current_state_reason = "DAGMan aborted as it received SIGUSR1 signal."
-            return
-        elif re_parse_job_held.search(log_line) is not None:
-            # PM-749  figure out reason for job held
-            my_expr = re_parse_job_held.search(log_line)
-            my_held_reason = my_expr.group(1)
-
-            # figure out which job  was held
-            # the log line has no info. so try to fallback on last job
-            last_job = wf._last_known_job
-            if last_job is None or last_job._job_state != "JOB_HELD":
-                logger.error(
-                    "Last known job %s is not held. Parsed  held job with reason %s "
-                    % (last_job, my_held_reason)
-                )
-
-            # PM-749 insert a new JOB_HELD_REASON event that connects to held job
-            my_event = "JOB_HELD_REASON"
-            my_jobid = last_job._exec_job_id
-            my_sched_id = last_job._sched_id
-            my_job_submit_seq = add(
-                wf, my_jobid, my_event, sched_id=my_sched_id, reason=my_held_reason
-            )
+        return dispatch_dagman_out(wf, log_line)
     else:
         # Could not parse timestamp
         logger.info("time stamp format not recognized")
@@ -1094,7 +1303,7 @@ def prog_sighup_handler(signum, frame):
 
 def prog_sigint_handler(signum, frame):
     """
-    This function catches SIGINT.
+    This function catches SIGINT and SIGTERM.
     """
     logger.warning("graceful exit on signal %d" % (signum))
     # Go through all workflows we are tracking
@@ -1153,6 +1362,7 @@ signal.signal(signal.SIGHUP, prog_sighup_handler)
 
 # Die nicely when asked to (Ctrl+C, system shutdown)
 signal.signal(signal.SIGINT, prog_sigint_handler)
+signal.signal(signal.SIGTERM, prog_sigint_handler)
 
 # Permit dynamic changes of debug level
 signal.signal(signal.SIGUSR1, prog_sigusr1_handler)
@@ -1194,6 +1404,11 @@ else:
             props=props,
             db_type=connection.DBType.WORKFLOW,
             backup=backup,
+            flush_mode=db_flush_mode,
+            cache_size=db_cache_size,
+            queue_size=db_queue_size,
+            buffer_size=events_buffer_size,
+            framing=events_framing,
         )
         atexit.register(finish_stampede_loader)
     except Exception:
@@ -1293,6 +1508,13 @@ if do_notifications is True:
     )
     atexit.register(finish_notifications)
 
+# Start the workers parsing job outputs in the background
+if parser_workers > 0:
+    job_output_pool = parsepool.JobOutputParserPool(
+        parser_workers, pool_type=parser_pool_type
+    )
+    atexit.register(close_job_output_pool)
+
 # Ok! Let's start now...
 
 # Instantiate workflow class
@@ -1308,6 +1530,7 @@ wf = Workflow(
     output_dir=output_dir,
     store_stdout_stderr=store_stdout_stderr,
     notifications_manager=monitord_notifications,
+    job_output_pool=job_output_pool,
 )
 # If everything went well, create a workflow entry for this workflow
 if wf._monitord_exit_code == 0:
@@ -1325,6 +1548,11 @@ if wf._monitord_exit_code == 0:
     # Also set the root workflow id
     root_wf_id = wf._wf_uuid
 
+# Replay mode never sleeps, so there is nothing to watch
+file_watcher = filewatch.create_file_watcher(use_inotify and not replay_mode)
+for workflow_entry in wfs:
+    file_watcher.watch(workflow_entry.dagman_out)
+
 #
 # --- main loop begin --------------------------------------------------------------------
 #
@@ -1529,18 +1757,12 @@ while len(wfs) > 0:
                     workflow_entry.DMOF.seek(workflow_entry.ml_current)
                 else:
                     # Something in the read buffer, merge it with our buffer
-                    workflow_entry.ml_buffer = workflow_entry.ml_buffer + ml_rbuffer
-                    # Look for end of line
-                    ml_pos = workflow_entry.ml_buffer.find("\n")
-                    while ml_pos >= 0:
-                        # Take out 1 line, and adjust buffer
-                        process_output = process_dagman_out(
-                            workflow_entry.wf, workflow_entry.ml_buffer[0:ml_pos]
-                        )
-                        workflow_entry.ml_buffer = workflow_entry.ml_buffer[
-                            ml_pos + 1 :
-                        ]
-                        ml_pos = workflow_entry.ml_buffer.find("\n")
+                    # and split it into lines, keeping any incomplete last line
+                    ml_lines, workflow_entry.ml_buffer = filewatch.split_lines(
+                        workflow_entry.ml_buffer + ml_rbuffer
+                    )
+                    for ml_line in ml_lines:
+                        process_output = process_dagman_out(workflow_entry.wf, ml_line)
 
                         # Do we need to start following another workflow?
                         if (
@@ -1603,6 +1825,7 @@ while len(wfs) > 0:
                                     output_dir=output_dir,
                                     store_stdout_stderr=store_stdout_stderr,
                                     notifications_manager=monitord_notifications,
+                                    job_output_pool=job_output_pool,
                                 )
 
                                 if new_wf._monitord_exit_code == 0:
@@ -1613,6 +1836,7 @@ while len(wfs) > 0:
 
                                     # And add it to our list of workflows
                                     wfs.append(new_workflow_entry)
+                                    file_watcher.watch(new_dagman_out)
                                     # Don't forget to add it to our list, so we don't do it again in replay mode
                                     if replay_mode:
                                         tracked_workflows.append(new_dagman_out)
@@ -1677,6 +1901,7 @@ while len(wfs) > 0:
             #                workflow_entry.wf.end_workflow()
             # Delete this workflow from our list
             deleted_entry = wfs.pop(wf_index)
+            file_watcher.unwatch(deleted_entry.dagman_out)
             # Don't move index to next one
         else:
             # Mode index to next workflow
@@ -1715,12 +1940,15 @@ while len(wfs) > 0:
         time_to_sleep = time_to_sleep - time.time()
         if time_to_sleep < 0:
             time_to_sleep = 0
-        time.sleep(time_to_sleep)
+        # Wake up early if any of the dagman.out files changes
+        file_watcher.wait(time_to_sleep)
 
 #
 # --- main loop end -----------------------------------------------------------------------
 #
 
+file_watcher.close()
+
 if do_notifications is True and monitord_notifications is not None:
     logger.info("finishing notifications...")
     while (
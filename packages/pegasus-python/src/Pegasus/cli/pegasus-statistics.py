@@ -1,11 +1,15 @@
 #!/usr/bin/env python3
 
 import logging
+import multiprocessing
 import optparse
 import os
 import re
+import shutil
 import sys
+import tempfile
 import traceback
+from collections import OrderedDict
 
 from Pegasus.db import connection
 from Pegasus.db.workflow.stampede_statistics import StampedeStatistics
@@ -45,6 +49,12 @@ FILE_TYPE_TXT = "text"
 FILE_TYPE_CSV = "csv"
 uses_PMC = False
 
+# Statistics types computed for each workflow
+STATS_JOBS = "jb_stats"
+STATS_TRANSFORMATIONS = "tf_stats"
+STATS_INTEGRITY = "int_stats"
+STATS_WORKFLOW = "wf_stats"
+
 # Transformations file column names
 transformation_stats_col_name_text = [
     "Transformation",
@@ -458,11 +468,15 @@ def write_to_file(file_path, mode, content):
     Utility method for writing content to a given file
     @param file_path :  file path
     @param mode :   file writing mode 'a' append , 'w' write
-    @param content :  content to write to file
+    @param content :  content to write to file, either a string or an iterable
+                      of strings which are written as they are produced
     """
     try:
         fh = open(file_path, mode)
-        fh.write(content)
+        if isinstance(content, str):
+            fh.write(content)
+        else:
+            fh.writelines(content)
     except OSError:
         logger.error("Unable to write to file " + file_path)
         sys.exit(1)
@@ -528,14 +542,173 @@ def print_row(row, sizes, fmt):
         sys.exit(1)
 
 
-def print_workflow_details(output_db_url, wf_uuid, output_dir, multiple_wf=False):
+def _load_individual_workflow_stats(output_db_url, sub_wf_uuid):
+    """
+    Returns the statistics object of a single workflow, or None if the workflow
+    could not be loaded
+    @param output_db_url : URL of stampede DB
+    @param sub_wf_uuid   : uuid of the workflow
+    """
+    try:
+        individual_workflow_stats = StampedeStatistics(output_db_url, False)
+        wf_found = individual_workflow_stats.initialize(sub_wf_uuid)
+
+        if wf_found is False:
+            print("Workflow %r not found in database %r" % (sub_wf_uuid, output_db_url))
+            return None
+    except Exception:
+        logger.error("Failed to load the database." + output_db_url)
+        logger.warning(traceback.format_exc())
+        return None
+
+    return individual_workflow_stats
+
+
+def individual_workflow_reports(output_db_url, sub_wf_uuid, stat_types):
+    """
+    Generates the per workflow statistics reports of a workflow. Returns a
+    generator of (stat_type, content) tuples, in the order of INDIVIDUAL_STATS,
+    or None if the workflow could not be loaded. Statistics types removed from
+    stat_types while iterating are skipped.
+    @param output_db_url : URL of stampede DB
+    @param sub_wf_uuid   : uuid of the workflow
+    @param stat_types    : statistics types to generate
+    """
+    individual_workflow_stats = _load_individual_workflow_stats(
+        output_db_url, sub_wf_uuid
+    )
+    if individual_workflow_stats is None:
+        return None
+
+    def reports():
+        wf_det = individual_workflow_stats.get_workflow_details()[0]
+
+        workflow_id = str(sub_wf_uuid)
+        dax_label = str(wf_det.dax_label)
+        logger.info(
+            "Generating statistics information about the workflow "
+            + workflow_id
+            + " ... "
+        )
+        fmt = "text" if file_type == FILE_TYPE_TXT else "csv"
+
+        try:
+            for stat_type, (description, print_stats) in INDIVIDUAL_STATS.items():
+                if stat_type not in stat_types:
+                    continue
+
+                logger.debug(
+                    "Generating %s statistics information for workflow %s ... "
+                    % (description, workflow_id)
+                )
+                individual_workflow_stats.set_job_filter("all")
+                try:
+                    content = print_stats(
+                        individual_workflow_stats, workflow_id, dax_label, fmt
+                    )
+                except Exception:
+                    logger.debug(
+                        "%s statistics generation failed" % description, exc_info=1
+                    )
+                    content = None
+
+                yield stat_type, content
+        finally:
+            individual_workflow_stats.close()
+
+    return reports()
+
+
+def _init_worker(output_db_url, output_file_type, pmc):
+    """
+    Initializes the module settings of a statistics worker process
+    """
+    global file_type, uses_PMC
+    file_type = output_file_type
+    uses_PMC = pmc
+
+    # the schema was verified by the main process, verify it once per worker
+    # without printing the database version again
+    connection.connect(output_db_url, print_version=False).close()
+
+
+def _individual_workflow_reports_worker(args):
+    """
+    Computes the per workflow statistics reports of a workflow in a worker
+    process. Each worker uses its own database session. The reports are
+    streamed to files in report_dir, so that they are neither held in memory
+    nor sent back to the main process, and their paths are returned. The
+    path of a report that failed is None.
+    """
+    output_db_url, sub_wf_uuid, stat_types, report_dir = args
+    reports = individual_workflow_reports(output_db_url, sub_wf_uuid, stat_types)
+    if reports is None:
+        return sub_wf_uuid, None
+
+    results = []
+    for stat_type, content in reports:
+        path = None
+        if content is not None:
+            fd, path = tempfile.mkstemp(prefix=stat_type + "-", dir=report_dir)
+            try:
+                with os.fdopen(fd, "w") as fh:
+                    if isinstance(content, str):
+                        fh.write(content)
+                    else:
+                        fh.writelines(content)
+            except Exception:
+                description = INDIVIDUAL_STATS[stat_type][0]
+                logger.debug(
+                    "%s statistics generation failed" % description, exc_info=1
+                )
+                remove_file(path)
+                path = None
+        results.append((stat_type, path))
+
+    return sub_wf_uuid, results
+
+
+def _read_report(path, chunk_size=2 ** 20):
+    """
+    Yields the content of a report file written by a worker process in
+    chunks, and removes the file once it has been read
+    """
+    try:
+        with open(path) as fh:
+            while True:
+                chunk = fh.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        remove_file(path)
+
+
+def _report_files(reports):
+    """
+    Turns the report paths returned by _individual_workflow_reports_worker
+    into the content of the reports, as returned by individual_workflow_reports
+    """
+    if reports is None:
+        return None
+    return [
+        (stat_type, None if path is None else _read_report(path))
+        for stat_type, path in reports
+    ]
+
+
+def print_workflow_details(
+    output_db_url, wf_uuid, output_dir, multiple_wf=False, jobs=1
+):
     """
     Prints the workflow statistics information of all workflows
     @param output_db_url : URL of stampede DB
     @param wf_uuid       : uuid of the top level workflow
     @param output_dir    : directory to write output files
+    @param jobs          : number of workflows to compute statistics for in parallel
     """
     errors = 0
+    individual_stats_files = {}
     try:
         if multiple_wf:
             expanded_workflow_stats = StampedeWorkflowStatistics(output_db_url)
@@ -578,6 +751,7 @@ def print_workflow_details(output_db_url, wf_uuid, output_dir, multiple_wf=False
                 workflow_status_col_name_text, workflow_status_col_size, "text"
             )
             write_to_file(wf_stats_file_txt, "a", header)
+            individual_stats_files[STATS_WORKFLOW] = wf_stats_file_txt
 
         if file_type == FILE_TYPE_CSV:
             wf_stats_file_csv = os.path.join(
@@ -588,6 +762,7 @@ def print_workflow_details(output_db_url, wf_uuid, output_dir, multiple_wf=False
                 workflow_status_col_name_csv, workflow_status_col_size, "csv"
             )
             write_to_file(wf_stats_file_csv, "a", header)
+            individual_stats_files[STATS_WORKFLOW] = wf_stats_file_csv
 
     global calc_jb_stats
     if calc_jb_stats:
@@ -596,12 +771,14 @@ def print_workflow_details(output_db_url, wf_uuid, output_dir, multiple_wf=False
         )
         if file_type == FILE_TYPE_TXT:
             write_to_file(jobs_stats_file_txt, "w", formatted_job_stats_legends())
+            individual_stats_files[STATS_JOBS] = jobs_stats_file_txt
 
         jobs_stats_file_csv = os.path.join(
             output_dir, job_statistics_file_name + csv_file_extension
         )
         if file_type == FILE_TYPE_CSV:
             write_to_file(jobs_stats_file_csv, "w", formatted_job_stats_legends())
+            individual_stats_files[STATS_JOBS] = jobs_stats_file_csv
 
     global calc_tf_stats
     if calc_tf_stats:
@@ -615,6 +792,9 @@ def print_workflow_details(output_db_url, wf_uuid, output_dir, multiple_wf=False
                 "w",
                 formatted_transformation_stats_legends(),
             )
+            individual_stats_files[
+                STATS_TRANSFORMATIONS
+            ] = transformation_stats_file_txt
 
         if file_type == FILE_TYPE_CSV:
             transformation_stats_file_csv = os.path.join(
@@ -626,6 +806,9 @@ def print_workflow_details(output_db_url, wf_uuid, output_dir, multiple_wf=False
                 "w",
                 formatted_transformation_stats_legends(),
             )
+            individual_stats_files[
+                STATS_TRANSFORMATIONS
+            ] = transformation_stats_file_csv
 
     global calc_int_stats
     if calc_int_stats:
@@ -636,6 +819,7 @@ def print_workflow_details(output_db_url, wf_uuid, output_dir, multiple_wf=False
             write_to_file(
                 integrity_stats_file_txt, "w", formatted_integrity_stats_legends()
             )
+            individual_stats_files[STATS_INTEGRITY] = integrity_stats_file_txt
 
         if file_type == FILE_TYPE_CSV:
             integrity_stats_file_csv = os.path.join(
@@ -644,6 +828,7 @@ def print_workflow_details(output_db_url, wf_uuid, output_dir, multiple_wf=False
             write_to_file(
                 integrity_stats_file_csv, "w", formatted_integrity_stats_legends()
             )
+            individual_stats_files[STATS_INTEGRITY] = integrity_stats_file_csv
 
     global calc_ti_stats
     if calc_ti_stats:
@@ -695,164 +880,84 @@ def print_workflow_details(output_db_url, wf_uuid, output_dir, multiple_wf=False
 
             errors += 1
 
-    if calc_jb_stats or calc_tf_stats or calc_wf_stats or calc_int_stats:
-        for sub_wf_uuid in wf_uuid_list:
-            try:
-                individual_workflow_stats = StampedeStatistics(output_db_url, False)
-                wf_found = individual_workflow_stats.initialize(sub_wf_uuid)
-
-                if wf_found is False:
-                    print(
-                        "Workflow %r not found in database %r"
-                        % (sub_wf_uuid, output_db_url)
-                    )
-                    sys.exit(1)
-            except Exception:
-                logger.error("Failed to load the database." + output_db_url)
-                logger.warning(traceback.format_exc())
-                sys.exit(1)
-
-            wf_det = individual_workflow_stats.get_workflow_details()[0]
-
-            workflow_id = str(sub_wf_uuid)
-            dax_label = str(wf_det.dax_label)
-            logger.info(
-                "Generating statistics information about the workflow "
-                + workflow_id
-                + " ... "
+    if individual_stats_files:
+        report_dir = None
+        if jobs > 1:
+            report_dir = tempfile.mkdtemp(prefix=".reports-", dir=output_dir)
+            pool = multiprocessing.Pool(
+                jobs,
+                initializer=_init_worker,
+                initargs=(output_db_url, file_type, uses_PMC),
             )
-
-            if calc_jb_stats:
-                try:
-                    logger.debug(
-                        "Generating job instance statistics information for workflow "
-                        + workflow_id
-                        + " ... "
-                    )
-                    individual_workflow_stats.set_job_filter("all")
-
-                    if file_type == FILE_TYPE_TXT:
-                        content = print_individual_wf_job_stats(
-                            individual_workflow_stats, workflow_id, dax_label, "text"
-                        )
-                        write_to_file(jobs_stats_file_txt, "a", content)
-
-                    if file_type == FILE_TYPE_CSV:
-                        content = print_individual_wf_job_stats(
-                            individual_workflow_stats, workflow_id, dax_label, "csv"
-                        )
-                        write_to_file(jobs_stats_file_csv, "a", content)
-                except Exception:
-                    logger.warn("job instance statistics generation failed")
-                    logger.debug(
-                        "job instance statistics generation failed", exc_info=1
-                    )
-
-                    calc_jb_stats = False
-                    if file_type == FILE_TYPE_TXT:
-                        remove_file(jobs_stats_file_txt)
-                    if file_type == FILE_TYPE_CSV:
-                        remove_file(jobs_stats_file_csv)
-
-                    errors += 1
-
-            if calc_tf_stats:
-                try:
-                    logger.debug(
-                        "Generating invocation statistics information for workflow "
-                        + workflow_id
-                        + " ... "
-                    )
-                    individual_workflow_stats.set_job_filter("all")
-                    if file_type == FILE_TYPE_TXT:
-                        content = print_wf_transformation_stats(
-                            individual_workflow_stats, workflow_id, dax_label, "text"
-                        )
-                        write_to_file(transformation_stats_file_txt, "a", content)
-
-                    if file_type == FILE_TYPE_CSV:
-                        content = print_wf_transformation_stats(
-                            individual_workflow_stats, workflow_id, dax_label, "csv"
+            results = (
+                (sub_wf_uuid, _report_files(reports))
+                for sub_wf_uuid, reports in pool.imap(
+                    _individual_workflow_reports_worker,
+                    [
+                        (
+                            output_db_url,
+                            sub_wf_uuid,
+                            list(individual_stats_files),
+                            report_dir,
                         )
-                        write_to_file(transformation_stats_file_csv, "a", content)
-                except Exception:
-                    logger.warn("transformation statistics generation failed")
-                    logger.debug(
-                        "transformation statistics generation failed", exc_info=1
-                    )
-
-                    calc_tf_stats = False
-                    if file_type == FILE_TYPE_TXT:
-                        remove_file(transformation_stats_file_txt)
-                    if file_type == FILE_TYPE_CSV:
-                        remove_file(transformation_stats_file_csv)
-
-                    errors += 1
-
-            if calc_int_stats:
-                try:
-                    logger.debug(
-                        "Generating integrity statistics information for workflow "
-                        + workflow_id
-                        + " ... "
-                    )
-                    individual_workflow_stats.set_job_filter("all")
-                    if file_type == FILE_TYPE_TXT:
-                        content = print_wf_integrity_stats(
-                            individual_workflow_stats, workflow_id, dax_label, "text"
-                        )
-                        write_to_file(integrity_stats_file_txt, "a", content)
-
-                    if file_type == FILE_TYPE_CSV:
-                        content = print_wf_integrity_stats(
-                            individual_workflow_stats, workflow_id, dax_label, "csv"
-                        )
-                        write_to_file(integrity_stats_file_csv, "a", content)
-                except Exception:
-                    logger.error(traceback.format_exc())
-                    logger.warn("integrity statistics generation failed")
-                    logger.debug("integrity statistics generation failed", exc_info=1)
-
-                    calc_int_stats = False
-                    if file_type == FILE_TYPE_TXT:
-                        remove_file(integrity_stats_file_txt)
-                    if file_type == FILE_TYPE_CSV:
-                        remove_file(integrity_stats_file_csv)
-
-                    errors += 1
+                        for sub_wf_uuid in wf_uuid_list
+                    ],
+                )
+            )
+        else:
+            pool = None
+            results = (
+                (
+                    sub_wf_uuid,
+                    individual_workflow_reports(
+                        output_db_url, sub_wf_uuid, individual_stats_files
+                    ),
+                )
+                for sub_wf_uuid in wf_uuid_list
+            )
 
-            if calc_wf_stats:
-                try:
-                    logger.debug(
-                        "Generating workflow statistics information for workflow "
-                        + workflow_id
-                        + " ... "
-                    )
-                    individual_workflow_stats.set_job_filter("all")
-                    if file_type == FILE_TYPE_TXT:
-                        content = print_individual_workflow_stats(
-                            individual_workflow_stats, workflow_id, dax_label, "text"
-                        )
-                        write_to_file(wf_stats_file_txt, "a", content)
+        try:
+            # results are merged in the order of the workflows, whether they
+            # were computed sequentially or by the worker pool
+            for sub_wf_uuid, reports in results:
+                if reports is None:
+                    sys.exit(1)
 
-                    if file_type == FILE_TYPE_CSV:
-                        content = print_individual_workflow_stats(
-                            individual_workflow_stats, workflow_id, dax_label, "csv"
+                for stat_type, content in reports:
+                    if stat_type not in individual_stats_files:
+                        continue
+
+                    stats_file = individual_stats_files[stat_type]
+                    try:
+                        if content is None:
+                            raise ValueError("%s statistics failed" % stat_type)
+                        write_to_file(stats_file, "a", content)
+                    except Exception:
+                        description = INDIVIDUAL_STATS[stat_type][0]
+                        logger.warn("%s statistics generation failed" % description)
+                        logger.debug(
+                            "%s statistics generation failed" % description,
+                            exc_info=1,
                         )
-                        write_to_file(wf_stats_file_csv, "a", content)
-                except Exception:
-                    logger.warn("workflow statistics generation failed")
-                    logger.debug("workflow statistics generation failed", exc_info=1)
-
-                    calc_wf_stats = False
-                    if file_type == FILE_TYPE_TXT:
-                        remove_file(wf_stats_file_txt)
-                    if file_type == FILE_TYPE_CSV:
-                        remove_file(wf_stats_file_csv)
 
-                    errors += 1
-
-            individual_workflow_stats.close()
+                        del individual_stats_files[stat_type]
+                        remove_file(stats_file)
+
+                        errors += 1
+        finally:
+            if pool:
+                pool.terminate()
+                pool.join()
+            if report_dir:
+                # reports of statistics types which failed were not read
+                shutil.rmtree(report_dir, ignore_errors=True)
+
+        calc_jb_stats = calc_jb_stats and STATS_JOBS in individual_stats_files
+        calc_tf_stats = (
+            calc_tf_stats and STATS_TRANSFORMATIONS in individual_stats_files
+        )
+        calc_int_stats = calc_int_stats and STATS_INTEGRITY in individual_stats_files
+        calc_wf_stats = calc_wf_stats and STATS_WORKFLOW in individual_stats_files
 
     #
     # Output printed to console
@@ -1441,33 +1546,15 @@ def print_individual_workflow_stats(
     return content_str
 
 
-def print_individual_wf_job_stats(
-    workflow_stats, workflow_id, dax_label, output_format
-):
+def iter_individual_wf_job_stats(workflow_stats):
     """
-    Prints the job statistics of workflow
+    Iterates over the job statistics of workflow, one JobStatistics per job
+    instance, without loading all job instances into memory
     @param workflow_stats :  workflow statistics object reference
-    @param workflow_id : workflow_id (title for the table)
     """
-    job_stats_list = []
     job_retry_count_dict = {}
 
-    # Add dax_label to workflow_id if writing text file
-    if output_format == "text":
-        workflow_id = workflow_id + " (" + dax_label + ")"
-
-    if output_format == "text":
-        job_status_str = "\n# " + workflow_id + "\n"
-    else:
-        job_status_str = "\n"
-
-    if output_format == "text":
-        max_length = [max(0, len(i)) for i in job_stats_col_name_text]
-
-    wf_job_stats_list = workflow_stats.get_job_statistics()
-
-    # Go through each job in the workflow
-    for job in wf_job_stats_list:
+    for job in workflow_stats.iter_job_statistics():
         job_stats = JobStatistics()
         job_stats.name = job.job_name
         job_stats.site = job.site
@@ -1492,7 +1579,32 @@ def print_individual_wf_job_stats(
             job_retry_count_dict[job.job_name] = 1
         job_stats.retry_count = job_retry_count_dict[job.job_name]
 
-        if output_format == "text":
+        yield job_stats
+
+
+def print_individual_wf_job_stats(
+    workflow_stats, workflow_id, dax_label, output_format
+):
+    """
+    Prints the job statistics of workflow. The report is generated one line at
+    a time, so it can be written to a file as it is produced. In text format
+    the column widths are computed by a first pass over the job instances.
+    @param workflow_stats :  workflow statistics object reference
+    @param workflow_id : workflow_id (title for the table)
+    """
+    # Add dax_label to workflow_id if writing text file
+    if output_format == "text":
+        workflow_id = workflow_id + " (" + dax_label + ")"
+
+    if output_format == "text":
+        yield "\n# " + workflow_id + "\n"
+    else:
+        yield "\n"
+
+    if output_format == "text":
+        max_length = [max(0, len(i)) for i in job_stats_col_name_text]
+
+        for job_stats in iter_individual_wf_job_stats(workflow_stats):
             max_length[0] = max(max_length[0], len(job_stats.name))
             max_length[1] = max(max_length[1], len(str(job_stats.retry_count)))
             max_length[2] = max(max_length[2], len(job_stats.site or " "))
@@ -1512,38 +1624,27 @@ def print_individual_wf_job_stats(
                 len(job_stats.hostname if job_stats.hostname else "None"),
             )
 
-        job_stats_list.append(job_stats)
-
     # Print header
     if output_format == "text":
         max_length = [i + 1 for i in max_length]
-        job_status_str += print_row(job_stats_col_name_text, max_length, output_format)
+        yield print_row(job_stats_col_name_text, max_length, output_format) + "\n"
     else:
-        job_status_str += print_row(
+        yield print_row(
             job_stats_col_name_csv, job_stats_col_size, output_format
-        )
-
-    job_status_str += "\n"
+        ) + "\n"
 
     # printing
-    # find the pretty print length
-    for job_stat in job_stats_list:
+    for job_stat in iter_individual_wf_job_stats(workflow_stats):
         job_det = job_stat.getFormattedJobStatistics()
         if output_format == "text":
-            index = 0
-            for content in job_det:
-                job_status_str += str(content).ljust(max_length[index])
-                index = index + 1
+            line = "".join(
+                str(content).ljust(max_length[index])
+                for index, content in enumerate(job_det)
+            )
         else:
-            job_status_str += workflow_id
-            job_status_str += ","
-            job_status_str += dax_label
-            for content in job_det:
-                job_status_str += "," + str(content)
-
-        job_status_str += NEW_LINE_STR
+            line = ",".join([workflow_id, dax_label] + [str(c) for c in job_det])
 
-    return job_status_str
+        yield line + NEW_LINE_STR
 
 
 def print_wf_transformation_stats(stats, workflow_id, dax_label, fmt):
@@ -1769,6 +1870,17 @@ def print_statistics_by_time_and_host(stats, fmt, combined=True, per_host=True):
     return "\n".join(report)
 
 
+# Per workflow statistics, in the order they are generated for each workflow
+INDIVIDUAL_STATS = OrderedDict(
+    [
+        (STATS_JOBS, ("job instance", print_individual_wf_job_stats)),
+        (STATS_TRANSFORMATIONS, ("transformation", print_wf_transformation_stats)),
+        (STATS_INTEGRITY, ("integrity", print_wf_integrity_stats)),
+        (STATS_WORKFLOW, ("workflow", print_individual_workflow_stats)),
+    ]
+)
+
+
 def main():
     # Configure command line option parser
     prog_usage = (
@@ -1868,6 +1980,15 @@ def main():
         default=False,
         help="Set if the positional arguments are wf uuids",
     )
+    parser.add_option(
+        "-j",
+        "--jobs",
+        action="store",
+        type="int",
+        dest="jobs",
+        default=1,
+        help="Number of workflows to compute statistics for in parallel. Default is '%default'.",
+    )
 
     # Parse command line options
     (options, args) = parser.parse_args()
@@ -1893,6 +2014,10 @@ def main():
             "Invalid value(s) for statistics_level, ignoring %s\n" % ",".join(sl)
         )
 
+    if options.jobs < 1:
+        sys.stderr.write("Invalid value for jobs, must be at least 1\n")
+        sys.exit(1)
+
     # Multiple workflow is set to true if there are multiple positional arguments.
     multiple_wf = options.multiple_wf
 
@@ -2131,7 +2256,11 @@ def main():
 
     if output_db_url is not None:
         errors = print_workflow_details(
-            output_db_url, wf_uuid, output_dir, multiple_wf=multiple_wf
+            output_db_url,
+            wf_uuid,
+            output_dir,
+            multiple_wf=multiple_wf,
+            jobs=options.jobs,
         )
 
         if errors:
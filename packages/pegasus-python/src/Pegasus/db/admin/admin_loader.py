@@ -600,6 +600,7 @@ def _update_version(db, version):
     if db:
         db.add(v)
         db.commit()
+        connection.forget_schema_verification(db.get_bind())
 
 
 def _backup_db(db):
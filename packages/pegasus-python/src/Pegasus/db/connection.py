@@ -20,6 +20,7 @@ import getpass
 import logging
 import os
 import subprocess
+import threading
 from sqlite3 import Connection as SQLite3Connection
 from stat import ST_MODE
 from urllib.parse import urlparse
@@ -30,7 +31,7 @@ from sqlalchemy.engine import Engine
 from Pegasus import user as users
 from Pegasus.tools import properties, utils
 
-__all__ = ["connect"]
+__all__ = ["connect", "dispose_engines"]
 
 log = logging.getLogger(__name__)
 
@@ -85,6 +86,106 @@ class DBKey:
     TIMEOUT = "timeout"
 
 
+# -------------------------------------------------------------------
+# Engine Registry
+#
+# Engines are shared by all connect() calls in a process that use the same
+# URL and connection parameters, so repeated connects reuse a connection pool
+# instead of opening a new one each time. The registry also remembers the
+# database version a URL was verified at, so the schema is only checked once.
+POOL_SIZE = 5
+POOL_MAX_OVERFLOW = 10
+POOL_RECYCLE = 3600  # seconds
+
+_engines = {}
+_engines_lock = threading.Lock()
+_engines_pid = os.getpid()
+
+
+class _EngineRecord:
+    def __init__(self, engine):
+        self.engine = engine
+        # (pegasus_version, force, sqlite file identity) -> verified db version
+        self.verified = {}
+
+
+def _engine_key(dburi, echo, connect_args):
+    return (dburi, bool(echo), tuple(sorted((connect_args or {}).items())))
+
+
+def _get_engine_record(key):
+    """
+    Return the registered engine record for the key, if any. Engines are not
+    shared across processes, so the registry is reset in a forked child.
+    """
+    global _engines_pid
+
+    with _engines_lock:
+        if _engines_pid != os.getpid():
+            # connections belong to the parent process, do not dispose them
+            _engines.clear()
+            _engines_pid = os.getpid()
+        return _engines.get(key)
+
+
+def _create_engine(dburi, echo, connect_args):
+    """
+    Create an engine with pooling parameters suited to the database backend.
+    SQLite uses the SQLAlchemy default pool (no pooling for file databases).
+    """
+    kwargs = {}
+    if urlparse(dburi).scheme != "sqlite":
+        kwargs = {
+            "pool_size": POOL_SIZE,
+            "max_overflow": POOL_MAX_OVERFLOW,
+            "pool_recycle": POOL_RECYCLE,
+            "pool_pre_ping": True,
+        }
+    return create_engine(dburi, echo=echo, connect_args=connect_args, **kwargs)
+
+
+def _is_memory_db(dburi):
+    return urlparse(dburi).scheme == "sqlite" and urlparse(dburi).path in ("", "/")
+
+
+def _db_file_id(dburi):
+    """
+    Identity of a SQLite database file, so that a rotated or replaced file is
+    not considered verified. Other databases are identified by the URL only.
+    """
+    if urlparse(dburi).scheme == "sqlite":
+        try:
+            st = os.stat(urlparse(dburi).path[1:])
+            return (st.st_dev, st.st_ino)
+        except OSError:
+            return None
+    return ()
+
+
+def forget_schema_verification(engine=None):
+    """
+    Forget the verified schema versions of an engine, or of all engines.
+    Must be called whenever the schema of a database is changed.
+    :param engine: SQLAlchemy engine, or None for all registered engines
+    """
+    with _engines_lock:
+        for record in _engines.values():
+            if engine is None or record.engine is engine:
+                record.verified.clear()
+
+
+def dispose_engines():
+    """
+    Dispose all registered engines and close their pooled connections.
+    """
+    with _engines_lock:
+        records = list(_engines.values())
+        _engines.clear()
+
+    for record in records:
+        record.engine.dispose()
+
+
 def connect(
     dburi,
     echo=False,
@@ -123,6 +224,8 @@ def connect(
         mask = _backup_db(dburi)
     init = _db_is_file(dburi)
 
+    record = None
+
     try:
         # parse connection properties
         # PM-898 monitord sends props as None and connect_args has the
@@ -132,10 +235,23 @@ def connect(
             "Connecting to: {} with connection params as {}".format(dburi, connect_args)
         )
 
-        engine = create_engine(
-            dburi, echo=echo, pool_recycle=True, connect_args=connect_args
-        )
-        engine.connect()
+        key = _engine_key(dburi, echo, connect_args)
+        if not _is_memory_db(dburi):
+            record = _get_engine_record(key)
+
+        if record:
+            engine = record.engine
+            if backup or not init:
+                # the database file was rotated or has just been created
+                record.verified.clear()
+        else:
+            engine = _create_engine(dburi, echo, connect_args)
+            engine.connect().close()
+            if not _is_memory_db(dburi):
+                with _engines_lock:
+                    record = _engines.setdefault(key, _EngineRecord(engine))
+                engine = record.engine
+
         if backup or not init:
             _check_db_permissions(dburi, db_type, mask)
 
@@ -161,6 +277,8 @@ def connect(
 
     # Database creation
     if create:
+        if record:
+            record.verified.clear()
         try:
             from Pegasus.db.admin.admin_loader import db_create
 
@@ -216,8 +334,20 @@ def connect(
                 )
 
     if not create and schema_check:
+        verified_key = (pegasus_version, force, _db_file_id(dburi))
+        if record and verified_key in record.verified:
+            log.debug(
+                "Database schema already verified at version %s (%s)"
+                % (record.verified[verified_key], dburi)
+            )
+            return db
+
         try:
-            from Pegasus.db.admin.admin_loader import DBAdminError, db_verify
+            from Pegasus.db.admin.admin_loader import (
+                DBAdminError,
+                db_verify,
+                get_version,
+            )
 
             db = orm.scoped_session(Session)
             db_verify(
@@ -231,6 +361,9 @@ def connect(
             e.db_type = db_type
             raise (e)
 
+        if record and verified_key[2] is not None:
+            record.verified[verified_key] = get_version(db)
+
     return db
 
 
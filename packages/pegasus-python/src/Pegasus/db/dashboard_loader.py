@@ -66,6 +66,7 @@ class DashboardLoader(BaseLoader):
         self._perf = perf
         if self._perf:
             self._insert_time, self._insert_num = 0, 0
+            self._flush_time, self._flush_num = 0, 0
             self._start_time = time.time()
 
         # caches for batched events
@@ -242,7 +243,10 @@ class DashboardLoader(BaseLoader):
         self.reset_flush_state()
 
         if self._perf:
-            self.log.info("Hard flush duration: %s", (time.time() - s))
+            duration = time.time() - s
+            self._flush_time += duration
+            self._flush_num += 1
+            self.log.info("Hard flush duration: %s", duration)
 
     #############################################
     # Methods to handle the various insert events
@@ -401,10 +405,13 @@ class DashboardLoader(BaseLoader):
             run_time = time.time() - self._start_time
             self.log.info(
                 "Loader performance: insert_time=%s, insert_num=%s, "
-                "total_time=%s, run_time_delta=%s, mean_time=%s",
+                "total_time=%s, run_time_delta=%s, mean_time=%s, "
+                "flush_time=%s, flush_num=%s",
                 self._insert_time,
                 self._insert_num,
                 run_time,
                 run_time - self._insert_time,
                 self._insert_time / self._insert_num,
+                self._flush_time,
+                self._flush_num,
             )
@@ -131,6 +131,7 @@ Methods::
  get_workflow_details
  get_workflow_retries
  get_job_statistics
+ iter_job_statistics
  get_job_states
  get_job_instance_sub_wf_map
  get_failed_job_instances
@@ -1083,12 +1084,19 @@ class StampedeStatistics:
     # https://confluence.pegasus.isi.edu/display/pegasus/Job+Statistics+file
     #
 
-    def get_job_statistics(self):
+    def get_job_statistics(self, single_pass=False):
         """
         https://confluence.pegasus.isi.edu/display/pegasus/Job+Statistics+file#JobStatisticsfile-All
+
+        :param single_pass: compute the statistics with one grouped aggregation
+                            per table instead of correlated subqueries per job
+                            instance, which is much faster on large databases
         """
         if self._expand:
             return []
+        if single_pass:
+            return self._get_job_statistics_single_pass().all()
+
         sq_1 = self.session.query(func.min(Jobstate.timestamp))
         sq_1 = sq_1.filter(
             Jobstate.job_instance_id == JobInstance.job_instance_id
@@ -1214,6 +1222,103 @@ class StampedeStatistics:
 
         return q.all()
 
+    def _get_job_statistics_single_pass(self):
+        """
+        Same columns as get_job_statistics, computed with a single grouped
+        aggregation over Jobstate and one over Invocation, which are then
+        joined to the job instances.
+        """
+
+        def _state_ts(*states):
+            return case([(Jobstate.state.in_(states), Jobstate.timestamp)])
+
+        def _inv_value(value, min_submit_seq=0):
+            return case([(Invocation.task_submit_seq >= min_submit_seq, value)])
+
+        sq_states = self.session.query(
+            Jobstate.job_instance_id.label("job_instance_id"),
+            func.min(_state_ts("GRID_SUBMIT", "GLOBUS_SUBMIT", "EXECUTE")).label(
+                "first_submit"
+            ),
+            func.min(_state_ts("SUBMIT")).label("submit"),
+            func.min(_state_ts("EXECUTE")).label("execute"),
+            func.min(_state_ts("GRID_SUBMIT", "GLOBUS_SUBMIT")).label("grid_submit"),
+            func.min(_state_ts("POST_SCRIPT_TERMINATED")).label("post_terminated"),
+            func.max(_state_ts("POST_SCRIPT_STARTED", "JOB_TERMINATED")).label(
+                "post_started"
+            ),
+        )
+        sq_states = sq_states.filter(
+            Jobstate.job_instance_id == JobInstance.job_instance_id
+        )
+        sq_states = sq_states.filter(JobInstance.job_id == Job.job_id)
+        sq_states = sq_states.filter(Job.wf_id.in_(self._wfs))
+        sq_states = sq_states.group_by(Jobstate.job_instance_id).subquery()
+
+        sq_inv = self.session.query(
+            Invocation.job_instance_id.label("job_instance_id"),
+            func.sum(_inv_value(Invocation.remote_duration)).label("kickstart"),
+            # PM-704 the task submit sequence needs to be >= -1 to include prescript status
+            func.max(_inv_value(Invocation.exitcode, -1)).label("exit_code"),
+            func.sum(
+                _inv_value(Invocation.remote_duration * JobInstance.multiplier_factor)
+            ).label("kickstart_multi"),
+            func.sum(_inv_value(Invocation.remote_cpu_time)).label("remote_cpu_time"),
+        )
+        sq_inv = sq_inv.filter(
+            Invocation.job_instance_id == JobInstance.job_instance_id
+        )
+        sq_inv = sq_inv.filter(JobInstance.job_id == Job.job_id)
+        sq_inv = sq_inv.filter(Invocation.wf_id == Job.wf_id)
+        sq_inv = sq_inv.filter(Job.wf_id.in_(self._wfs))
+        sq_inv = sq_inv.group_by(Invocation.job_instance_id).subquery()
+
+        q = self.session.query(
+            Job.job_id,
+            JobInstance.job_instance_id,
+            JobInstance.job_submit_seq,
+            Job.exec_job_id.label("job_name"),
+            JobInstance.site,
+            cast(sq_states.c.first_submit - sq_states.c.submit, Float).label(
+                "condor_q_time"
+            ),
+            cast(sq_states.c.execute - sq_states.c.grid_submit, Float).label(
+                "resource_delay"
+            ),
+            cast(JobInstance.local_duration, Float).label("runtime"),
+            cast(sq_inv.c.kickstart, Float).label("kickstart"),
+            cast(sq_states.c.post_terminated - sq_states.c.post_started, Float).label(
+                "post_time"
+            ),
+            cast(JobInstance.cluster_duration, Float).label("seqexec"),
+            sq_inv.c.exit_code,
+            Host.hostname.label("host_name"),
+            JobInstance.multiplier_factor,
+            cast(sq_inv.c.kickstart_multi, Float).label("kickstart_multi"),
+            sq_inv.c.remote_cpu_time,
+        )
+        q = q.join(JobInstance, JobInstance.job_id == Job.job_id)
+        q = q.outerjoin(
+            sq_states, sq_states.c.job_instance_id == JobInstance.job_instance_id
+        )
+        q = q.outerjoin(sq_inv, sq_inv.c.job_instance_id == JobInstance.job_instance_id)
+        q = q.outerjoin(Host, Host.host_id == JobInstance.host_id)
+        q = q.filter(Job.wf_id.in_(self._wfs))
+        q = q.order_by(JobInstance.job_submit_seq)
+
+        return q
+
+    def iter_job_statistics(self, batch_size=1000):
+        """
+        Iterate over the rows of get_job_statistics(single_pass=True) without
+        loading the whole result into memory.
+
+        :param batch_size: number of rows fetched from the database at a time
+        """
+        if self._expand:
+            return iter([])
+        return iter(self._get_job_statistics_single_pass().yield_per(batch_size))
+
     def _state_sub_q(self, states, function=None):
         sq = None
         if not function:
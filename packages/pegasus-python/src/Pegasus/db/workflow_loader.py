@@ -2,14 +2,93 @@ __author__ = "Monte Goode"
 __author__ = "Karan Vahi"
 
 import time
+from collections import OrderedDict
 
-from sqlalchemy import exc, orm
+from sqlalchemy import bindparam, exc, orm
 
 from Pegasus.db.base_loader import BaseLoader
 from Pegasus.db.schema import *
 from Pegasus.netlogger import util
 
 
+class LRUCache:
+    """
+    A mapping that holds at most max_size entries, evicting the least
+    recently used entry once it is full. Lookups through get() are
+    counted as hits or misses.
+    """
+
+    def __init__(self, max_size=None):
+        """
+        :param max_size: maximum number of entries, None or 0 for unbounded
+        """
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, key, default=None):
+        try:
+            value = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if self.max_size:
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __repr__(self):
+        return "<LRUCache size=%d max_size=%s hits=%d misses=%d>" % (
+            len(self),
+            self.max_size,
+            self.hits,
+            self.misses,
+        )
+
+
+class WorkflowCache:
+    """
+    The lookup caches of a single workflow. The loader keeps one instance
+    per wf_id and drops it when the workflow ends, so that memory does not
+    grow with the number of (sub) workflows that have been loaded.
+    """
+
+    def __init__(self, max_size=None):
+        """
+        :param max_size: maximum number of entries of each cache
+        """
+        self.task_id = LRUCache(max_size)  # abs_task_id -> task_id
+        self.lfn_id = LRUCache(max_size)  # lfn -> lfn_id
+        self.job_id = LRUCache(max_size)  # exec_job_id -> job_id
+        # (job_id, job_submit_seq) -> job_instance_id
+        self.job_instance_id = LRUCache(max_size)
+        # (job_id, job_submit_seq) of job instances mapped to a host
+        self.host = LRUCache(max_size)
+
+    def stats(self):
+        """
+        :return: dict mapping cache name to (size, hits, misses)
+        """
+        return {
+            name: (len(cache), cache.hits, cache.misses)
+            for name, cache in vars(self).items()
+        }
+
+
 class WorkflowLoader(BaseLoader):
     """Load into the Stampede SQL schema through SQLAlchemy.
 
@@ -27,6 +106,12 @@ class WorkflowLoader(BaseLoader):
 
     MAX_RETRIES = 10  # maximum number of retries in case of operational errors that arise because of database locked/connection dropped
 
+    FLUSH_MODE_ORM = "orm"  # batched events go through the session unit of work
+    FLUSH_MODE_BULK = "bulk"  # batched events are inserted per table via executemany
+    FLUSH_MODES = (FLUSH_MODE_ORM, FLUSH_MODE_BULK)
+
+    DEFAULT_CACHE_SIZE = 100000  # maximum entries per lookup cache per workflow
+
     def __init__(
         self,
         connString,
@@ -35,11 +120,19 @@ class WorkflowLoader(BaseLoader):
         props=None,
         db_type=None,
         backup=False,
+        flush_mode=None,
+        cache_size=None,
     ):
         """Init object
 
         @type   connString: string
         @param  connString: SQLAlchemy connection string - REQUIRED
+        @type   flush_mode: string
+        @param  flush_mode: How batched events are written on a hard flush.
+                One of FLUSH_MODES, defaults to FLUSH_MODE_ORM.
+        @type   cache_size: int
+        @param  cache_size: Maximum number of entries in each per workflow
+                lookup cache, 0 for unbounded. Defaults to DEFAULT_CACHE_SIZE.
         """
         super().__init__(
             connString,
@@ -101,17 +194,30 @@ class WorkflowLoader(BaseLoader):
         # Dicts for caching FK lookups
         self.wf_id_cache = {}
         self.root_wf_id_cache = {}
-        self.task_id_cache = {}  # for task metadata population
-        self.lfn_id_cache = {}  # for file metadata population
-        self.job_id_cache = {}
-        self.job_instance_id_cache = {}
-        self.host_cache = {}
         self.hosts_written_cache = None
 
+        # per workflow caches for the job, job instance, task, lfn and host
+        # lookups, keyed by wf_id and dropped on a workflow end event
+        if cache_size is None:
+            cache_size = self.DEFAULT_CACHE_SIZE
+        self._cache_size = int(cache_size)
+        self._wf_caches = {}
+
+        if flush_mode is None:
+            flush_mode = self.FLUSH_MODE_ORM
+        if flush_mode not in self.FLUSH_MODES:
+            raise ValueError(
+                "Invalid flush mode '%s'. Valid values are %s"
+                % (flush_mode, ", ".join(self.FLUSH_MODES))
+            )
+        self._flush_mode = flush_mode
+        self.log.debug("Using flush mode %s", self._flush_mode)
+
         # undocumented performance option
         self._perf = perf
         if self._perf:
             self._insert_time, self._insert_num = 0, 0
+            self._flush_time, self._flush_num = 0, 0
             self._start_time = time.time()
 
         # caches for batched events
@@ -119,6 +225,7 @@ class WorkflowLoader(BaseLoader):
             "batch_events": [],
             "update_events": [],
             "host_map_events": [],
+            "task_map_events": [],
         }
         self._task_map_flush = {}
         self._task_edge_flush = {}
@@ -274,6 +381,10 @@ class WorkflowLoader(BaseLoader):
         causes each insert/object to be committed individually
         so all the "good" inserts can succeed.  This will increase
         the processing time of the batch with the bad data in it.
+
+        In the bulk flush mode the queued inserts are written per table
+        by _bulk_insert_events, which isolates bad rows on its own, so
+        batch_flush only affects the queued updates.
         """
         if not self._batch:
             return
@@ -298,28 +409,49 @@ class WorkflowLoader(BaseLoader):
             s = time.time()
 
         end_event = []
+        bulk = self._flush_mode == self.FLUSH_MODE_BULK
+        num_rows = (
+            len(self._batch_cache["batch_events"])
+            + len(self._batch_cache["update_events"])
+            + len(self._batch_cache["task_map_events"])
+        )
 
         self.log.debug(
-            "Batch event sizes: batch_event_size=%s update_event_size=%s",
+            "Batch event sizes: batch_event_size=%s update_event_size=%s task_map_event_size=%s",
             len(self._batch_cache["batch_events"]),
             len(self._batch_cache["update_events"]),
+            len(self._batch_cache["task_map_events"]),
         )
 
         for event in self._batch_cache["batch_events"]:
             if event.event == "stampede.xwf.end":
                 end_event.append(event)
+            if bulk:
+                # inserted by _bulk_insert_events below
+                continue
             if batch_flush:
                 self.session.add(event)
             else:
                 self.individual_commit(event)
 
-        for event in self._batch_cache["update_events"]:
-            if batch_flush:
-                self.session.merge(event)
-            else:
-                self.individual_commit(event, merge=True)
-
         try:
+            if bulk:
+                # the inserts are committed before the updates are merged
+                # into the session, so that a rollback while isolating bad
+                # rows does not discard the pending updates
+                self._bulk_insert_events()
+
+            for event in self._batch_cache["update_events"]:
+                if batch_flush:
+                    self.session.merge(event)
+                else:
+                    self.individual_commit(event, merge=True)
+
+            if self._batch_cache["task_map_events"]:
+                # the mapped tasks may still be pending in the session
+                self.session.flush()
+                self.update_task_job_ids(self._batch_cache["task_map_events"])
+
             self.session.commit()
         except exc.IntegrityError as e:
             self.log.exception(e)
@@ -366,7 +498,98 @@ class WorkflowLoader(BaseLoader):
         self.log.debug("Hard flush end")
 
         if self._perf:
-            self.log.debug("Hard flush duration: %s", (time.time() - s))
+            duration = time.time() - s
+            self._flush_time += duration
+            self._flush_num += 1
+            self.log.debug(
+                "Hard flush duration: %s rows: %s rows/sec: %s",
+                duration,
+                num_rows,
+                num_rows / duration if duration > 0 else num_rows,
+            )
+
+    def _bulk_insert_events(self):
+        """
+        Inserts the queued batch events with one executemany per table,
+        bypassing the session unit of work. Events are grouped by table
+        and by the set of columns they populate, so that unset columns
+        still get their schema defaults, and the groups are written in
+        foreign key dependency order.
+
+        Every group is committed on its own and then dropped from the
+        batch cache, so a retry after a connection problem only writes
+        the groups that are still pending.
+
+        :return: number of rows inserted
+        """
+        table_order = {
+            table: i for i, table in enumerate(Workflow.metadata.sorted_tables)
+        }
+
+        groups = {}
+        for event in self._batch_cache["batch_events"]:
+            table, row = self._event_to_row(event)
+            groups.setdefault((table, tuple(sorted(row))), []).append((event, row))
+
+        num_rows = 0
+        done = set()
+        try:
+            for key in sorted(groups, key=lambda k: table_order[k[0]]):
+                group = groups[key]
+                num_rows += self._bulk_insert(key[0], [row for _, row in group])
+                done.update(id(event) for event, _ in group)
+        finally:
+            self._batch_cache["batch_events"] = [
+                event
+                for event in self._batch_cache["batch_events"]
+                if id(event) not in done
+            ]
+
+        return num_rows
+
+    def _bulk_insert(self, table, rows):
+        """
+        Inserts and commits rows into a table in one executemany.
+        If the insert violates the schema, the rows are bisected until
+        the offending rows are isolated and logged, so that all the
+        "good" rows are still written with a logarithmic number of
+        additional statements.
+
+        :param table: sqlalchemy Table to insert into
+        :param rows: list of dictionaries mapping column names to values
+        :return: number of rows inserted
+        """
+        try:
+            self.session.execute(table.insert(), rows)
+            self.session.commit()
+            return len(rows)
+        except exc.IntegrityError as e:
+            self.session.rollback()
+            if len(rows) == 1:
+                self.log.error(
+                    "Insert failed for row %s in table %s : %s", rows[0], table.name, e
+                )
+                return 0
+
+        mid = len(rows) // 2
+        return self._bulk_insert(table, rows[:mid]) + self._bulk_insert(
+            table, rows[mid:]
+        )
+
+    def _event_to_row(self, event):
+        """
+        @type   event: class instance
+        @param  event: Mapper object populated by linedataToObject
+
+        Returns the table of the mapper object and a dictionary with the
+        values of the columns that have been set on it.
+        """
+        mapper = orm.object_mapper(event)
+        row = {}
+        for prop in mapper.column_attrs:
+            if prop.key in event.__dict__:
+                row[prop.columns[0].key] = event.__dict__[prop.key]
+        return mapper.local_table, row
 
     #############################################
     # Methods to handle the various insert events
@@ -677,6 +900,8 @@ class WorkflowLoader(BaseLoader):
             if self._batch:
                 self.hard_flush()
             self._task_map_flush[linedata["xwf.id"]] = True
+            # all the jobs and tasks are in the database now
+            self.preload_wf_ids(self.wf_uuid_to_id(linedata["xwf.id"]))
 
         wf_id = self.wf_uuid_to_id(linedata["xwf.id"])
         job_id = self.get_job_id(wf_id, linedata["job.id"])
@@ -685,25 +910,19 @@ class WorkflowLoader(BaseLoader):
             self.log.error("Could not determine job_id for task map: %s", linedata)
             return
 
-        try:
-            task = (
-                self.session.query(Task)
-                .filter(Task.wf_id == wf_id)
-                .filter(Task.abs_task_id == linedata["task.id"])
-                .one()
-            )
-            task.job_id = job_id
-        except orm.exc.MultipleResultsFound as e:
-            self.log.error("Multiple task results: cant map task: %s ", linedata)
-            return
-        except orm.exc.NoResultFound as e:
+        task_id = self.get_task_id(wf_id, linedata["task.id"])
+
+        if not task_id:
             self.log.error("No task found: cant map task: %s ", linedata)
             return
 
+        task_map = {"b_task_id": task_id, "b_job_id": job_id}
+
         if self._batch:
-            # next flush will catch this - no cache
-            pass
+            # next flush will apply all the task maps in one update
+            self._batch_cache["task_map_events"].append(task_map)
         else:
+            self.update_task_job_ids([task_map])
             self.session.commit()
 
     def task_meta(self, linedata):
@@ -933,6 +1152,11 @@ class WorkflowLoader(BaseLoader):
         if self._batch:
             self.hard_flush()
 
+        wf_uuid = linedata.get("xwf.id")
+        if wf_uuid is not None and wf_uuid not in self._task_map_flush:
+            # the ids have not been preloaded by a task map event
+            self.preload_wf_ids(self.wf_uuid_to_id(wf_uuid))
+
     def static_meta_start(self, linedata):
         """
         @type   linedata: dict
@@ -1011,14 +1235,16 @@ class WorkflowLoader(BaseLoader):
 
         Gets and caches task_id for task_meta inserts
         """
-        if (wf_id, task_dax_id) not in self.task_id_cache:
+        cache = self.get_wf_cache(wf_id).task_id
+        task_id = cache.get(task_dax_id)
+        if task_id is None:
             query = (
                 self.session.query(Task.task_id)
                 .filter(Task.wf_id == wf_id)
                 .filter(Task.abs_task_id == task_dax_id)
             )
             try:
-                self.task_id_cache[((wf_id, task_dax_id))] = query.one().task_id
+                task_id = cache[task_dax_id] = query.one().task_id
             except orm.exc.MultipleResultsFound as e:
                 self.log.error(
                     "Multiple results found for wf_uuid/task_dax_id: %s/%s",
@@ -1034,7 +1260,7 @@ class WorkflowLoader(BaseLoader):
                 )
                 return None
 
-        return self.task_id_cache[(wf_id, task_dax_id)]
+        return task_id
 
     def get_lfn_id(self, wf_id, lfn):
         """
@@ -1045,7 +1271,9 @@ class WorkflowLoader(BaseLoader):
 
         Gets and caches lfn_id for rc_meta, rc_lfn, rc_pfn and wf_files inserts
         """
-        if (wf_id, lfn) not in self.lfn_id_cache:
+        cache = self.get_wf_cache(wf_id).lfn_id
+        lfn_id = cache.get(lfn)
+        if lfn_id is None:
             id = self.__get_lfn_id_from_database__(wf_id, lfn)
 
             if id is None:
@@ -1064,9 +1292,9 @@ class WorkflowLoader(BaseLoader):
                     )
                     return None
 
-            self.lfn_id_cache[(wf_id, lfn)] = id
+            lfn_id = cache[lfn] = id
 
-        return self.lfn_id_cache[(wf_id, lfn)]
+        return lfn_id
 
     def __get_lfn_id_from_database__(self, wf_id, lfn):
         """
@@ -1100,14 +1328,16 @@ class WorkflowLoader(BaseLoader):
         Gets and caches job_id for job_instance inserts and static
         table updating.
         """
-        if (wf_id, exec_id) not in self.job_id_cache:
+        cache = self.get_wf_cache(wf_id).job_id
+        job_id = cache.get(exec_id)
+        if job_id is None:
             query = (
                 self.session.query(Job.job_id)
                 .filter(Job.wf_id == wf_id)
                 .filter(Job.exec_job_id == exec_id)
             )
             try:
-                self.job_id_cache[((wf_id, exec_id))] = query.one().job_id
+                job_id = cache[exec_id] = query.one().job_id
             except orm.exc.MultipleResultsFound as e:
                 self.log.error(
                     "Multiple results found for wf_uuid/exec_job_id: %s/%s",
@@ -1122,7 +1352,7 @@ class WorkflowLoader(BaseLoader):
                 self.log.error(query)
                 return None
 
-        return self.job_id_cache[((wf_id, exec_id))]
+        return job_id
 
     def get_job_instance_id(self, o, quiet=False):
         """
@@ -1135,14 +1365,16 @@ class WorkflowLoader(BaseLoader):
         wf_id = self.wf_uuid_to_id(o.wf_uuid)
         cached_job_id = self.get_job_id(wf_id, o.exec_job_id)
         uniqueIdIdx = (cached_job_id, o.job_submit_seq)
-        if uniqueIdIdx not in self.job_instance_id_cache:
+        cache = self.get_wf_cache(wf_id).job_instance_id
+        job_instance_id = cache.get(uniqueIdIdx)
+        if job_instance_id is None:
             query = (
                 self.session.query(JobInstance)
                 .filter(JobInstance.job_id == cached_job_id)
                 .filter(JobInstance.job_submit_seq == o.job_submit_seq)
             )
             try:
-                self.job_instance_id_cache[uniqueIdIdx] = query.one().job_instance_id
+                job_instance_id = cache[uniqueIdIdx] = query.one().job_instance_id
             except orm.exc.MultipleResultsFound as e:
                 if not quiet:
                     self.log.error(
@@ -1158,7 +1390,7 @@ class WorkflowLoader(BaseLoader):
                     )
                 return None
 
-        return self.job_instance_id_cache[uniqueIdIdx]
+        return job_instance_id
 
     def map_host_to_job_instance(self, host):
         """
@@ -1174,7 +1406,8 @@ class WorkflowLoader(BaseLoader):
         wf_id = self.wf_uuid_to_id(host.wf_uuid)
         cached_job_id = self.get_job_id(wf_id, host.exec_job_id)
 
-        if (cached_job_id, host.job_submit_seq) not in self.host_cache:
+        cache = self.get_wf_cache(wf_id).host
+        if not cache.get((cached_job_id, host.job_submit_seq)):
             if not host.host_id:
                 try:
                     host.host_id = (
@@ -1188,15 +1421,78 @@ class WorkflowLoader(BaseLoader):
                     )
                 except orm.exc.MultipleResultsFound as e:
                     self.log.error("Multiple host_id results for host: %s", host)
-            job_instance = (
-                self.session.query(JobInstance)
-                .filter(JobInstance.job_id == cached_job_id)
-                .filter(JobInstance.job_submit_seq == host.job_submit_seq)
-                .one()
-            )
-            job_instance.host_id = host.host_id
-            job_instance.merge_to_db(self.session, batch=self._batch)
-            self.host_cache[(cached_job_id, host.job_submit_seq)] = True
+            job_instance_id = self.get_job_instance_id(host)
+            if job_instance_id is None:
+                return
+            self.session.query(JobInstance).filter(
+                JobInstance.job_instance_id == job_instance_id
+            ).update({JobInstance.host_id: host.host_id}, synchronize_session=False)
+            if not self._batch:
+                self.session.commit()
+            cache[(cached_job_id, host.job_submit_seq)] = True
+
+    def preload_wf_ids(self, wf_id):
+        """
+        @type   wf_id: int
+        @param  wf_id: A workflow id from the workflow table.
+
+        Loads the job_id of every job and the task_id of every task of a
+        workflow into its lookup caches with one query each, so that the
+        lookups done while loading the workflow do not need a query per
+        job or task.
+        """
+        if wf_id is None:
+            return
+
+        cache = self.get_wf_cache(wf_id)
+
+        query = self.session.query(Job.exec_job_id, Job.job_id).filter(
+            Job.wf_id == wf_id
+        )
+        for exec_job_id, job_id in query:
+            cache.job_id[exec_job_id] = job_id
+
+        query = self.session.query(Task.abs_task_id, Task.task_id).filter(
+            Task.wf_id == wf_id
+        )
+        for abs_task_id, task_id in query:
+            cache.task_id[abs_task_id] = task_id
+
+        self.log.debug(
+            "Preloaded ids for wf_id %s: jobs=%s tasks=%s",
+            wf_id,
+            len(cache.job_id),
+            len(cache.task_id),
+        )
+
+    def update_task_job_ids(self, task_maps):
+        """
+        @type   task_maps: list
+        @param  task_maps: dicts with the b_task_id of a task and the
+                b_job_id of the job it is mapped to.
+
+        Sets the job_id of the mapped tasks with a single executemany update.
+        """
+        table = Task.__table__
+        self.session.execute(
+            table.update()
+            .where(table.c.task_id == bindparam("b_task_id"))
+            .values(job_id=bindparam("b_job_id")),
+            task_maps,
+        )
+
+    def get_wf_cache(self, wf_id):
+        """
+        @type   wf_id: int
+        @param  wf_id: A workflow id from the workflow table.
+
+        Returns the lookup caches of a workflow, creating them on first use.
+        """
+        try:
+            return self._wf_caches[wf_id]
+        except KeyError:
+            cache = self._wf_caches[wf_id] = WorkflowCache(self._cache_size)
+            return cache
 
     def purgeCaches(self, wfs):
         """
@@ -1212,18 +1508,17 @@ class WorkflowLoader(BaseLoader):
 
         self.purgeCache(self.root_wf_id_cache, wfs.wf_uuid)
 
-        self.purgeCache(self.job_instance_id_cache, wfs.wf_id)
-
-        self.purgeCache(self.host_cache, wfs.wf_uuid)
-
-        self.purgeCache(self.task_id_cache, wfs.wf_id)
-
-        self.purgeCache(self.lfn_id_cache, wfs.wf_id)
+        cache = self._wf_caches.pop(wfs.wf_id, None)
+        if cache is not None:
+            self.log.debug(
+                "Cache statistics (size, hits, misses) for wf_id %s: %s",
+                wfs.wf_id,
+                cache.stats(),
+            )
 
-        self.purgeCache(self.job_id_cache, wfs.wf_id)
+        self.purgeCache(self._task_map_flush, wfs.wf_uuid)
 
-        if wfs.wf_uuid in self._task_map_flush:
-            del self._task_map_flush[wfs.wf_uuid]
+        self.purgeCache(self._task_edge_flush, wfs.wf_uuid)
 
     def purgeCache(self, cache, key):
         """
@@ -1248,10 +1543,13 @@ class WorkflowLoader(BaseLoader):
             run_time = time.time() - self._start_time
             self.log.info(
                 "Loader performance: insert_time=%s, insert_num=%s, "
-                "total_time=%s, run_time_delta=%s, mean_time=%s",
+                "total_time=%s, run_time_delta=%s, mean_time=%s, "
+                "flush_time=%s, flush_num=%s",
                 self._insert_time,
                 self._insert_num,
                 run_time,
                 run_time - self._insert_time,
                 self._insert_time / self._insert_num,
+                self._flush_time,
+                self._flush_num,
             )
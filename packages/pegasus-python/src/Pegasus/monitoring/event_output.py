@@ -23,10 +23,11 @@ import queue
 import re
 import socket
 import ssl
+import struct
 import time
 import traceback
 import urllib.parse
-from threading import Thread
+from threading import Event, Thread
 
 from Pegasus import json
 from Pegasus.db import connection, expunge
@@ -44,6 +45,12 @@ try:
 except Exception:
     log.info("cannot import BSON library, 'bson'")
 
+msgpack = None
+try:
+    import msgpack
+except Exception:
+    log.info("cannot import msgpack library, 'msgpack'")
+
 amqp = None
 try:
     import pika as amqp
@@ -54,6 +61,13 @@ except Exception:
 STAMPEDE_NS = "stampede."
 DASHBOARD_NS = "dashboard."
 
+# Framing of the events written by the file and TCP sinks: none, or each
+# event prefixed by its length as a 4 byte unsigned integer in network order
+FRAMING = ["none", "length"]
+FRAME_HEADER = struct.Struct("!I")
+
+FLUSH_INTERVAL = 1  # Maximum time in seconds events stay in a sink buffer
+
 
 def purge_wf_uuid_from_database(rundir, output_db):
     """
@@ -196,9 +210,18 @@ class EventSink:
 
 class DBEventSink(EventSink):
     """
-    Write wflow event logs to database via loader
+    Write wflow event logs to database via loader.
+
+    If queue_size is greater than 0, events are put in a queue of that size,
+    and a loader thread does the batching and commits, so that parsing the
+    workflow logs overlaps with the database I/O. send() blocks while the
+    queue is full, and close() waits for the queued events to be loaded.
     """
 
+    # Queue markers, asking the loader thread to flush, and to finish
+    _FLUSH = object()
+    _CLOSE = object()
+
     def __init__(
         self,
         dest,
@@ -207,21 +230,58 @@ class DBEventSink(EventSink):
         props=None,
         db_type=None,
         backup=False,
+        flush_mode=None,
+        cache_size=None,
+        queue_size=None,
         **kw
     ):
+        if namespace not in (STAMPEDE_NS, DASHBOARD_NS):
+            raise ValueError("Unknown namespace specified '%s'" % (namespace))
+
         self._namespace = namespace
+        self._loader_args = (dest, db_stats, props, db_type, backup)
+        self._flush_mode = flush_mode
+        self._cache_size = cache_size
+        self._queue = None
+        self._error = None
+        self._finish_error = None
+
+        super().__init__()
+
+        if queue_size is None or queue_size <= 0:
+            self._db = self.create_loader()
+            return
+
+        # The loader is created, and only used, in the loader thread, as
+        # database connections should not be shared between threads
+        self._db = None
+        self._queue = queue.Queue(maxsize=queue_size)
+        started = Event()
+        self._loader_thread = Thread(
+            target=self.event_loader, args=(started,), daemon=True
+        )
+        self._loader_thread.start()
+        started.wait()
+        if self._error is not None:
+            self._loader_thread.join()
+            raise self._error
+
+    def create_loader(self):
+        dest, db_stats, props, db_type, backup = self._loader_args
         # pick the right database loader based on prefix
-        if namespace == STAMPEDE_NS:
-            self._db = WorkflowLoader(
+        if self._namespace == STAMPEDE_NS:
+            return WorkflowLoader(
                 dest,
                 perf=db_stats,
                 batch=True,
                 props=props,
                 db_type=db_type,
                 backup=backup,
+                flush_mode=self._flush_mode,
+                cache_size=self._cache_size,
             )
-        elif namespace == DASHBOARD_NS:
-            self._db = DashboardLoader(
+        else:
+            return DashboardLoader(
                 dest,
                 perf=db_stats,
                 batch=True,
@@ -229,74 +289,194 @@ class DBEventSink(EventSink):
                 db_type=db_type,
                 backup=backup,
             )
-        else:
-            raise ValueError("Unknown namespace specified '%s'" % (namespace))
 
-        super().__init__()
+    def event_loader(self, started):
+        try:
+            self._db = self.create_loader()
+        except Exception as e:
+            self._error = e
+            return
+        finally:
+            started.set()
+
+        while True:
+            event = self._queue.get()
+            try:
+                if event is self._CLOSE:
+                    break
+                if self._error is not None:
+                    # Loading failed, discard events until we are closed
+                    continue
+                if event is self._FLUSH:
+                    self._db.flush()
+                else:
+                    self._db.process(event)
+            except Exception as e:
+                self._log.error("error loading events, discarding queued events...")
+                self._log.error(traceback.format_exc())
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+        try:
+            self._db.finish()
+        except Exception as e:
+            self._finish_error = e
 
     def send(self, event, kw):
         self._log.trace("send.start event=%s", event)
         d = {"event": self._namespace + event}
         for k, v in kw.items():
             d[k.replace("__", ".")] = v
-        self._db.process(d)
+        if self._queue is None:
+            self._db.process(d)
+        else:
+            if self._error is not None or not self._loader_thread.is_alive():
+                raise Exception(
+                    "Database loader thread is dead. Cannot send events: %s"
+                    % self._error
+                )
+            if self._queue.full():
+                self._log.debug("Event queue is full, waiting for the loader thread")
+            self._queue.put(d)
         self._log.trace("send.end event=%s", event)
 
     def close(self):
         self._log.trace("close.start")
-        self._db.finish()
+        if self._queue is None:
+            self._db.finish()
+        else:
+            if self._loader_thread.is_alive():
+                self._log.trace("Waiting for the loader thread to empty the queue.")
+                self._queue.put(self._CLOSE)
+                self._loader_thread.join()
+                self._log.trace("Loader thread exited.")
+            if self._finish_error is not None:
+                raise self._finish_error
         self._log.trace("close.end")
 
     def flush(self):
-        self._db.flush()
+        if self._queue is None:
+            self._db.flush()
+        elif self._error is None:
+            try:
+                # The loader thread flushes when it gets to this marker
+                self._queue.put_nowait(self._FLUSH)
+            except queue.Full:
+                # The loader thread is busy, and checks if it needs to
+                # flush after loading each event anyway
+                pass
 
 
-class FileEventSink(EventSink):
+class StreamEventSink(EventSink):
     """
-    Write wflow event logs to a file.
+    Base class for sinks writing encoded events to a stream. Events are
+    buffered up to buffer_size bytes, and written when the buffer is full,
+    when the sink is flushed, and at least every FLUSH_INTERVAL seconds.
+    Without a buffer_size, each event is written when it is sent.
     """
 
-    def __init__(self, path, restart=False, encoder=None, **kw):
+    def __init__(self, encoder=None, buffer_size=None, framing=None):
         super().__init__()
-        if restart:
-            self._output = open(path, "w", 1)
-        else:
-            self._output = open(path, "a", 1)
+        if framing is not None and framing not in FRAMING:
+            raise ValueError("Unknown framing '%s'" % framing)
+
         self._encoder = encoder
+        self._framed = framing == "length"
+        self._buffer_size = buffer_size or 0
+        self._buffer = []
+        self._buffered = 0
+        self._last_flush = time.time()
+
+    def encode(self, event, kw):
+        """
+        Returns the encoded event as bytes, framed if requested.
+        """
+        data = self._encoder(event=event, **kw)
+        if isinstance(data, str):
+            if self._encoder == json_encode and not self._framed:
+                data += "\n"
+            data = data.encode("utf-8")
+        if self._framed:
+            data = FRAME_HEADER.pack(len(data)) + data
+        return data
 
     def send(self, event, kw):
         self._log.trace("send.start event=%s", event)
-        self._output.write(self._encoder(event=event, **kw))
-        if self._encoder == json_encode:
-            self._output.write("\n")
+        data = self.encode(event, kw)
+        self._buffer.append(data)
+        self._buffered += len(data)
+        if (
+            self._buffered >= self._buffer_size
+            or time.time() - self._last_flush >= FLUSH_INTERVAL
+        ):
+            self.flush()
         self._log.trace("send.end event=%s", event)
 
+    def flush(self):
+        "Writes the buffered events to the stream"
+        if self._buffer:
+            self.write(b"".join(self._buffer))
+            self._buffer = []
+            self._buffered = 0
+        self._last_flush = time.time()
+
     def close(self):
         self._log.trace("close.start")
-        self._output.close()
+        try:
+            self.flush()
+        finally:
+            self.close_stream()
         self._log.trace("close.end")
 
+    def write(self, data):
+        """
+        Writes encoded events to the stream.
+        """
+
+    def close_stream(self):
+        """
+        Closes the stream.
+        """
+
+
+class FileEventSink(StreamEventSink):
+    """
+    Write wflow event logs to a file.
+    """
+
+    def __init__(
+        self, path, restart=False, encoder=None, buffer_size=None, framing=None, **kw
+    ):
+        super().__init__(encoder=encoder, buffer_size=buffer_size, framing=framing)
+        if restart:
+            self._output = open(path, "wb")
+        else:
+            self._output = open(path, "ab")
+
+    def write(self, data):
+        self._output.write(data)
+        self._output.flush()
+
+    def close_stream(self):
+        self._output.close()
+
 
-class TCPEventSink(EventSink):
+class TCPEventSink(StreamEventSink):
     """
     Write wflow event logs to a host:port.
     """
 
-    def __init__(self, host, port, encoder=None, **kw):
-        super().__init__()
-        self._encoder = encoder
+    def __init__(self, host, port, encoder=None, buffer_size=None, framing=None, **kw):
+        super().__init__(encoder=encoder, buffer_size=buffer_size, framing=framing)
         self._sock = socket.socket()
         self._sock.connect((host, port))
 
-    def send(self, event, kw):
-        self._log.trace("send.start event=%s", event)
-        self._sock.send(self._encoder(event=event, **kw))
-        self._log.trace("send.end event=%s", event)
+    def write(self, data):
+        self._sock.sendall(data)
 
-    def close(self):
-        self._log.trace("close.start")
+    def close_stream(self):
         self._sock.close()
-        self._log.trace("close.end")
 
 
 class AMQPEventSink(EventSink):
@@ -577,6 +757,14 @@ def bson_encode(event, **kw):
     return bson.dumps(kw)
 
 
+def msgpack_encode(event, **kw):
+    """
+    Adapt msgpack.packb() to NetLogger's Log.write() signature.
+    """
+    kw["event"] = STAMPEDE_NS + event
+    return msgpack.packb(kw, default=str)
+
+
 def json_encode(event, **kw):
     """
     Adapt bson.dumps() to NetLogger's Log.write() signature.
@@ -592,6 +780,74 @@ def json_encode(event, **kw):
     return json.dumps(kw)
 
 
+def _read_exactly(stream, size):
+    """
+    Reads size bytes from a binary stream. Returns None at the end of the
+    stream, and raises an error if it ends in the middle of the data.
+    """
+    data = stream.read(size)
+    while data and len(data) < size:
+        more = stream.read(size - len(data))
+        if not more:
+            break
+        data += more
+
+    if not data:
+        return None
+    if len(data) < size:
+        raise EOFError("Truncated event, expected %d bytes, got %d" % (size, len(data)))
+    return data
+
+
+def read_events(stream, enc="bp", framing=None):
+    """
+    Reads the events written by a FileEventSink or a TCPEventSink with the
+    given encoding and framing from a binary stream, e.g. an events file
+    opened in "rb" mode, or socket.makefile("rb"). Yields each event as a
+    dict, except for the bp encoding, for which the lines are yielded.
+    """
+    if enc is None or enc == "bp":
+        decode = lambda data: data.decode("utf-8").rstrip("\n")  # noqa: E731
+    elif enc == "json":
+        decode = json.loads
+    elif enc == "bson":
+        if bson is None:
+            raise Exception("BSON encoding selected, but cannot import bson library")
+        decode = bson.loads
+    elif enc == "msgpack":
+        if msgpack is None:
+            raise Exception(
+                "msgpack encoding selected, but cannot import msgpack library"
+            )
+        decode = lambda data: msgpack.unpackb(data, raw=False)  # noqa: E731
+    else:
+        raise ValueError("Unknown encoding '%s'" % enc)
+
+    if framing == "length":
+        while True:
+            header = _read_exactly(stream, FRAME_HEADER.size)
+            if header is None:
+                return
+            (size,) = FRAME_HEADER.unpack(header)
+            yield decode(_read_exactly(stream, size) or b"")
+    elif framing is not None and framing != "none":
+        raise ValueError("Unknown framing '%s'" % framing)
+    elif enc == "bson":
+        # BSON documents start with their length, as a little endian int32
+        while True:
+            header = _read_exactly(stream, 4)
+            if header is None:
+                return
+            (size,) = struct.unpack("<i", header)
+            yield decode(header + _read_exactly(stream, size - 4))
+    elif enc == "msgpack":
+        yield from msgpack.Unpacker(stream, raw=False)
+    else:
+        for line in stream:
+            if line.strip():
+                yield decode(line)
+
+
 def create_wf_event_sink(
     dest, db_type, enc=None, prefix=STAMPEDE_NS, props=None, multiplexed=False, **kw
 ):
@@ -641,6 +897,12 @@ def create_wf_event_sink(
                     "BSON encoding selected, but cannot import bson library"
                 )
             encfn = bson_encode
+        elif enc_name == "msgpack":
+            if msgpack is None:
+                raise Exception(
+                    "msgpack encoding selected, but cannot import msgpack library"
+                )
+            encfn = msgpack_encode
         elif enc_name == "json":
             encfn = json_encode
         else:
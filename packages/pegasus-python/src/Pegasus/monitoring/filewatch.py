@@ -0,0 +1,220 @@
+"""
+Classes for waiting on changes to the files followed by pegasus-monitord.
+"""
+
+##
+#  Copyright 2007-2021 University Of Southern California
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing,
+#  software distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+##
+
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import time
+
+logger = logging.getLogger(__name__)
+
+# inotify constants, from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+EVENT_HEADER = struct.Struct("iIII")
+READ_SIZE = 64 * 1024
+
+
+def split_lines(buffer):
+    """
+    Splits a buffer into complete lines in a single pass.
+    Returns the list of complete lines (without the newline), and the
+    trailing incomplete line, which should be kept for the next read.
+    """
+    lines = buffer.split("\n")
+    return lines, lines.pop()
+
+
+class PollingFileWatcher:
+    """
+    File watcher that does not watch anything: waiting simply sleeps for
+    the whole timeout, and the caller finds changes by polling the files.
+    """
+
+    def watch(self, path):
+        pass
+
+    def unwatch(self, path):
+        pass
+
+    def wait(self, timeout):
+        """
+        Sleeps for timeout seconds. Returns False, as no change is detected.
+        """
+        if timeout > 0:
+            time.sleep(timeout)
+        return False
+
+    def close(self):
+        pass
+
+
+class InotifyFileWatcher:
+    """
+    File watcher based on Linux inotify. The directory containing each
+    watched file is watched, so files are also detected when they appear.
+    """
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._inotify_init1 = libc.inotify_init1
+        self._inotify_add_watch = libc.inotify_add_watch
+        self._inotify_add_watch.argtypes = [
+            ctypes.c_int,
+            ctypes.c_char_p,
+            ctypes.c_uint32,
+        ]
+        self._inotify_rm_watch = libc.inotify_rm_watch
+
+        self._fd = self._inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+        self._wd_dirs = {}  # watch descriptor -> directory
+        self._dir_wds = {}  # directory -> watch descriptor
+        self._names = {}  # directory -> names of the watched files in it
+
+    def watch(self, path):
+        """
+        Starts watching a file. If its directory does not exist yet, adding
+        the watch is retried every time we wait.
+        """
+        path = os.path.abspath(path)
+        directory, name = os.path.split(path)
+        self._names.setdefault(directory, set()).add(name)
+        self._add_watch(directory)
+
+    def unwatch(self, path):
+        path = os.path.abspath(path)
+        directory, name = os.path.split(path)
+        names = self._names.get(directory)
+        if names is None:
+            return
+
+        names.discard(name)
+        if names:
+            return
+
+        del self._names[directory]
+        wd = self._dir_wds.pop(directory, None)
+        if wd is not None:
+            del self._wd_dirs[wd]
+            self._inotify_rm_watch(self._fd, wd)
+
+    def wait(self, timeout):
+        """
+        Waits up to timeout seconds for a watched file to change.
+        Returns True if a change was detected, and False on timeout.
+        """
+        for directory in self._names:
+            if directory not in self._dir_wds:
+                self._add_watch(directory)
+
+        deadline = time.time() + timeout
+        while True:
+            remaining = max(0, deadline - time.time())
+            try:
+                readable, _, _ = select.select([self._fd], [], [], remaining)
+            except InterruptedError:
+                continue
+
+            if not readable:
+                return False
+            if self._read_events():
+                return True
+            if remaining == 0:
+                return False
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+    def _add_watch(self, directory):
+        wd = self._inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            logger.debug(
+                "unable to watch directory %s: %s" % (directory, os.strerror(err))
+            )
+            return
+
+        self._wd_dirs[wd] = directory
+        self._dir_wds[directory] = wd
+
+    def _read_events(self):
+        """
+        Reads all pending events, and returns True if any of them is for a
+        watched file.
+        """
+        changed = False
+        while True:
+            try:
+                data = os.read(self._fd, READ_SIZE)
+            except OSError as e:
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    return changed
+                raise
+
+            offset = 0
+            while offset < len(data):
+                wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = os.fsdecode(data[offset : offset + length].rstrip(b"\0"))
+                offset += length
+
+                if mask & IN_Q_OVERFLOW:
+                    # Events were lost, assume something changed
+                    changed = True
+                elif mask & IN_IGNORED:
+                    # The directory is gone, it will be watched again if it reappears
+                    directory = self._wd_dirs.pop(wd, None)
+                    if directory is not None:
+                        self._dir_wds.pop(directory, None)
+                else:
+                    directory = self._wd_dirs.get(wd)
+                    if name in self._names.get(directory, ()):
+                        changed = True
+
+
+def create_file_watcher(use_inotify=True):
+    """
+    Returns an inotify based file watcher if requested and available,
+    otherwise a file watcher that only sleeps.
+    """
+    if use_inotify:
+        try:
+            return InotifyFileWatcher()
+        except (AttributeError, OSError, TypeError) as e:
+            logger.info("inotify is not available, polling files instead: %s" % e)
+
+    return PollingFileWatcher()
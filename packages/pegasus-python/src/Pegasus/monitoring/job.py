@@ -32,6 +32,7 @@ logger = logging.getLogger(__name__)
 # Global variables
 good_rsl = {"maxcputime": 1, "maxtime": 1, "maxwalltime": 1}
 MAX_OUTPUT_LENGTH = 2 ** 16 - 1  # Only keep stdout to 64K
+OUTPUT_READ_SIZE = 2 ** 20  # Read job .out and .err files in 1M chunks
 
 # some constants
 NOOP_JOB_PREFIX = (
@@ -40,6 +41,8 @@ NOOP_JOB_PREFIX = (
 
 MONITORING_EVENT_START_MARKER = "@@@MONITORING_PAYLOAD - START@@@"
 MONITORING_EVENT_END_MARKER = "@@@MONITORING_PAYLOAD - END@@@"
+MONITORING_EVENT_START_MARKER_BYTES = MONITORING_EVENT_START_MARKER.encode()
+MONITORING_EVENT_END_MARKER_BYTES = MONITORING_EVENT_END_MARKER.encode()
 
 # Used in parse_sub_file
 re_rsl_string = re.compile(r"^\s*globusrsl\W", re.IGNORECASE)
@@ -741,15 +744,10 @@ class Job:
         my_err_file = os.path.join(run_dir, basename)
 
         try:
-            ERR = open(my_err_file)
             # PM-1274 parse any monitoring events such as integrity related
             # from PegasusLite .err file
-            job_stderr = self.split_task_output(ERR.read())
-            buf = job_stderr.user_data
-
-            if len(buf) > my_max_encoded_length:
-                buf = buf[:my_max_encoded_length]
-            self._stderr_text = utils.quote(buf)
+            job_stderr = self.read_task_output(my_err_file, my_max_encoded_length)
+            self._stderr_text = utils.quote(job_stderr.user_data)
 
             if store_monitoring_events:
                 self._add_additional_monitoring_events(job_stderr.events)
@@ -767,8 +765,6 @@ class Job:
                 logger.warning(
                     "unable to read error file: %s, continuing..." % (my_err_file)
                 )
-        else:
-            ERR.close()
 
     def read_job_out_file(self, out_file=None, store_monitoring_events=True):
         """
@@ -794,12 +790,8 @@ class Job:
             out_file = os.path.join(run_dir, basename)
 
         try:
-            OUT = open(out_file)
-            job_stdout = self.split_task_output(OUT.read())
-            buf = job_stdout.user_data
-            if len(buf) > my_max_encoded_length:
-                buf = buf[:my_max_encoded_length]
-            self._stdout_text = utils.quote("#@ 1 stdout\n" + buf)
+            job_stdout = self.read_task_output(out_file, my_max_encoded_length)
+            self._stdout_text = utils.quote("#@ 1 stdout\n" + job_stdout.user_data)
 
             if store_monitoring_events:
                 self._add_additional_monitoring_events(job_stdout.events)
@@ -809,8 +801,6 @@ class Job:
                 logger.warning(
                     "unable to read output file: %s, continuing..." % (out_file)
                 )
-        else:
-            OUT.close()
 
     def is_noop_job(self):
         """
@@ -897,6 +887,94 @@ class Job:
 
         return TaskOutput(task_data.getvalue(), events)
 
+    def read_task_output(self, filename, max_length):
+        """
+        Reads a job output file, and splits it in to user app data and
+        monitoring events for pegasus use, like split_task_output. The file
+        is read in chunks, and only the first max_length bytes of user app
+        data are kept, so that large outputs do not end up in memory.
+
+        :param filename:    the job .out or .err file
+        :param max_length:  the maximum number of bytes of user app data to keep
+        :return:
+        """
+        events = []
+        user_data = []
+        user_data_length = 0
+
+        def keep(data):
+            nonlocal user_data_length
+            data = data[: max_length - user_data_length]
+            if data:
+                user_data.append(data)
+                user_data_length += len(data)
+
+        buffer = b""
+        in_payload = False
+        with open(filename, "rb") as f:
+            while True:
+                chunk = f.read(OUTPUT_READ_SIZE)
+                buffer += chunk
+
+                # pos is where the unparsed data starts - the consumed prefix
+                # is only dropped once per chunk, as copying the rest of the
+                # buffer after every event would be quadratic
+                pos = 0
+                while True:
+                    if in_payload:
+                        end = buffer.find(MONITORING_EVENT_END_MARKER_BYTES, pos)
+                        if end == -1:
+                            break
+                        payload = buffer[pos:end].decode("utf-8", errors="replace")
+                        try:
+                            events.append(json.loads(payload))
+                        except Exception:
+                            logger.error(
+                                "Unable to convert payload %s to JSON" % payload
+                            )
+                        pos = end + len(MONITORING_EVENT_END_MARKER_BYTES)
+                        in_payload = False
+                    else:
+                        start = buffer.find(MONITORING_EVENT_START_MARKER_BYTES, pos)
+                        if start == -1:
+                            break
+                        keep(buffer[pos:start])
+                        pos = start + len(MONITORING_EVENT_START_MARKER_BYTES)
+                        in_payload = True
+                buffer = buffer[pos:]
+
+                if not chunk:
+                    break
+
+                if not in_payload:
+                    # only hold on to what may be the beginning of a marker
+                    split = max(
+                        0, len(buffer) - len(MONITORING_EVENT_START_MARKER_BYTES) + 1
+                    )
+                    keep(buffer[:split])
+                    buffer = buffer[split:]
+                elif len(buffer) > MAX_OUTPUT_LENGTH:
+                    # too large for a monitoring event, treat it as user app data
+                    logger.error(
+                        "Monitoring event payload too large in %s, ignoring it..."
+                        % filename
+                    )
+                    keep(MONITORING_EVENT_START_MARKER_BYTES)
+                    in_payload = False
+
+        if in_payload:
+            logger.error("Unterminated monitoring event payload in %s" % filename)
+            keep(MONITORING_EVENT_START_MARKER_BYTES)
+        keep(buffer)
+
+        # the output is truncated at max_length bytes, possibly in the middle
+        # of a character, and newlines are translated like in text mode
+        task_data = b"".join(user_data).decode("utf-8", errors="replace")
+        if "\r" in task_data:
+            task_data = task_data.replace("\r\n", "\n").replace("\r", "\n")
+
+        return TaskOutput(task_data, events)
+
     def create_composite_job_event(self, job_inst_kwargs):
         """
         this creates a composite job event that also includes all information included in a job_inst.end event
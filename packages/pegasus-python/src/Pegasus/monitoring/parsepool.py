@@ -0,0 +1,120 @@
+"""
+Pool of workers parsing the kickstart output of jobs ahead of time, so that
+pegasus-monitord does not have to parse it when the job ends.
+"""
+
+##
+#  Copyright 2007-2021 University Of Southern California
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing,
+#  software distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+##
+
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from Pegasus.tools import kickstart_parser
+
+logger = logging.getLogger(__name__)
+
+POOL_TYPES = ["thread", "process"]
+
+
+def file_signature(filename):
+    """
+    Returns what identifies the contents of a file, or None if the file
+    cannot be accessed. Renaming a file, as DAGMan does when it rotates job
+    output files, does not change its signature.
+    """
+    try:
+        st = os.stat(filename)
+    except OSError:
+        return None
+    return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+def parse_job_output(filename):
+    """
+    Parses a kickstart output file for the stampede schema. Returns the
+    signature of the file before it was parsed, whether the file could not
+    be opened, and the parsed records.
+    """
+    signature = file_signature(filename)
+    my_parser = kickstart_parser.Parser(filename)
+    my_output = my_parser.parse_stampede()
+    return signature, my_parser._open_error, my_output
+
+
+class JobOutputParserPool:
+    """
+    Parses job output files in a pool of threads or processes. Jobs are
+    submitted when they terminate, and the results are collected, in the
+    order monitord processes the events of the jobs, when the jobs end.
+    """
+
+    def __init__(self, workers, pool_type="thread"):
+        if pool_type not in POOL_TYPES:
+            raise ValueError("invalid job output parser pool type: %s" % pool_type)
+
+        if pool_type == "process":
+            self._executor = ProcessPoolExecutor(max_workers=workers)
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._pending = {}  # output file name -> future
+
+    def submit(self, filename):
+        """
+        Starts parsing an output file in the background. A result for the
+        same file that was never collected, e.g. from a previous retry of
+        the job, is discarded.
+        """
+        future = self._pending.pop(filename, None)
+        if future is not None:
+            future.cancel()
+        self._pending[filename] = self._executor.submit(parse_job_output, filename)
+
+    def result(self, filename, candidates=()):
+        """
+        Returns whether the output file could not be opened and the parsed
+        records, if the file, or one of the candidates it was renamed from,
+        was submitted and has not changed since it was parsed. Otherwise
+        returns None, and the file has to be parsed again.
+        """
+        future = None
+        for name in (filename,) + tuple(candidates):
+            future = self._pending.pop(name, None)
+            if future is not None:
+                break
+        if future is None:
+            return None
+
+        try:
+            signature, open_error, my_output = future.result()
+        except Exception as e:
+            logger.debug("error parsing job output file %s: %s" % (filename, e))
+            return None
+
+        if signature is None or signature != file_signature(filename):
+            logger.debug("job output file %s changed after it was parsed" % filename)
+            return None
+
+        return open_error, my_output
+
+    def close(self):
+        """
+        Discards the results not collected, and stops the workers.
+        """
+        for future in self._pending.values():
+            future.cancel()
+        self._pending.clear()
+        self._executor.shutdown(wait=True)
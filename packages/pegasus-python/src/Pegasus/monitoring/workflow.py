@@ -921,6 +921,7 @@ class Workflow:
         store_stdout_stderr=True,
         output_dir=None,
         notifications_manager=None,
+        job_output_pool=None,
     ):
         """
         This function initializes the workflow object. It looks for
@@ -941,6 +942,7 @@ class Workflow:
         self._enable_notifications = enable_notifications
         self._replay_mode = replay_mode
         self._notifications_manager = notifications_manager
+        self._job_output_pool = job_output_pool
         self._output_dir = output_dir
         self._store_stdout_stderr = store_stdout_stderr
         # self._last_known_state = last_known_state  #last known state of the workflow. updated whenever change_wf_state is called
@@ -2204,6 +2206,31 @@ class Workflow:
                 item_kwargs.update(item)
                 self.output_to_db("task.monitoring", item_kwargs)
 
+    def prefetch_job_output(self, my_job):
+        """
+        This function starts parsing the kickstart output file of a job
+        that terminated in the job output pool, so that the results are
+        ready when parse_job_output is called for the job.
+        """
+        # Subdag jobs have no kickstart output
+        if (
+            my_job._exec_job_id in self._job_info
+            and self._job_info[my_job._exec_job_id][5] is True
+        ):
+            return
+
+        my_job_output_fn = (
+            os.path.join(my_job._job_submit_dir, my_job._exec_job_id) + ".out"
+        )
+        if self.job_has_postscript(my_job._exec_job_id) or self._is_pmc_dag:
+            # The file is only rotated when the postscript runs, unless we are
+            # replaying a workflow
+            my_rotated_fn = my_job_output_fn + ".%03d" % (my_job._job_output_counter)
+            if os.path.exists(my_rotated_fn):
+                my_job_output_fn = my_rotated_fn
+
+        self._job_output_pool.submit(my_job_output_fn)
+
     def parse_job_output(self, my_job, job_state):
         """
         This function tries to parse the kickstart output file of a
@@ -2244,12 +2271,24 @@ class Workflow:
                 )
                 my_job._has_rotated_stdout_err_files = True
 
-            # First assume we will find rotated file
-            my_parser = kickstart_parser.Parser(my_job_output_fn)
-            my_output = my_parser.parse_stampede()
+            # Use the output parsed in the background when the job terminated,
+            # unless the file changed since then
+            my_result = None
+            if self._job_output_pool is not None:
+                my_result = self._job_output_pool.result(
+                    my_job_output_fn, (my_job_output_fn_base,)
+                )
+
+            if my_result is not None:
+                my_open_error, my_output = my_result
+            else:
+                # First assume we will find rotated file
+                my_parser = kickstart_parser.Parser(my_job_output_fn)
+                my_output = my_parser.parse_stampede()
+                my_open_error = my_parser._open_error
 
             # Check if successful
-            if my_parser._open_error is True and not my_job.is_noop_job():
+            if my_open_error is True and not my_job.is_noop_job():
                 logger.error(
                     "unable to read output file %s for job %s"
                     % (my_job_output_fn, my_job._exec_job_id)
@@ -2732,6 +2771,11 @@ class Workflow:
         # PM-1176 track kickstart app exitcode only for non clustered jobs
         real_app_exitcode = None
 
+        # Start parsing the kickstart output file in the background, it is
+        # collected when the job, or its postscript, ends
+        if job_state == "JOB_TERMINATED" and self._job_output_pool is not None:
+            self.prefetch_job_output(my_job)
+
         # Parse the kickstart output file, also send mainjob tasks, if needed
         if job_state == "JOB_SUCCESS" or job_state == "JOB_FAILURE":
             # Main job has ended
@@ -15,11 +15,11 @@ Basic Usage::
 """
 
 from io import StringIO
-from typing import TextIO
+from typing import Iterable, TextIO
 
 from Pegasus import yaml
 from Pegasus.api.errors import PegasusError
-from Pegasus.api.replica_catalog import _PFN, ReplicaCatalog
+from Pegasus.api.replica_catalog import _PFN, ReplicaCatalog, _ReplicaCatalogEntry
 
 __all__ = (
     "load",
@@ -29,34 +29,66 @@ __all__ = (
 )
 
 
-def _to_rc(d: dict) -> ReplicaCatalog:
-    """Convert dict to ReplicaCatalog
+def _add_replicas(rc: ReplicaCatalog, replicas: Iterable[dict]) -> None:
+    """Add replicas, represented as dicts, to a ReplicaCatalog
 
-    :param d: ReplicaCatalog represented as a dict
-    :type d: dict
+    The entries are created directly, rather than through
+    :py:meth:`~Pegasus.api.replica_catalog.ReplicaCatalog.add_replica`, which
+    would validate the checksums of an entry, and merge its metadata, once for
+    each of its pfns. Regex entries, which are few, are still added with
+    :py:meth:`~Pegasus.api.replica_catalog.ReplicaCatalog.add_regex_replica`.
+
+    :param rc: ReplicaCatalog to add the replicas to
+    :type rc: ReplicaCatalog
+    :param replicas: replicas represented as dicts
+    :type replicas: Iterable[dict]
     :raises PegasusError: encountered error parsing
-    :return: a ReplicaCatalog object based on d
-    :rtype: ReplicaCatalog
     """
-    rc = ReplicaCatalog()
+    entries = rc.entries
 
-    try:
-        for r in d["replicas"]:
+    for r in replicas:
+        try:
             lfn = r["lfn"]
             pfns = {_PFN(i["site"], i["pfn"]) for i in r["pfns"]}
 
             checksum = r.get("checksum") if r.get("checksum") else {}
             metadata = r.get("metadata") if r.get("metadata") else {}
+        except KeyError:
+            raise PegasusError("error parsing {}".format(r))
 
-            regex = r.get("regex")
+        if r.get("regex"):
             for pfn in pfns:
-                if regex:
-                    rc.add_regex_replica(pfn.site, lfn, pfn.pfn, metadata=metadata)
-                else:
-                    rc.add_replica(
-                        pfn.site, lfn, pfn.pfn, metadata=metadata, checksum=checksum
-                    )
+                rc.add_regex_replica(pfn.site, lfn, pfn.pfn, metadata=metadata)
+            continue
+
+        ReplicaCatalog._check_checksum(checksum)
+
+        # if an entry with the given lfn already exists, update it
+        # else create and add a new one
+        entry = entries.get((lfn, False))
+        if entry is None:
+            entries[(lfn, False)] = _ReplicaCatalogEntry(
+                lfn, pfns, checksum=checksum, metadata=metadata, regex=False
+            )
+        else:
+            entry.pfns.update(pfns)
+            entry.checksum.update(checksum)
+            entry.metadata.update(metadata)
+
+
+def _to_rc(d: dict) -> ReplicaCatalog:
+    """Convert dict to ReplicaCatalog
+
+    :param d: ReplicaCatalog represented as a dict
+    :type d: dict
+    :raises PegasusError: encountered error parsing
+    :return: a ReplicaCatalog object based on d
+    :rtype: ReplicaCatalog
+    """
+    rc = ReplicaCatalog()
 
+    try:
+        _add_replicas(rc, d["replicas"])
     except KeyError:
         raise PegasusError("error parsing {}".format(d))
 
@@ -67,12 +99,28 @@ def load(fp: TextIO, *args, **kwargs) -> ReplicaCatalog:
     """
     Deserialize ``fp`` (a ``.read()``-supporting file-like object containing a ReplicaCatalog document) to a :py:class:`~Pegasus.api.replica_catalog.ReplicaCatalog` object.
 
+    The replicas are added to the catalog as they are parsed, so that the
+    dicts representing them never have to be held in memory all at once.
+
     :param fp: file like object to load from
     :type fp: TextIO
     :return: deserialized ReplicaCatalog object
     :rtype: ReplicaCatalog
     """
-    return _to_rc(yaml.load(fp))
+    rc = ReplicaCatalog()
+    d = dict()
+
+    for key, value in yaml.iter_items(fp, lazy={"replicas"}):
+        if key == "replicas":
+            _add_replicas(rc, value)
+            value = None
+
+        d[key] = value
+
+    if "replicas" not in d:
+        raise PegasusError("error parsing {}".format(d))
+
+    return rc
 
 
 def loads(s: str, *args, **kwargs) -> ReplicaCatalog:
@@ -84,7 +132,7 @@ def loads(s: str, *args, **kwargs) -> ReplicaCatalog:
     :return: deserialized ReplicaCatalog object
     :rtype: ReplicaCatalog
     """
-    return _to_rc(yaml.load(s))
+    return load(s)
 
 
 def dump(obj: ReplicaCatalog, fp: TextIO, _format="yml", *args, **kwargs) -> None:
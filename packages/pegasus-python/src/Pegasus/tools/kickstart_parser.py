@@ -12,9 +12,7 @@ import traceback
 from pprint import pprint
 from xml.parsers import expat
 
-import yaml
-import yaml.constructor
-
+from Pegasus import yaml
 from Pegasus.monitoring.metadata import FileMetadata
 
 ##
@@ -35,14 +33,50 @@ from Pegasus.monitoring.metadata import FileMetadata
 
 # Revision : $Revision: 2012 $
 
-yaml.constructor.SafeConstructor.yaml_constructors[
-    "tag:yaml.org,2002:timestamp"
-] = yaml.constructor.SafeConstructor.yaml_constructors["tag:yaml.org,2002:str"]
-
 # Regular expressions used in the kickstart parser
 re_parse_props = re.compile(r'(\S+)\s*=\s*([^",]+)')
 re_parse_quoted_props = re.compile(r'(\S+)\s*=\s*"([^"]+)"')
 
+# Tokens starting the records in a kickstart output file
+RECORD_TOKENS = [
+    "- invocation:",
+    "[cluster-task",
+    "[cluster-summary",
+    "[seqexec-task",  # deprecated token
+    "[seqexec-summary",  # deprecated token
+]
+MULTIPART_TOKEN = "---------------pegasus-multipart"
+
+# Mapping from the yaml invocation record to the old v2 format we used with
+# the xml records: yaml keys -> v2 key, and the keys_dict element and
+# attribute that requests it
+YAML_TO_VER2_MAP = [
+    (["hostname"], "hostname", "invocation", "hostname"),
+    (["resource"], "resource", "invocation", "resource"),
+    (["user"], "user", "invocation", "user"),
+    (["hostaddr"], "hostaddr", "invocation", "hostaddr"),
+    (["transformation"], "transformation", "invocation", "transformation"),
+    (["derivation"], "derivation", "invocation", "derivation"),
+    (["mainjob", "duration"], "duration", "mainjob", "duration"),
+    (["mainjob", "start"], "start", "mainjob", "start"),
+    (["mainjob", "usage", "utime"], "utime", "usage", "utime"),
+    (["mainjob", "usage", "stime"], "stime", "usage", "stime"),
+    (["mainjob", "usage", "maxrss"], "maxrss", "usage", "maxrss"),
+    (["machine", "ram_total"], "ram", "ram", "total"),
+    (["machine", "uname_system"], "system", "uname", "system"),
+    (["machine", "uname_release"], "release", "uname", "release"),
+    (["machine", "uname_machine"], "machine", "uname", "machine"),
+    (["mainjob", "executable", "file_name"], "name", "file", "name"),
+    (["mainjob", "status", "raw"], "raw", "status", "raw"),
+    (["mainjob", "status", "signalled_signal"], "signal", "signalled", "signal"),
+    (["mainjob", "status", "signalled_name"], "action", "signalled", "action"),
+    (["mainjob", "status", "corefile"], "corefile", "signalled", "corefile"),
+    (["mainjob", "status", "regular_exitcode"], "exitcode", "regular", "exitcode"),
+    (["cwd"], "cwd", "cwd", None),
+    (["files", "stdout", "data"], "stdout", "stdout", None),
+    (["files", "stderr", "data"], "stderr", "stderr", None),
+]
+
 logger = logging.getLogger(__name__)
 
 
@@ -199,23 +233,25 @@ class Parser:
             % (self._kickstart_output_file)
         )
 
+        # Read the whole file, the yaml parser splits it into records in one pass
+        buffer = self._fh.read()
+        self.close()
+
         # load the appropriate parser by checking for first instance of xml header or invocation
         yaml_parser = True
-        for line in self._fh:
-            if line.find("<?xml") != -1:
+        xml_start = buffer.find("<?xml")
+        if xml_start != -1:
+            invocation_start = buffer.find("- invocation:", 0, xml_start)
+            if invocation_start == -1 or invocation_start > buffer.rfind(
+                "\n", 0, xml_start
+            ):
                 yaml_parser = False
-                break
-            elif line.find("- invocation:") != -1:
-                yaml_parser = True
-                break
 
-        self.close()
-        self._parser = (
-            YAMLParser(self._kickstart_output_file)
-            if yaml_parser
-            else XMLParser(self._kickstart_output_file)
-        )
+        if yaml_parser:
+            self._parser = YAMLParser(self._kickstart_output_file)
+            return self._parser.parse(keys_dict, tasks, clustered, buffer=buffer)
 
+        self._parser = XMLParser(self._kickstart_output_file)
         return self._parser.parse(keys_dict, tasks, clustered)
 
     def parse_stampede(self):
@@ -286,8 +322,9 @@ class YAMLParser(Parser):
 
     def __init__(self, filename):
         super().__init__(filename)
+        self._yaml_map = self.yaml_map()
 
-    def parse(self, keys_dict, tasks=True, clustered=True):
+    def parse(self, keys_dict, tasks=True, clustered=True, buffer=None):
         """
         This function parses the kickstart output file, looking for
         the keys specified in the keys_dict variable. It returns a
@@ -295,29 +332,30 @@ class YAMLParser(Parser):
         parse_stampede function for details about how to pass keys
         using the keys_dict structure. The function will return an
         empty list if no records are found or if an error happens.
+        If buffer is given, it is used as the contents of the file.
         """
 
         my_reply = []
 
-        # Place keys_dict in the _ks_elements
+        # Place keys_dict in the _ks_elements, and only extract the
+        # requested keys from the invocation records
         self._ks_elements = keys_dict
+        self._yaml_map = self.yaml_map(keys_dict)
 
-        # Try to open the file
-        if self.open() is False:
-            return my_reply
+        if buffer is None:
+            # Try to open the file
+            if self.open() is False:
+                return my_reply
+            buffer = self._fh.read()
+            self.close()
 
         logger.debug(
             "Started reading records from kickstart file %s"
             % (self._kickstart_output_file)
         )
 
-        self._record_number = 0
-        # Read first record
-        record = self.read_record()
-
-        # Loop while we still have record to read
-        while record is not None:
-            logger.debug("Record is \n%s" % record)
+        # Loop over the records in the file
+        for record in self.split_records(buffer):
             if self.is_invocation_record(record) is True:
                 # We have an invocation record, parse it!
                 try:
@@ -357,135 +395,80 @@ class YAMLParser(Parser):
                 # Just skip it
                 pass
 
-            # Read next record
-            record = self.read_record()
-
-        # Lastly, close the file
-        self.close()
+        logger.debug(
+            "Finished reading %d records from kickstart file %s"
+            % (len(my_reply), self._kickstart_output_file)
+        )
 
         return my_reply
 
-    def read_record(self):
+    def split_records(self, buffer):
         """
-        This function reads an invocation record from the kickstart
-        output file. We also look for the struct at the end of a file
-        containing multiple records. It returns a string containing
-        the record, or None if it is not found.
+        This function splits the contents of a kickstart output file
+        into records, in a single pass over its lines. It yields a
+        string for each invocation record, clustered or task record,
+        and multipart record. We also look for the struct at the end
+        of a file containing multiple records.
         """
-        buffer = ""
-
-        # valid token that is parsed
-        token = ""
-
-        self._record_number += 1
-        logger.debug(
-            "Started reading record number %d from kickstart file %s"
-            % (self._record_number, self._kickstart_output_file)
-        )
-
-        # First, we find the beginning <invocation xmlns....
-        while True:
-            line = self._fh.readline()
-            if line == "":
-                # End of file, record not found
-                return None
-            if line.find("- invocation:") != -1:
-                token = "- invocation:"
-                break
-            if line.find("[cluster-task") != -1:
-                token = "[cluster-task"
-                break
-            if line.find("[cluster-summary") != -1:
-                token = "[cluster-summary"
-                break
-            if line.find("[seqexec-task") != -1:
-                # deprecated token
-                token = "[seqexec-task"
-                break
-            if line.find("[seqexec-summary") != -1:
-                # deprecated token
-                token = "[seqexec-summary"
-                break
-            if line.find("---------------pegasus-multipart") == 0:
-                # token
-                token = "pegasus-multipart"
-                break
-
-        # Found something!
-        if token == "- invocation:":
-            # Found invocation record
-            start = line.find("- invocation:")
-            buffer = line[start:]
-            # Check if we have everything in a single line
-            # Not clear what to do for that for YAML records
-        elif token == "pegasus-multipart":
-            buffer = ""
-        elif token == "[cluster-summary" or token == "[seqexec-summary":
-            # Found line with cluster jobs summary
-            start = line.find(token)
-            buffer = line[start:]
-            end = buffer.find("]")
-
-            if end >= 0:
-                end = end + len("]")
-                return buffer[:end]
-
-            # clustered record should be in a single line!
-            logger.warning(
-                "%s: %s line is malformed... ignoring it..."
-                % (self._kickstart_output_file, token)
-            )
-            return ""
-        elif token == "[cluster-task" or token == "[seqexec-task":
-            # Found line with task information
-            start = line.find(token)
-            buffer = line[start:]
-            end = buffer.find("]")
-
-            if end >= 0:
-                end = end + len("]")
-                return buffer[:end]
-
-            # task record should be in a single line!
-            logger.warning(
-                "%s: %s line is malformed... ignoring it..."
-                % (self._kickstart_output_file, token)
-            )
-            return ""
-        else:
-            return ""
-
-        # Ok, now continue reading the file until we get a full record
-        buffer = [buffer]
-
-        while True:
-            file_ptr = self._fh.tell()
-            line = self._fh.readline()
-            if line == "":
-                # End of file
-                break
+        lines = buffer.split("\n")
+        # the last line has no newline, and is empty if the file ends with one
+        last_line = lines.pop()
+        lines = [line + "\n" for line in lines]
+        if last_line:
+            lines.append(last_line)
+
+        num_lines = len(lines)
+        i = 0
+        while i < num_lines:
+            line = lines[i]
+            i += 1
+
+            # First, we find the beginning of a record
+            token = None
+            for my_token in RECORD_TOKENS:
+                start = line.find(my_token)
+                if start != -1:
+                    token = my_token
+                    break
+            else:
+                if line.startswith(MULTIPART_TOKEN):
+                    token = MULTIPART_TOKEN
+
+            if token is None:
+                continue
+
+            if token == "- invocation:":
+                # Found invocation record
+                # Not clear what to do for records in a single line for YAML
+                record = [line[start:]]
+            elif token == MULTIPART_TOKEN:
+                record = []
+            else:
+                # Found line with cluster jobs summary, or task information
+                buffer = line[start:]
+                end = buffer.find("]")
+
+                if end >= 0:
+                    yield buffer[: end + len("]")]
+                else:
+                    # clustered and task records should be in a single line!
+                    logger.warning(
+                        "%s: %s line is malformed... ignoring it..."
+                        % (self._kickstart_output_file, token)
+                    )
+                continue
 
-            if (
-                line.find("[cluster-") == 0
-                or line.find("---------------pegasus-multipart") == 0
-            ):
-                # this is to trigger end of parsing of a single kickstart record
-                logger.debug(
-                    "Hit end of invocation record in file %s: "
-                    % self._kickstart_output_file
-                )
-                # back track file pointer
-                self._fh.seek(file_ptr)
-                break
-            elif line[0] in [" ", "-", "\n"]:
-                buffer.append(line)
+            # Ok, now continue until we get a full record
+            while i < num_lines:
+                line = lines[i]
+                if line.startswith("[cluster-") or line.startswith(MULTIPART_TOKEN):
+                    # this is to trigger end of parsing of a single kickstart record
+                    break
+                if line[0] in " -\n":
+                    record.append(line)
+                i += 1
 
-        record = "".join(buffer)
-        logger.debug(
-            "Finished reading record number %d from kickstart file %s"
-            % (self._record_number, self._kickstart_output_file)
-        )
-        return record
+            yield "".join(record)
 
     def dicts_remap(self, src, src_keys, dst, dst_keys):
         """
@@ -510,6 +493,23 @@ class YAMLParser(Parser):
 
         dst[dst_keys[-1]] = src
 
+    def yaml_map(self, keys_dict=None):
+        """
+        Returns the mappings from YAML_TO_VER2_MAP for the keys requested
+        in keys_dict, or for all keys if keys_dict is None, and whether
+        the output files are requested.
+        """
+        my_map = [
+            (yaml_keys, [ver2_key])
+            for yaml_keys, ver2_key, element, attribute in YAML_TO_VER2_MAP
+            if keys_dict is None
+            or (
+                element in keys_dict
+                and (attribute is None or attribute in keys_dict[element])
+            )
+        ]
+        return my_map, keys_dict is None or "statinfo" in keys_dict
+
     def map_yaml_to_ver2_format(self, data):
         """
         Maps from new yaml dict format to old v2 format we used with the xml records
@@ -517,50 +517,8 @@ class YAMLParser(Parser):
         # unmappable:
         #  "file": ["name"]
 
-        # new format -> old format
-        my_map = [
-            [["hostname"], ["hostname"]],
-            [["resource"], ["resource"]],
-            [["user"], ["user"]],
-            [["hostaddr"], ["hostaddr"]],
-            [["transformation"], ["transformation"]],
-            [["derivation"], ["derivation"]],
-            [["mainjob", "duration"], ["duration"]],
-            [["mainjob", "start"], ["start"]],
-            [["mainjob", "usage", "utime"], ["utime"]],
-            [["mainjob", "usage", "stime"], ["stime"]],
-            [["mainjob", "usage", "maxrss"], ["maxrss"]],
-            [["machine", "ram_total"], ["ram"]],
-            [["machine", "uname_system"], ["system"]],
-            [["machine", "uname_release"], ["release"]],
-            [["machine", "uname_machine"], ["machine"]],
-            [["mainjob", "executable", "file_name"], ["name"]],
-            [["mainjob", "status", "raw"], ["raw"]],
-            [["mainjob", "status", "signalled_signal"], ["signal"]],
-            [["mainjob", "status", "signalled_name"], ["action"]],
-            [["mainjob", "status", "corefile"], ["corefile"]],
-            [["mainjob", "status", "regular_exitcode"], ["exitcode"]],
-            [["cwd"], ["cwd"]],
-            [["files", "stdout", "data"], ["stdout"]],
-            [["files", "stderr", "data"], ["stderr"]],
-        ]
-
-        #        stampede_elements = {"invocation": ["hostname", "resource", "user", "hostaddr", "transformation", "derivation"],
-        #                             "mainjob": ["duration", "start"],
-        #                             "usage": ["utime", "stime"],
-        #                             "ram": ["total"],
-        #                             "uname": ["system", "release", "machine"],
-        #                             "file": ["name"],
-        #                             "status": ["raw"],
-        #                             "signalled": ["signal", "corefile", "action"], #action is the char data in signalled element
-        #                             "regular": ["exitcode"],
-        #                             "argument-vector": [],
-        #                             "cwd": [],
-        #                             "stdout": [],
-        #                             "stderr": [],
-        #                             "statinfo": ["lfn", "size", "ctime", "user" ],
-        #                             "checksum": ["type", "value", "timing"],
-        #                             "type": ["type", "value"]}
+        # new format -> old format, only for the requested keys
+        my_map, my_outputs = self._yaml_map
 
         new_data = {}
         new_data["invocation"] = True
@@ -570,7 +528,7 @@ class YAMLParser(Parser):
             self.dicts_remap(data, mapping[0], new_data, mapping[1])
 
         # some mappings are based on lfns
-        if "files" in data:
+        if my_outputs and "files" in data:
             for lfn in data["files"]:
                 file_data = data["files"][lfn]
                 output = file_data["output"] if "output" in file_data.keys() else False
@@ -626,7 +584,7 @@ class YAMLParser(Parser):
             return entry
 
         try:
-            entry = yaml.safe_load(buffer)[0]
+            entry = yaml.load(buffer)[0]
         except Exception as e:
             logger.warning(
                 "KICKSTART-PARSE-ERROR --> yaml error in %s : %s"
@@ -656,7 +614,7 @@ class YAMLParser(Parser):
         """
         entries = {}
         try:
-            entries = yaml.safe_load(buffer)
+            entries = yaml.load(buffer)
         except Exception as e:
             logger.warning(
                 "KICKSTART-PARSE-ERROR --> yaml error in multipart record %s : %s"
@@ -1,11 +1,13 @@
+import json
 from collections import defaultdict
-from io import StringIO
-from typing import TextIO
+from io import BytesIO, StringIO
+from typing import Iterable, TextIO, Union
 
 from Pegasus import yaml
 from Pegasus.api.errors import PegasusError
 from Pegasus.api.replica_catalog import File
 from Pegasus.api.workflow import (
+    AbstractJob,
     Job,
     SubWorkflow,
     Workflow,
@@ -42,6 +44,162 @@ __all__ = (
 )
 
 
+# number of characters read at a time to tell JSON documents from YAML ones
+_PEEK_SIZE = 1024
+
+_LINK_TYPES = {t.name.lower(): t.value for t in _LinkType}
+
+
+def _to_job(j: dict, files: dict) -> AbstractJob:
+    """Convert dict to Job or SubWorkflow
+
+    The jobs of a workflow use the same files over and over, e.g. the output
+    of a job is read by the next ones, so identical files are only created
+    once, and shared by the jobs using them.
+
+    :param j: Job or SubWorkflow represented as a dict
+    :type j: dict
+    :param files: files already created for the workflow, by lfn
+    :type files: dict
+    :raises PegasusError: encountered error parsing
+    :return: a Job or SubWorkflow object based on j
+    :rtype: AbstractJob
+    """
+
+    try:
+        # create appropriate job based on type
+        if j["type"] == "job":
+            job = Job(
+                j["name"],
+                _id=j["id"],
+                node_label=j.get("nodeLabel"),
+                namespace=j.get("namespace"),
+                version=j.get("version"),
+            )
+        elif j["type"] in {"pegasusWorkflow", "condorWorkflow"}:
+            f = File(j["file"])
+
+            is_planned = False if j["type"] == "pegasusWorkflow" else True
+
+            job = SubWorkflow(f, is_planned, _id=j["id"], node_label=j.get("nodeLabel"))
+
+        else:
+            raise ValueError
+
+        # add args
+        job.args = list(j["arguments"])
+
+        # add uses, built directly, only checking what _Use would reject
+        uses = set()
+        lfns = dict()
+        for u in j["uses"]:
+            lfn = u["lfn"]
+            size = u.get("size")
+            metadata = (
+                u["metadata"] if "metadata" in u else {"size": size} if size else None
+            )
+
+            f = files.get(lfn)
+            if f is None or f.size != size or f._metadata != metadata:
+                f = File(lfn, size=size)
+                f._metadata = metadata
+                files[lfn] = f
+
+            use = _Use.__new__(_Use)
+            use.file = f
+            use._type = _LINK_TYPES[u["type"].lower()]
+            use.stage_out = u.get("stageOut")
+            use.register_replica = u.get("registerReplica")
+            use.bypass = u.get("bypass") or None
+
+            if use.bypass and use._type != _LinkType.INPUT.value:
+                raise ValueError(
+                    "bypass can only be set to True when link type is INPUT"
+                )
+
+            uses.add(use)
+            lfns.setdefault(lfn, f)
+
+        job.uses = uses
+
+        # set stdin, stdout and stderr
+        if "stdin" in j:
+            job.stdin = lfns.get(j["stdin"])
+
+        if "stdout" in j:
+            job.stdout = lfns.get(j["stdout"])
+
+        if "stderr" in j:
+            job.stderr = lfns.get(j["stderr"])
+
+        # add profiles
+        if j.get("profiles"):
+            job.profiles = defaultdict(dict, j.get("profiles"))
+
+        # add metadata
+        if j.get("metadata"):
+            job.metadata = j.get("metadata")
+
+        # add hooks
+        if j.get("hooks"):
+            job.hooks = defaultdict(list, j.get("hooks"))
+
+        return job
+    except (AttributeError, KeyError, TypeError, ValueError):
+        raise PegasusError("error parsing {}".format(j))
+
+
+def _build_wf(d: dict, jobs: Iterable[AbstractJob]) -> Workflow:
+    """Create a Workflow from its dict representation and its jobs
+
+    :param d: Workflow represented as a dict, its jobs aside
+    :type d: dict
+    :param jobs: jobs of the workflow
+    :type jobs: Iterable[AbstractJob]
+    :return: a Workflow object based on d
+    :rtype: Workflow
+    """
+    wf = Workflow(d["name"], infer_dependencies=False)
+
+    # add rc
+    if "replicaCatalog" in d:
+        wf.replica_catalog = _to_rc(d["replicaCatalog"])
+
+    # add tc
+    if "transformationCatalog" in d:
+        wf.transformation_catalog = _to_tc(d["transformationCatalog"])
+
+    # add sc
+    if "siteCatalog" in d:
+        wf.site_catalog = _to_sc(d["siteCatalog"])
+
+    # add jobs
+    for job in jobs:
+        wf.add_jobs(job)
+
+    # add dependencies
+    if d.get("jobDependencies"):
+        dependencies = defaultdict(_JobDependency)
+        for item in d.get("jobDependencies"):
+            dependencies[item["id"]] = _JobDependency(item["id"], set(item["children"]))
+
+        wf.dependencies = dependencies
+
+    # add profiles
+    if d.get("profiles"):
+        wf.profiles = defaultdict(dict, d.get("profiles"))
+
+    # add metadata
+    if d.get("metadata"):
+        wf.metadata = d.get("metadata")
+
+    # add hooks
+    if d.get("hooks"):
+        wf.hooks = defaultdict(list, d.get("hooks"))
+
+    return wf
+
+
 def _to_wf(d: dict) -> Workflow:
     """Convert dict to Workflow
 
@@ -53,148 +211,94 @@ def _to_wf(d: dict) -> Workflow:
     """
 
     try:
-        #
-        wf = Workflow(d["name"], infer_dependencies=False)
-
-        # add rc
-        if "replicaCatalog" in d:
-            wf.replica_catalog = _to_rc(d["replicaCatalog"])
-
-        # add tc
-        if "transformationCatalog" in d:
-            wf.transformation_catalog = _to_tc(d["transformationCatalog"])
-
-        # add sc
-        if "siteCatalog" in d:
-            wf.site_catalog = _to_sc(d["siteCatalog"])
-
-        # add jobs
-        for j in d["jobs"]:
-            # create appropriate job based on type
-            if j["type"] == "job":
-                job = Job(
-                    j["name"],
-                    _id=j["id"],
-                    node_label=j.get("nodeLabel"),
-                    namespace=j.get("namespace"),
-                    version=j.get("version"),
-                )
-            elif j["type"] in {"pegasusWorkflow", "condorWorkflow"}:
-                f = File(j["file"])
+        files = dict()
+        return _build_wf(d, (_to_job(j, files) for j in d["jobs"]))
+    except (KeyError, TypeError, ValueError):
+        raise PegasusError("error parsing {}".format(d))
 
-                is_planned = False if j["type"] == "pegasusWorkflow" else True
 
-                job = SubWorkflow(
-                    f, is_planned, _id=j["id"], node_label=j.get("nodeLabel")
-                )
+def _load_yaml(stream) -> Workflow:
+    """Deserialize a YAML Workflow document
 
-            else:
-                raise ValueError
-
-            # add args
-            args = list()
-            for a in j["arguments"]:
-                args.append(a)
-
-            job.args = args
-
-            # add uses
-            uses = set()
-            for u in j["uses"]:
-                f = File(u["lfn"], size=u.get("size"))
-                try:
-                    f.metadata = u["metadata"]
-                except KeyError:
-                    pass
-
-                uses.add(
-                    _Use(
-                        f,
-                        getattr(_LinkType, u["type"].upper()),
-                        stage_out=u.get("stageOut"),
-                        register_replica=u.get("registerReplica"),
-                        bypass_staging=u.get("bypass"),
-                    )
-                )
+    The jobs are converted as they are parsed, so that the dicts representing
+    them never have to be held in memory all at once.
 
-            job.uses = uses
-
-            # set stdin
-            if "stdin" in j:
-                for u in job.uses:
-                    if u.file.lfn == j["stdin"]:
-                        job.stdin = u.file
-                        break
-
-            # set stdout
-            if "stdout" in j:
-                for u in job.uses:
-                    if u.file.lfn == j["stdout"]:
-                        job.stdout = u.file
-                        break
-
-            # set stderr
-            if "stderr" in j:
-                for u in job.uses:
-                    if u.file.lfn == j["stderr"]:
-                        job.stderr = u.file
-                        break
-
-            # add profiles
-            if j.get("profiles"):
-                job.profiles = defaultdict(dict, j.get("profiles"))
-
-            # add metadata
-            if j.get("metadata"):
-                job.metadata = j.get("metadata")
-
-            # add hooks
-            if j.get("hooks"):
-                job.hooks = defaultdict(list, j.get("hooks"))
-
-            # add job to wf
-            wf.add_jobs(job)
-
-        # add dependencies
-        if d.get("jobDependencies"):
-            dependencies = defaultdict(_JobDependency)
-            for item in d.get("jobDependencies"):
-                dependencies[item["id"]] = _JobDependency(
-                    item["id"], {child for child in item["children"]}
-                )
+    :param stream: YAML document to deserialize
+    :raises PegasusError: encountered error parsing
+    :return: deserialized Workflow object
+    :rtype: Workflow
+    """
+    d = dict()
 
-            wf.dependencies = dependencies
+    try:
+        files = dict()
+        for key, value in yaml.iter_items(stream, lazy={"jobs"}):
+            if key == "jobs":
+                value = [_to_job(j, files) for j in value]
 
-        # add profiles
-        if d.get("profiles"):
-            wf.profiles = defaultdict(dict, d.get("profiles"))
+            d[key] = value
 
-        # add metadata
-        if d.get("metadata"):
-            wf.metadata = d.get("metadata")
+        return _build_wf(d, d.pop("jobs"))
+    except (KeyError, TypeError, ValueError):
+        raise PegasusError("error parsing {}".format(d))
 
-        # add hooks
-        if d.get("hooks"):
-            wf.hooks = defaultdict(list, d.get("hooks"))
 
-        return wf
-    except (KeyError, ValueError):
-        raise PegasusError("error parsing {}".format(d))
+class _PrefixedStream:
+    """Read-only stream returning the start of a stream, already read from it,
+    followed by the rest of the stream"""
+
+    def __init__(self, prefix: Union[str, bytes], stream: TextIO):
+        self.prefix = prefix
+        self.stream = stream
+        self.name = getattr(stream, "name", "<file>")
+
+    def read(self, size: int = -1) -> Union[str, bytes]:
+        if not self.prefix:
+            return self.stream.read(size)
+
+        if size is None or size < 0:
+            data = self.prefix + self.stream.read()
+            self.prefix = self.prefix[:0]
+        else:
+            data = self.prefix[:size]
+            self.prefix = self.prefix[size:]
+
+        return data
 
 
 def load(fp: TextIO, *args, **kwargs) -> Workflow:
     """
     Deserialize ``fp`` (a ``.read()``-supporting file-like object containing a Workflow document) to a :py:class:`~Pegasus.api.workflow.Workflow` object.
 
+    JSON documents, which are much faster to parse than YAML ones, are told
+    apart by their first character.
+
     :param fp: file like object to load from
     :type fp: TextIO
     :return: deserialized Workflow object
     :rtype: Workflow
     """
-    return _to_wf(yaml.load(fp))
+    head = fp.read(_PEEK_SIZE)
+    while head.isspace():
+        chunk = fp.read(_PEEK_SIZE)
+        if not chunk:
+            break
+        head += chunk
+
+    if head.lstrip()[:1] not in {"{", b"{"}:
+        return _load_yaml(_PrefixedStream(head, fp))
+
+    s = head + fp.read()
+    try:
+        d = json.loads(s)
+    except ValueError:
+        # YAML document in flow style
+        return _load_yaml(s)
+
+    return _to_wf(d)
 
 
-def loads(s: str, *args, **kwargs) -> Workflow:
+def loads(s: Union[str, bytes], *args, **kwargs) -> Workflow:
     """
     Deserialize ``s`` (a ``str``, ``bytes`` or ``bytearray`` instance containing a Workflow document) to a :py:class:`~Pegasus.api.workflow.Workflow` object.
 
@@ -203,7 +307,7 @@ def loads(s: str, *args, **kwargs) -> Workflow:
     :return: deserialized Workflow object
     :rtype: Workflow
     """
-    return _to_wf(yaml.load(s))
+    return load(StringIO(s) if isinstance(s, str) else BytesIO(s))
 
 
 def dump(obj: Workflow, fp: TextIO, _format="yml", *args, **kwargs) -> None:
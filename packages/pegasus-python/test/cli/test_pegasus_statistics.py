@@ -0,0 +1,88 @@
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+STATISTICS = (
+    Path(__file__).parent.parent.parent
+    / "src"
+    / "Pegasus"
+    / "cli"
+    / "pegasus-statistics.py"
+)
+
+DB = (
+    Path(__file__).parent.parent
+    / "service"
+    / "monitoring"
+    / "monitoring-rest-api-master.db"
+)
+
+WF_UUIDS = [
+    "7193de8c-a28d-4eca-b576-1b1c3c4f668b",
+    "41920a57-7882-4990-854e-658b7a797745",
+    "fce67b41-df67-4b3c-8fa4-d77e6e2b9769",
+    "9f366372-2798-4f6d-a48d-f6c94470d3ed",
+    "3d515ced-7d44-4236-800b-4bcb6bc37da8",
+]
+
+
+@pytest.fixture(scope="module")
+def properties(tmp_path_factory):
+    tmp_path = tmp_path_factory.mktemp("statistics")
+    db_path = tmp_path / "workflow.db"
+    shutil.copy(str(DB), str(db_path))
+
+    # make the other workflows sub workflows of the first one, so that the
+    # per workflow statistics are computed for several workflows
+    db = sqlite3.connect(str(db_path))
+    db.execute("UPDATE workflow SET parent_wf_id = 1, root_wf_id = 1 WHERE wf_id > 1")
+    db.commit()
+    db.close()
+
+    properties = tmp_path / "pegasus.properties"
+    properties.write_text("pegasus.monitord.output = sqlite:///%s\n" % db_path)
+    return str(properties)
+
+
+def _statistics(properties, output_dir, jobs, file_type):
+    # some of the combined statistics fail on the test database, so the
+    # return codes are compared rather than checked
+    p = subprocess.run(
+        [
+            sys.executable,
+            str(STATISTICS),
+            "-c",
+            properties,
+            "-i",
+            "-u",
+            "-s",
+            "all",
+            "-f",
+            file_type,
+            "-o",
+            str(output_dir),
+            "-j",
+            str(jobs),
+            WF_UUIDS[0],
+        ],
+        env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)),
+        stdout=subprocess.DEVNULL,
+    )
+    return p.returncode, {f.name: f.read_text() for f in output_dir.iterdir()}
+
+
+@pytest.mark.parametrize("file_type", ["text", "csv"])
+def test_jobs(properties, tmp_path, file_type):
+    expected = _statistics(properties, tmp_path / "j1", 1, file_type)
+    result = _statistics(properties, tmp_path / "j3", 3, file_type)
+
+    assert result == expected
+
+    # the workflows went through the worker pool
+    breakdown = expected[1]["breakdown.txt" if file_type == "text" else "breakdown.csv"]
+    assert sum(wf_uuid in breakdown for wf_uuid in WF_UUIDS) > 1
@@ -62,6 +62,63 @@ class TestConnection(unittest.TestCase):
         db.close()
         _remove(filename)
 
+    def test_engine_reused(self):
+        filename = str(uuid.uuid4())
+        _silentremove(filename)
+        dburi = "sqlite:///%s" % filename
+        db1 = connection.connect(dburi, create=True, verbose=False)
+        db2 = connection.connect(dburi, verbose=False)
+        self.assertIs(db1.get_bind(), db2.get_bind())
+        db1.close()
+        db2.close()
+
+        db1 = connection.connect("sqlite://", create=True, verbose=False)
+        db2 = connection.connect("sqlite://", create=True, verbose=False)
+        self.assertIsNot(db1.get_bind(), db2.get_bind())
+        db1.close()
+        db2.close()
+
+        connection.dispose_engines()
+        _remove(filename)
+
+    def test_schema_verification_cached(self):
+        filename = str(uuid.uuid4())
+        _silentremove(filename)
+        dburi = "sqlite:///%s" % filename
+        db = connection.connect(dburi, create=True, verbose=False)
+        db.close()
+
+        db = connection.connect(dburi, verbose=False)
+        db.execute("DROP TABLE rc_pfn")
+        db.close()
+
+        # the schema was verified by the previous connect
+        db = connection.connect(dburi, verbose=False)
+        db.close()
+
+        connection.forget_schema_verification()
+        self.assertRaises(DBAdminError, connection.connect, dburi, verbose=False)
+
+        connection.dispose_engines()
+        _remove(filename)
+
+    def test_schema_verification_downgrade(self):
+        filename = str(uuid.uuid4())
+        _silentremove(filename)
+        dburi = "sqlite:///%s" % filename
+        db = connection.connect(dburi, create=True, verbose=False)
+        db.close()
+
+        db = connection.connect(dburi, verbose=False)
+        db_downgrade(db, pegasus_version="4.7.0", verbose=False)
+        RCLFN.__table__._set_parent(metadata)
+        db.close()
+
+        self.assertRaises(DBAdminError, connection.connect, dburi, verbose=False)
+
+        connection.dispose_engines()
+        _remove(filename)
+
 
 def _silentremove(filename):
     try:
@@ -0,0 +1,78 @@
+import shutil
+from pathlib import Path
+
+import pytest
+
+from Pegasus.db import connection
+from Pegasus.db.schema import Jobstate
+from Pegasus.db.workflow.stampede_statistics import StampedeStatistics
+
+DB = (
+    Path(__file__).parent.parent
+    / "service"
+    / "monitoring"
+    / "monitoring-rest-api-master.db"
+)
+
+
+@pytest.fixture(scope="module")
+def dburi(tmp_path_factory):
+    db_path = tmp_path_factory.mktemp("stats") / "workflow.db"
+    shutil.copy(str(DB), str(db_path))
+    dburi = "sqlite:///%s" % db_path
+
+    # add grid submit states, which the test database does not have
+    db = connection.connect(dburi, verbose=False, print_version=False)
+    for job_instance_id, timestamp in [(1, 1421432551), (22, 1421432552)]:
+        db.add(
+            Jobstate(
+                job_instance_id=job_instance_id,
+                state="GRID_SUBMIT",
+                timestamp=timestamp,
+                jobstate_submit_seq=10,
+            )
+        )
+    db.commit()
+    db.close()
+
+    return dburi
+
+
+@pytest.mark.parametrize("wf_id", [1, 2, 3, 4, 5])
+def test_job_statistics_single_pass(dburi, wf_id):
+    stats = StampedeStatistics(dburi, expand_workflow=False)
+    stats.initialize(root_wf_id=wf_id)
+
+    try:
+        expected = stats.get_job_statistics()
+        result = stats.get_job_statistics(single_pass=True)
+    finally:
+        stats.close()
+
+    assert [tuple(row) for row in result] == [tuple(row) for row in expected]
+    assert [row.keys() for row in result] == [row.keys() for row in expected]
+
+
+def test_job_statistics_resource_delay(dburi):
+    stats = StampedeStatistics(dburi, expand_workflow=False)
+    stats.initialize(root_wf_id=1)
+
+    try:
+        result = stats.get_job_statistics(single_pass=True)
+    finally:
+        stats.close()
+
+    assert [row.resource_delay for row in result if row.job_instance_id == 1] == [3.0]
+
+
+def test_iter_job_statistics(dburi):
+    stats = StampedeStatistics(dburi, expand_workflow=False)
+    stats.initialize(root_wf_id=1)
+
+    try:
+        expected = stats.get_job_statistics()
+        result = list(stats.iter_job_statistics(batch_size=2))
+    finally:
+        stats.close()
+
+    assert [tuple(row) for row in result] == [tuple(row) for row in expected]
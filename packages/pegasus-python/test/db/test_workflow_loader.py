@@ -0,0 +1,219 @@
+import logging
+import uuid
+
+import pytest
+
+from Pegasus.db import connection
+from Pegasus.db.schema import *
+from Pegasus.db.workflow_loader import LRUCache, WorkflowLoader
+from Pegasus.tools import properties, utils
+
+
+@pytest.fixture(scope="module", autouse=True)
+def configure_logging():
+    # the loaders log at TRACE level, which is added by configureLogging
+    utils.configureLogging(level=logging.WARNING)
+
+
+def _events(wf_uuid, num_jobs, duplicate_invocation=False):
+    """Generate the stampede events for a workflow of independent jobs."""
+    ts = 1600000000.0
+
+    yield {
+        "event": "stampede.wf.plan",
+        "xwf.id": wf_uuid,
+        "root.xwf.id": wf_uuid,
+        "ts": ts,
+        "submit.hostname": "localhost",
+        "dax.label": "test",
+        "argv": "pegasus-plan",
+    }
+    yield {"event": "stampede.static.start", "xwf.id": wf_uuid, "ts": ts}
+    for i in range(num_jobs):
+        yield {
+            "event": "stampede.task.info",
+            "xwf.id": wf_uuid,
+            "task.id": "ID%d" % i,
+            "transformation": "tr",
+            "type_desc": "compute",
+            "ts": ts,
+        }
+        yield {
+            "event": "stampede.job.info",
+            "xwf.id": wf_uuid,
+            "job.id": "job_%d" % i,
+            "submit_file": "job_%d.sub" % i,
+            "type_desc": "compute",
+            "clustered": "0",
+            "max_retries": 3,
+            "executable": "/bin/true",
+            "task_count": 1,
+            "ts": ts,
+        }
+    for i in range(num_jobs):
+        yield {
+            "event": "stampede.wf.map.task_job",
+            "xwf.id": wf_uuid,
+            "task.id": "ID%d" % i,
+            "job.id": "job_%d" % i,
+            "ts": ts,
+        }
+    yield {"event": "stampede.static.end", "xwf.id": wf_uuid, "ts": ts}
+    yield {
+        "event": "stampede.xwf.start",
+        "xwf.id": wf_uuid,
+        "restart_count": 0,
+        "ts": ts,
+    }
+    for i in range(num_jobs):
+        job = {"xwf.id": wf_uuid, "job.id": "job_%d" % i, "job_inst.id": 1}
+        yield dict(job, event="stampede.job_inst.submit.start", ts=ts)
+        yield dict(job, event="stampede.job_inst.submit.end", js_id=1, ts=ts, status=0)
+        yield dict(job, event="stampede.job_inst.main.start", js_id=2, ts=ts + 1)
+        yield dict(
+            job,
+            event="stampede.job_inst.host.info",
+            site="local",
+            hostname="host%d" % (i % 3),
+            ip="127.0.0.1",
+            ts=ts + 1,
+        )
+        invocations = [1, 1] if duplicate_invocation and i == 0 else [1]
+        for inv_id in invocations:
+            yield dict(
+                job,
+                event="stampede.inv.end",
+                inv_id=inv_id,
+                start_time=ts + 1,
+                dur=1.5,
+                exitcode=0,
+                transformation="tr",
+                executable="/bin/true",
+                ts=ts + 2,
+            )
+        yield dict(
+            job, event="stampede.job_inst.main.end", js_id=3, ts=ts + 3, status=0
+        )
+    yield {
+        "event": "stampede.xwf.end",
+        "xwf.id": wf_uuid,
+        "restart_count": 0,
+        "status": 0,
+        "ts": ts + 4,
+    }
+
+
+def _load(dburi, flush_mode, events, cache_size=None):
+    loader = WorkflowLoader(
+        dburi,
+        batch=True,
+        props=properties.Properties(),
+        flush_mode=flush_mode,
+        cache_size=cache_size,
+    )
+    for event in events:
+        loader.process(event)
+    loader.finish()
+    return loader
+
+
+def _count(dburi, table):
+    db = connection.connect(dburi, verbose=False, print_version=False)
+    try:
+        return db.query(table).count()
+    finally:
+        db.close()
+
+
+@pytest.mark.parametrize("flush_mode", WorkflowLoader.FLUSH_MODES)
+def test_flush_modes(tmp_path, flush_mode):
+    dburi = "sqlite:///%s" % (tmp_path / "workflow.db")
+    _load(dburi, flush_mode, _events(str(uuid.uuid4()), 25))
+
+    assert _count(dburi, Workflow) == 1
+    assert _count(dburi, Workflowstate) == 2
+    assert _count(dburi, Job) == 25
+    assert _count(dburi, Task) == 25
+    assert _count(dburi, JobInstance) == 25
+    assert _count(dburi, Jobstate) == 75
+    assert _count(dburi, Invocation) == 25
+    assert _count(dburi, Host) == 3
+
+    db = connection.connect(dburi, verbose=False, print_version=False)
+    try:
+        assert db.query(Task).filter(Task.job_id.is_(None)).count() == 0
+        assert db.query(JobInstance).filter(JobInstance.host_id.is_(None)).count() == 0
+    finally:
+        db.close()
+
+
+def test_bulk_flush_isolates_bad_rows(tmp_path):
+    dburi = "sqlite:///%s" % (tmp_path / "workflow.db")
+    _load(
+        dburi,
+        WorkflowLoader.FLUSH_MODE_BULK,
+        _events(str(uuid.uuid4()), 25, duplicate_invocation=True),
+    )
+
+    assert _count(dburi, Invocation) == 25
+    assert _count(dburi, Jobstate) == 75
+    assert _count(dburi, Workflowstate) == 2
+
+
+def test_invalid_flush_mode(tmp_path):
+    dburi = "sqlite:///%s" % (tmp_path / "workflow.db")
+    with pytest.raises(ValueError):
+        WorkflowLoader(
+            dburi, batch=True, props=properties.Properties(), flush_mode="invalid"
+        )
+
+
+def test_lru_cache():
+    cache = LRUCache(max_size=2)
+    cache["a"] = 1
+    cache["b"] = 2
+
+    assert cache.get("a") == 1
+    cache["c"] = 3
+
+    assert "a" in cache
+    assert "b" not in cache
+    assert "c" in cache
+    assert cache.get("b") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_lru_cache_unbounded():
+    cache = LRUCache(max_size=0)
+    for i in range(100):
+        cache[i] = i
+
+    assert len(cache) == 100
+
+
+def test_caches_purged_on_workflow_end(tmp_path):
+    dburi = "sqlite:///%s" % (tmp_path / "workflow.db")
+    loader = _load(
+        dburi, WorkflowLoader.FLUSH_MODE_ORM, _events(str(uuid.uuid4()), 25), 5
+    )
+
+    assert loader._wf_caches == {}
+    assert loader.wf_id_cache == {}
+    assert _count(dburi, Jobstate) == 75
+    assert _count(dburi, Invocation) == 25
+
+
+def test_preload_wf_ids(tmp_path):
+    dburi = "sqlite:///%s" % (tmp_path / "workflow.db")
+    wf_uuid = str(uuid.uuid4())
+    loader = WorkflowLoader(dburi, batch=True, props=properties.Properties())
+    for event in _events(wf_uuid, 10):
+        loader.process(event)
+        if event["event"] == "stampede.static.end":
+            break
+
+    cache = loader.get_wf_cache(loader.wf_uuid_to_id(wf_uuid))
+    assert len(cache.job_id) == 10
+    assert len(cache.task_id) == 10
+    assert cache.task_id.misses == 0
+    loader.finish()
@@ -0,0 +1,218 @@
+import logging
+import socket
+import threading
+import uuid
+
+import pytest
+
+from Pegasus.db import connection
+from Pegasus.db.schema import Job, JobInstance, Jobstate, Task, Workflow
+from Pegasus.monitoring import event_output as eo
+from Pegasus.tools import properties, utils
+
+
+@pytest.fixture(scope="module", autouse=True)
+def configure_logging():
+    # the sinks log at TRACE level, which is added by configureLogging
+    utils.configureLogging(level=logging.WARNING)
+
+
+def _events(wf_uuid, num_jobs):
+    """Generate the events monitord sends for a workflow of independent jobs."""
+    ts = 1600000000.0
+    wf = {"xwf__id": wf_uuid, "ts": ts}
+
+    yield "wf.plan", dict(
+        wf,
+        root__xwf__id=wf_uuid,
+        submit__hostname="localhost",
+        dax__label="test",
+        argv="pegasus-plan",
+    )
+    yield "static.start", dict(wf)
+    for i in range(num_jobs):
+        yield "task.info", dict(
+            wf, task__id="ID%d" % i, transformation="tr", type_desc="compute"
+        )
+        yield "job.info", dict(
+            wf,
+            job__id="job_%d" % i,
+            submit_file="job_%d.sub" % i,
+            type_desc="compute",
+            clustered="0",
+            max_retries=3,
+            executable="/bin/true",
+            task_count=1,
+        )
+        yield "wf.map.task_job", dict(wf, task__id="ID%d" % i, job__id="job_%d" % i)
+    yield "static.end", dict(wf)
+    yield "xwf.start", dict(wf, restart_count=0)
+    for i in range(num_jobs):
+        job = dict(wf, job__id="job_%d" % i, job_inst__id=1)
+        yield "job_inst.submit.start", dict(job)
+        yield "job_inst.submit.end", dict(job, js_id=1, status=0)
+        yield "job_inst.main.start", dict(job, js_id=2)
+        yield "job_inst.main.end", dict(job, js_id=3, status=0)
+    yield "xwf.end", dict(wf, restart_count=0, status=0)
+
+
+def _count(dburi, table):
+    db = connection.connect(dburi, verbose=False, print_version=False)
+    try:
+        return db.query(table).count()
+    finally:
+        db.close()
+
+
+@pytest.mark.parametrize("queue_size", [None, 1, 1000])
+def test_db_event_sink(tmp_path, queue_size):
+    dburi = "sqlite:///%s" % (tmp_path / "workflow.db")
+    sink = eo.DBEventSink(dburi, props=properties.Properties(), queue_size=queue_size)
+    for event, kw in _events(str(uuid.uuid4()), 50):
+        sink.send(event, kw)
+        sink.flush()
+    sink.close()
+
+    assert _count(dburi, Workflow) == 1
+    assert _count(dburi, Task) == 50
+    assert _count(dburi, Job) == 50
+    assert _count(dburi, JobInstance) == 50
+    assert _count(dburi, Jobstate) == 150
+
+
+def test_db_event_sink_loader_thread_error(tmp_path, mocker):
+    dburi = "sqlite:///%s" % (tmp_path / "workflow.db")
+    sink = eo.DBEventSink(dburi, props=properties.Properties(), queue_size=10)
+    mocker.patch.object(sink._db, "process", side_effect=RuntimeError("failed"))
+
+    events = _events(str(uuid.uuid4()), 1)
+    sink.send(*next(events))
+    sink._queue.join()
+
+    with pytest.raises(Exception):
+        sink.send(*next(events))
+    sink.close()
+
+
+def test_db_event_sink_invalid_dest(tmp_path):
+    with pytest.raises(Exception):
+        eo.DBEventSink(
+            "sqlite:///%s" % (tmp_path / "missing" / "workflow.db"),
+            props=properties.Properties(),
+            queue_size=10,
+        )
+
+
+@pytest.mark.parametrize("framing", [None, "length"])
+@pytest.mark.parametrize("buffer_size", [None, 10 ** 6])
+def test_file_event_sink(tmp_path, framing, buffer_size):
+    path = str(tmp_path / "events.json")
+    sink = eo.FileEventSink(
+        path,
+        restart=True,
+        encoder=eo.json_encode,
+        buffer_size=buffer_size,
+        framing=framing,
+    )
+    events = list(_events(str(uuid.uuid4()), 5))
+    for event, kw in events:
+        sink.send(event, dict(kw))
+    sink.close()
+
+    with open(path, "rb") as f:
+        read = list(eo.read_events(f, enc="json", framing=framing))
+
+    assert [e["event"] for e in read] == [eo.STAMPEDE_NS + e for e, kw in events]
+    assert read[-1]["restart_count"] == 0
+
+
+def test_file_event_sink_buffering(tmp_path):
+    path = tmp_path / "events.bp"
+    sink = eo.create_wf_event_sink(
+        str(path),
+        db_type=connection.DBType.WORKFLOW,
+        props=properties.Properties(),
+        enc="bp",
+        restart=True,
+        buffer_size=10 ** 6,
+    )
+    sink.send("xwf.start", {"xwf__id": "wf", "restart_count": 0})
+    assert path.read_bytes() == b""
+
+    sink.flush()
+    assert b"event=stampede.xwf.start" in path.read_bytes()
+
+    sink.send("xwf.end", {"xwf__id": "wf", "status": 0})
+    sink.close()
+    with path.open("rb") as f:
+        assert len(list(eo.read_events(f, enc="bp"))) == 2
+
+
+def test_file_event_sink_invalid_framing(tmp_path):
+    with pytest.raises(ValueError):
+        eo.FileEventSink(
+            str(tmp_path / "events"), encoder=eo.json_encode, framing="netstring"
+        )
+
+
+@pytest.mark.parametrize("framing", [None, "length"])
+def test_msgpack_file_event_sink(tmp_path, framing):
+    pytest.importorskip("msgpack")
+    path = str(tmp_path / "events.msgpack")
+    sink = eo.create_wf_event_sink(
+        path,
+        db_type=connection.DBType.WORKFLOW,
+        props=properties.Properties(),
+        enc="msgpack",
+        restart=True,
+        framing=framing,
+    )
+    for event, kw in _events(str(uuid.uuid4()), 2):
+        sink.send(event, kw)
+    sink.close()
+
+    with open(path, "rb") as f:
+        read = list(eo.read_events(f, enc="msgpack", framing=framing))
+
+    assert read[0]["event"] == "stampede.wf.plan"
+    assert read[-1]["event"] == "stampede.xwf.end"
+
+
+def test_tcp_event_sink():
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(1)
+    read = []
+
+    def receive():
+        conn, _ = server.accept()
+        with conn, conn.makefile("rb") as f:
+            read.extend(eo.read_events(f, enc="json", framing="length"))
+
+    receiver = threading.Thread(target=receive, daemon=True)
+    receiver.start()
+
+    sink = eo.create_wf_event_sink(
+        "x-tcp://127.0.0.1:%d" % server.getsockname()[1],
+        db_type=connection.DBType.WORKFLOW,
+        props=properties.Properties(),
+        enc="json",
+        buffer_size=10 ** 6,
+        framing="length",
+    )
+    events = list(_events(str(uuid.uuid4()), 5))
+    for event, kw in events:
+        sink.send(event, kw)
+    sink.close()
+    receiver.join(10)
+    server.close()
+
+    assert [e["event"] for e in read] == [eo.STAMPEDE_NS + e for e, kw in events]
+
+
+def test_read_events_truncated(tmp_path):
+    path = tmp_path / "events"
+    path.write_bytes(eo.FRAME_HEADER.pack(10) + b"{}")
+
+    with path.open("rb") as f, pytest.raises(EOFError):
+        list(eo.read_events(f, enc="json", framing="length"))
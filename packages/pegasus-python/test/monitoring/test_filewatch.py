@@ -0,0 +1,61 @@
+import sys
+import threading
+import time
+
+import pytest
+
+from Pegasus.monitoring import filewatch
+
+
+@pytest.mark.parametrize(
+    "buffer, lines, rest",
+    [
+        ("", [], ""),
+        ("partial", [], "partial"),
+        ("one\n", ["one"], ""),
+        ("one\ntwo\n\nthree", ["one", "two", ""], "three"),
+    ],
+)
+def test_split_lines(buffer, lines, rest):
+    assert filewatch.split_lines(buffer) == (lines, rest)
+
+
+def test_polling_file_watcher(tmp_path):
+    watcher = filewatch.create_file_watcher(use_inotify=False)
+    watcher.watch(str(tmp_path / "workflow.dag.dagman.out"))
+
+    assert isinstance(watcher, filewatch.PollingFileWatcher)
+    assert watcher.wait(0.01) is False
+    watcher.close()
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="requires inotify")
+def test_inotify_file_watcher(tmp_path):
+    dagman_out = tmp_path / "workflow.dag.dagman.out"
+    watcher = filewatch.create_file_watcher()
+    assert isinstance(watcher, filewatch.InotifyFileWatcher)
+
+    # the file does not exist yet, its appearance is detected
+    watcher.watch(str(dagman_out))
+    timer = threading.Timer(0.1, dagman_out.write_text, ["line\n"])
+    timer.start()
+    start = time.time()
+    assert watcher.wait(10) is True
+    assert time.time() - start < 5
+    timer.join()
+    # drain the events of the write that followed the creation
+    watcher.wait(0.1)
+
+    # changes to other files in the same directory are ignored
+    (tmp_path / "jobstate.log").write_text("state\n")
+    assert watcher.wait(0.1) is False
+
+    with dagman_out.open("a") as f:
+        f.write("another line\n")
+    assert watcher.wait(10) is True
+
+    watcher.unwatch(str(dagman_out))
+    with dagman_out.open("a") as f:
+        f.write("unwatched line\n")
+    assert watcher.wait(0.1) is False
+    watcher.close()
@@ -0,0 +1,124 @@
+import json
+
+import pytest
+
+from Pegasus.monitoring import job as job_module
+from Pegasus.monitoring.job import (
+    MONITORING_EVENT_END_MARKER,
+    MONITORING_EVENT_START_MARKER,
+    Job,
+)
+
+
+def _event(payload):
+    return (
+        MONITORING_EVENT_START_MARKER
+        + json.dumps(payload)
+        + MONITORING_EVENT_END_MARKER
+    )
+
+
+@pytest.fixture
+def job(tmp_path):
+    return Job("wf-uuid", "process_ID0000001", str(tmp_path), 1)
+
+
+@pytest.mark.parametrize(
+    "output",
+    [
+        "",
+        "no events\n",
+        "before\n" + _event({"monitoring_event": "int.metric"}) + "\nafter\n",
+        "one\r\ntwo\n",
+    ],
+)
+def test_read_task_output(tmp_path, job, output):
+    filename = tmp_path / "job.out"
+    filename.write_bytes(output.encode())
+
+    assert job.read_task_output(str(filename), 1000) == job.split_task_output(
+        output.replace("\r\n", "\n")
+    )
+
+
+def test_read_task_output_events(tmp_path, job):
+    filename = tmp_path / "job.out"
+    filename.write_text("a" + _event({"a": 1}) + _event({"b": 2}) + "b")
+
+    task_output = job.read_task_output(str(filename), 1000)
+
+    assert task_output.user_data == "ab"
+    assert task_output.events == [{"a": 1}, {"b": 2}]
+
+
+@pytest.mark.parametrize("read_size", [1, 7, 31, 1000])
+def test_read_task_output_chunks(tmp_path, job, monkeypatch, read_size):
+    monkeypatch.setattr(job_module, "OUTPUT_READ_SIZE", read_size)
+    filename = tmp_path / "job.out"
+    filename.write_text("a@@@" + _event({"a": 1}) + "b" + _event({"b": 2}) + "@@")
+
+    task_output = job.read_task_output(str(filename), 1000)
+
+    assert task_output.user_data == "a@@@b@@"
+    assert task_output.events == [{"a": 1}, {"b": 2}]
+
+
+@pytest.mark.parametrize("read_size", [100, 1000, 2 ** 20])
+def test_read_task_output_many_events(tmp_path, job, monkeypatch, read_size):
+    monkeypatch.setattr(job_module, "OUTPUT_READ_SIZE", read_size)
+    filename = tmp_path / "job.out"
+    filename.write_text("".join("%d" % i + _event({"i": i}) for i in range(20000)))
+
+    task_output = job.read_task_output(str(filename), 10 ** 6)
+
+    assert task_output.events == [{"i": i} for i in range(20000)]
+    assert task_output.user_data == "".join("%d" % i for i in range(20000))
+
+
+def test_read_task_output_truncated(tmp_path, job):
+    filename = tmp_path / "job.out"
+    with filename.open("w") as f:
+        f.write("x" * 50)
+        f.write(_event({"a": 1}))
+        f.write("y" * 10 ** 6)
+        f.write(_event({"b": 2}))
+        f.write("z" * 10)
+
+    task_output = job.read_task_output(str(filename), 100)
+
+    assert task_output.user_data == "x" * 50 + "y" * 50
+    assert task_output.events == [{"a": 1}, {"b": 2}]
+
+
+def test_read_task_output_unterminated_event(tmp_path, job):
+    filename = tmp_path / "job.out"
+    filename.write_text("before " + MONITORING_EVENT_START_MARKER + "{")
+
+    task_output = job.read_task_output(str(filename), 1000)
+
+    assert task_output.user_data == "before " + MONITORING_EVENT_START_MARKER + "{"
+    assert task_output.events == []
+
+
+def test_read_job_out_file(tmp_path, job):
+    (tmp_path / "process_ID0000001.out").write_text(
+        "hello\n" + _event({"a": 1}) + "x" * 10 ** 6
+    )
+
+    job.read_job_out_file()
+
+    assert job._stdout_text.startswith("#@ 1 stdout")
+    assert len(job._stdout_text) < 2 ** 16
+    assert job._additional_monitoring_events == [{"a": 1}]
+
+
+def test_read_job_error_file(tmp_path, job):
+    job._error_file = "process_ID0000001.err"
+    (tmp_path / "process_ID0000001.err").write_text(
+        "Executing on host 10.0.0.1 IP=10.0.0.1\n"
+    )
+
+    job.read_job_error_file()
+
+    assert job._host_id == "10.0.0.1"
+    assert job._stderr_text is not None
@@ -0,0 +1,96 @@
+import os
+
+import pytest
+
+from Pegasus.monitoring import parsepool
+
+KICKSTART_RECORD = """- invocation: True
+  version: 3.0
+  start: 2020-10-19T10:00:15.000-00:00
+  duration: 10.000
+  transformation: "process"
+  derivation: "ID0000001"
+  resource: "local"
+  hostaddr: 10.0.0.1
+  hostname: node1.example.com
+  pid: 10000
+  uid: 1000
+  user: bench
+  gid: 1000
+  group: bench
+  mainjob:
+    start: 2020-10-19T10:00:15.000-00:00
+    duration: 10.000
+    pid: 10000
+    status:
+      raw: 0
+      regular_exitcode: 0
+    executable:
+      file_name: /usr/bin/true
+    argument_vector:
+      - -i
+      - ID0000001.in
+  cwd: /scratch
+"""
+
+
+@pytest.fixture
+def job_output(tmp_path):
+    filename = tmp_path / "process_ID0000001.out"
+    filename.write_text(KICKSTART_RECORD)
+    return str(filename)
+
+
+@pytest.mark.parametrize("pool_type", parsepool.POOL_TYPES)
+def test_job_output_parser_pool(job_output, pool_type):
+    expected = parsepool.parse_job_output(job_output)
+
+    pool = parsepool.JobOutputParserPool(2, pool_type=pool_type)
+    pool.submit(job_output)
+    open_error, my_output = pool.result(job_output)
+    pool.close()
+
+    assert open_error is False
+    assert my_output[0]["hostname"] == "node1.example.com"
+    assert my_output == expected[2]
+
+
+def test_job_output_parser_pool_rotated_file(job_output):
+    pool = parsepool.JobOutputParserPool(1)
+    pool.submit(job_output)
+    pool._pending[job_output].result()
+
+    # the postscript rotates the output file after the job terminated
+    rotated = job_output + ".000"
+    os.rename(job_output, rotated)
+
+    assert pool.result(rotated, (job_output,)) is not None
+    assert pool.result(rotated, (job_output,)) is None
+    pool.close()
+
+
+def test_job_output_parser_pool_changed_file(job_output):
+    pool = parsepool.JobOutputParserPool(1)
+    pool.submit(job_output)
+    pool._pending[job_output].result()
+
+    with open(job_output, "a") as f:
+        f.write("  cwd: /tmp\n")
+
+    assert pool.result(job_output) is None
+    pool.close()
+
+
+def test_job_output_parser_pool_missing_file(tmp_path):
+    pool = parsepool.JobOutputParserPool(1)
+    missing = str(tmp_path / "missing.out")
+    assert pool.result(missing) is None
+
+    pool.submit(missing)
+    assert pool.result(missing) is None
+    pool.close()
+
+
+def test_job_output_parser_pool_invalid_type():
+    with pytest.raises(ValueError):
+        parsepool.JobOutputParserPool(1, pool_type="fiber")
@@ -0,0 +1,144 @@
+import os
+
+import pytest
+
+from Pegasus.tools import kickstart_parser
+
+directory = os.path.dirname(__file__)
+
+INVOCATION_RECORD = """- invocation: True
+  version: 3.0
+  start: 2020-10-19T10:00:0{i}.000-00:00
+  duration: 1.000
+  transformation: "process"
+  derivation: "ID000000{i}"
+  resource: "local"
+  hostname: node{i}.example.com
+  user: bench
+  mainjob:
+    start: 2020-10-19T10:00:0{i}.000-00:00
+    duration: 1.000
+    status:
+      raw: 0
+      regular_exitcode: 0
+    executable:
+      file_name: /usr/bin/true
+  cwd: /scratch
+  files:
+    stdout:
+      data: |
+        processed ID000000{i}
+    f.{i}:
+      output: true
+      size: 123
+      sha256: 4a77bee20a28a446506ef7531ffc038053f52e5211d93a95fe5193746af8d23a
+"""
+
+CLUSTER_TASK = (
+    '[cluster-task id={i}, start="2020-10-19T10:00:0{i}.000-00:00", '
+    'duration=1.000, status=0, line={i}, pid=100{i}, app="/usr/bin/true"]\n'
+)
+
+CLUSTER_SUMMARY = (
+    '[cluster-summary stat="ok", lines=2, tasks=2, succeeded=2, failed=0, '
+    'extra=0, start="2020-10-19T10:00:00.000-00:00", duration=2.000, pid=9999, '
+    'app="/usr/bin/pegasus-cluster"]\n'
+)
+
+MULTIPART = """---------------pegasus-multipart
+- integrity_summary:
+    succeeded: 2
+    failed: 0
+    duration: 0.182
+"""
+
+
+@pytest.fixture
+def clustered_output(tmp_path):
+    filename = tmp_path / "cluster.out"
+    with filename.open("w") as f:
+        f.write("junk before the records\n")
+        for i in range(1, 3):
+            f.write(INVOCATION_RECORD.format(i=i))
+            f.write(CLUSTER_TASK.format(i=i))
+        f.write(CLUSTER_SUMMARY)
+        f.write(MULTIPART)
+    return str(filename)
+
+
+def test_parse_stampede_clustered(clustered_output):
+    records = kickstart_parser.Parser(clustered_output).parse_stampede()
+
+    assert [
+        ("invocation" in r, "task" in r, "clustered" in r, "multipart" in r)
+        for r in records
+    ] == [
+        (True, False, False, False),
+        (False, True, False, False),
+        (True, False, False, False),
+        (False, True, False, False),
+        (False, False, True, False),
+        (False, False, False, True),
+    ]
+
+    invocation = records[2]
+    assert invocation["hostname"] == "node2.example.com"
+    assert invocation["derivation"] == "ID0000002"
+    assert invocation["start"] == "2020-10-19T10:00:02.000-00:00"
+    assert invocation["duration"] == 1.0
+    assert invocation["name"] == "/usr/bin/true"
+    assert invocation["exitcode"] == 0
+    assert invocation["stdout"] == "processed ID0000002\n"
+    assert invocation["outputs"]["f.2"].get_attribute_value("size") == "123"
+
+    assert records[3]["id"] == "2"
+    assert records[4]["tasks"] == "2"
+    assert records[5]["integrity_summary"]["succeeded"] == 2
+
+
+def test_parse_stdout_stderr_requested_keys(clustered_output):
+    records = kickstart_parser.Parser(clustered_output).parse_stdout_stderr()
+
+    assert len(records) == 3
+    assert set(records[0]) == {
+        "invocation",
+        "checksum",
+        "outputs",
+        "hostname",
+        "resource",
+        "transformation",
+        "derivation",
+        "name",
+        "exitcode",
+        "cwd",
+        "stdout",
+    }
+    assert records[0]["outputs"] == {}
+
+
+def test_parse_stampede_yaml():
+    records = kickstart_parser.Parser(
+        os.path.join(directory, "exitcode", "yaml-ok.out")
+    ).parse_stampede()
+
+    assert len(records) == 1
+    assert records[0]["hostname"] == "compute-6.isi.edu"
+    assert records[0]["transformation"] == "diamond::findrange:4.0"
+    assert records[0]["start"] == "2019-02-15T14:06:34.460-08:00"
+    assert records[0]["raw"] == 0
+
+
+def test_parse_xml():
+    my_parser = kickstart_parser.Parser(os.path.join(directory, "exitcode", "ok.out"))
+    records = my_parser.parse_stdout_stderr()
+
+    assert isinstance(my_parser._parser, kickstart_parser.XMLParser)
+    assert len(records) == 1
+    assert records[0]["exitcode"] == "0"
+
+
+def test_parse_missing_file(tmp_path):
+    my_parser = kickstart_parser.Parser(str(tmp_path / "missing.out"))
+
+    assert my_parser.parse_stampede() == []
+    assert my_parser._open_error is True
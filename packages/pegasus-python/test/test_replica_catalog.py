@@ -5,6 +5,7 @@ import pytest
 
 import Pegasus
 from Pegasus import yaml
+from Pegasus.api.errors import PegasusError
 from Pegasus.api.replica_catalog import _PFN, ReplicaCatalog
 from Pegasus.replica_catalog import _to_rc, dump, dumps, load, loads
 
@@ -58,11 +59,11 @@ def test_to_rc(rc, rc_as_dict):
     assert result.entries[("b*", True)].metadata == rc.entries[("b*", True)].metadata
 
 
-def test_load(mocker, rc_as_dict):
-    mocker.patch("Pegasus.yaml.load", return_value=rc_as_dict)
-    with TemporaryFile() as f:
+def test_load(rc_as_dict):
+    with TemporaryFile(mode="w+") as f:
+        yaml.dump(rc_as_dict, f)
+        f.seek(0)
         rc = load(f)
-        Pegasus.yaml.load.assert_called_once_with(f)
 
         assert len(rc.entries) == 2
         assert rc.entries[("a", False)].lfn == "a"
@@ -96,6 +97,50 @@ def test_loads(mocker, rc_as_dict):
     assert rc.entries[("b*", True)].metadata == {"key": "value"}
 
 
+def test_load_merges_entries():
+    rc = loads(
+        """
+        pegasus: "5.0"
+        replicas:
+          - lfn: a
+            pfns: [{site: local, pfn: /a}]
+            metadata: {key: value}
+          - lfn: a
+            pfns: [{site: condorpool, pfn: /a}]
+            checksum: {sha256: abc123}
+        """
+    )
+
+    assert len(rc.entries) == 1
+    assert rc.entries[("a", False)].pfns == {
+        _PFN("local", "/a"),
+        _PFN("condorpool", "/a"),
+    }
+    assert rc.entries[("a", False)].metadata == {"key": "value"}
+    assert rc.entries[("a", False)].checksum == {"sha256": "abc123"}
+
+
+@pytest.mark.parametrize(
+    "s",
+    [
+        'pegasus: "5.0"\n',
+        'pegasus: "5.0"\nreplicas:\n- lfn: a\n',
+        'pegasus: "5.0"\nreplicas:\n- pfns: [{site: local, pfn: /a}]\n',
+    ],
+)
+def test_loads_invalid(s):
+    with pytest.raises(PegasusError):
+        loads(s)
+
+
+def test_loads_invalid_checksum():
+    with pytest.raises(ValueError):
+        loads(
+            'pegasus: "5.0"\nreplicas:\n- lfn: a\n'
+            "  pfns: [{site: local, pfn: /a}]\n  checksum: {md5: abc123}\n"
+        )
+
+
 def test_dump(mocker):
     mocker.patch("Pegasus.api.writable.Writable.write")
     rc = ReplicaCatalog()
@@ -1,10 +1,12 @@
 import json
+from io import StringIO
 from tempfile import NamedTemporaryFile, TemporaryFile
 
 import pytest
 
 import Pegasus
 from Pegasus import yaml
+from Pegasus.api.errors import PegasusError
 from Pegasus.api.mixins import EventType
 from Pegasus.api.replica_catalog import File, ReplicaCatalog
 from Pegasus.api.site_catalog import SiteCatalog
@@ -187,6 +189,66 @@ def test_loads_yaml(wf1):
     assert sort_parts(result) == sort_parts(expected)
 
 
+def test_load_json_with_leading_whitespace(wf1):
+    new_wf = load(StringIO("\n  " + json.dumps(wf1, cls=_CustomEncoder)))
+
+    result = json.loads(json.dumps(new_wf, cls=_CustomEncoder))
+    expected = json.loads(json.dumps(wf1, cls=_CustomEncoder))
+
+    assert sort_parts(result) == sort_parts(expected)
+
+
+def test_loads_yaml_flow_style(wf1):
+    new_wf = loads(
+        yaml.dump(
+            json.loads(json.dumps(wf1, cls=_CustomEncoder)), default_flow_style=True
+        )
+    )
+
+    result = json.loads(json.dumps(new_wf, cls=_CustomEncoder))
+    expected = json.loads(json.dumps(wf1, cls=_CustomEncoder))
+
+    assert sort_parts(result) == sort_parts(expected)
+
+
+def test_loads_bytes(wf1):
+    new_wf = loads(json.dumps(wf1, cls=_CustomEncoder).encode())
+
+    assert set(new_wf.jobs) == set(wf1.jobs)
+
+
+@pytest.mark.parametrize("_format", [("yml"), ("json")])
+def test_load_shares_files(wf1, _format):
+    with TemporaryFile(mode="w+") as f:
+        wf1.write(f, _format=_format)
+        f.seek(0)
+
+        new_wf = load(f)
+
+    def get_file(job_id, lfn):
+        for use in new_wf.jobs[job_id].uses:
+            if use.file.lfn == lfn:
+                return use.file
+
+    # same file, as output then input
+    assert get_file("1", "out") is get_file("2", "out")
+    assert new_wf.jobs["1"].stdin is get_file("1", "stdin")
+
+
+@pytest.mark.parametrize(
+    "s",
+    [
+        "name: test\n",
+        "name: test\njobs:\n- type: job\n  id: '1'\n",
+        "name: test\njobs:\n- type: unknown\n  id: '1'\n",
+        '{"name": "test", "jobs": [{"type": "job", "id": "1"}]}',
+    ],
+)
+def test_loads_invalid(s):
+    with pytest.raises(PegasusError):
+        loads(s)
+
+
 def test_dump(mocker, wf1):
     mocker.patch("Pegasus.api.workflow.Workflow.write")
     with NamedTemporaryFile(mode="w") as f:
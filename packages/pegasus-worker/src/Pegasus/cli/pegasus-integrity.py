@@ -7,15 +7,14 @@ Usage: pegasus-integrity-check [options]
 """
 from __future__ import print_function
 
-import glob
-import json
 import logging
 import optparse
 import os
 import pprint
 import sys
+import threading
 import time
-from datetime import datetime
+from multiprocessing.pool import ThreadPool
 
 from Pegasus.tools import worker_utils as utils
 
@@ -36,14 +35,6 @@ from Pegasus.tools import worker_utils as utils
 ##
 
 
-# for some reason, sometimes grp is missing, but we can do without it
-try:
-    import grp
-    import pwd
-except Exception:
-    pass
-
-
 # see https://www.python.org/dev/peps/pep-0469/
 try:
     dict.iteritems
@@ -96,6 +87,9 @@ count_succeeded = 0
 count_failed = 0
 total_timing = 0.0
 
+# optional node-local cache of the checksums of unchanged files
+checksum_cache = None
+
 # --- functions ----------------------------------------------------------------
 
 
@@ -162,18 +156,54 @@ def json_object_decoder(obj):
     return obj
 
 
-def read_meta_data(f):
+def map_files(func, items, threads):
+    """
+    Applies func to the argument tuples in items with a pool of threads, and
+    yields the results in the order of items
+    """
+    if threads <= 1 or len(items) <= 1:
+        for item in items:
+            yield func(*item)
+        return
+
+    pool = ThreadPool(min(threads, len(items)))
+    try:
+        for result in pool.imap(lambda item: func(*item), items):
+            yield result
+    finally:
+        pool.terminate()
+
+
+def split_files(files):
     """
-    Reads transfers from the new JSON based input format
+    Splits a : separated list of files into (lfn, pfn) tuples - the lfn can
+    be encoded in the file name in the format lfn=pfn
+    """
+    items = []
+    for f in str.split(files, ":"):
+        lfn = None
+        pfn = f
+        if "=" in f:
+            (lfn, pfn) = str.split(f, "=", 1)
+        items.append((lfn, pfn))
+    return items
+
+
+def env_int(name, default):
+    """
+    reads a positive integer from the environment, logging invalid values
+    and falling back to the default
     """
-    data = []
     try:
-        fp = open(f, "r")
-        data = json.load(fp)
-        fp.close()
-    except Exception as err:
-        logger.critical("Error parsing the meta data: " + str(err))
-    return data
+        value = int(os.environ[name])
+    except KeyError:
+        return default
+    except ValueError:
+        value = 0
+    if value <= 0:
+        logger.error("Invalid value for %s: %s" % (name, os.environ[name]))
+        return default
+    return value
 
 
 def myexit(rc):
@@ -191,51 +221,18 @@ def generate_sha256(fname):
     Generates a sha256 hash for the given file
     """
 
-    tools = utils.Tools()
-    tools.find("openssl", "version", "([0-9]+\.[0-9]+\.[0-9]+)")
-    tools.find("sha256sum", "--version", "([0-9]+\.[0-9]+)")
-
-    if tools.full_path("openssl"):
-        cmd = tools.full_path("openssl")
-        if tools.version_comparable("openssl") < "001001000":
-            cmd += " sha -sha256"
-        else:
-            cmd += " sha256"
-        cmd += " " + fname
-    elif tools.full_path("sha256sum"):
-        cmd = tools.full_path("sha256sum")
-        cmd += " " + fname + " | sed 's/ .*//'"
-    else:
-        logger.error("openssl or sha256sum not found!")
-        return None
-
     if not os.path.exists(fname):
         logger.error("File " + fname + " does not exist")
         return None
 
-    # generate the checksum
-    tc = utils.TimedCommand(cmd, log_cmd=False, log_outerr=False)
-    tc.run()
-    if tc.get_exit_code() != 0:
-        logger.error("Unable to determine sha256: " + tc.get_outerr())
+    try:
+        if checksum_cache is not None:
+            return checksum_cache.sha256_file(fname)
+        return utils.sha256_file(fname)
+    except (IOError, OSError) as err:
+        logger.error("Unable to determine sha256: " + str(err))
         return None
 
-    sha256 = tc.get_outerr()
-    sha256 = sha256.strip()
-    sha256 = sha256[-64:]
-    if len(sha256) != 64:
-        logger.warn("Unable to determine sha256 of " + fname)
-
-    return sha256
-
-
-def iso8601(ts):
-    """
-    Formats a UNIX timestamp in ISO 8601 format
-    """
-    dt = datetime.utcfromtimestamp(ts)
-    return dt.isoformat()
-
 
 def generate_yaml(lfn, pfn):
     """
@@ -265,90 +262,44 @@ def generate_fullstat_yaml(lfn, pfn):
         return None
     ts_end = time.time()
 
-    yaml = ""
-    yaml += '    "%s":\n' % (lfn)
-    yaml += "      comment: entry generated by pegasus-integrity\n"
-    yaml += '      file_name: "%s"\n' % (pfn)
+    return utils.fullstat_yaml(lfn, pfn, sha256, ts_end - ts_start)
 
-    try:
-        s = os.stat(pfn)
-    except Exception:
-        # if we can't stat, just return
-        return ""
 
-    uname = ""
-    try:
-        uname = pwd.getpwuid(s.st_uid).pw_name
-    except Exception:
-        pass
-    gname = ""
-    try:
-        gname = grp.getgrgid(s.st_gid).gr_name
-    except Exception:
-        pass
-    yaml += (
-        "      mode: 0o%o\n"
-        "      size: %d\n"
-        "      inode: %d\n"
-        "      nlink: %d\n"
-        "      mtime: %s\n"
-        "      atime: %s\n"
-        "      ctime: %s\n"
-        "      uid: %d\n"
-        "      user: %s\n"
-        "      gid: %d\n"
-        "      group: %s\n"
-        "      output: True\n"
-        % (
-            s.st_mode,
-            s.st_size,
-            s.st_ino,
-            s.st_nlink,
-            iso8601(s.st_mtime),
-            iso8601(s.st_atime),
-            iso8601(s.st_ctime),
-            s.st_uid,
-            uname,
-            s.st_gid,
-            gname,
-        )
-    )
-    yaml += "      sha256: %s\n" "      checksum_timing: %.3f\n" % (
-        sha256,
-        ts_end - ts_start,
-    )
-    return yaml
-
-
-def check_integrity(fname, lfn, meta_data, print_timings):
+def compute_integrity(fname, lfn, meta_data):
     """
-    Checks the integrity of a file given a set of metadata
+    Computes the checksum of a file, and looks up the expected one in the
+    metadata - this can run concurrently for several files
     """
 
-    global count_succeeded
-    global count_failed
-    global total_timing
-
     ts_start = time.time()
 
     if lfn is None or lfn == "":
         lfn = fname
 
     # find the expected checksum in the metadata
-    expected_sha256 = None
-    for entry in meta_data:
-        if entry["_id"] == lfn:
-            if "_attributes" in entry and "checksum.value" in entry["_attributes"]:
-                expected_sha256 = entry["_attributes"]["checksum.value"]
+    expected_sha256 = meta_data.get(lfn)
     if expected_sha256 is None:
-        logger.error("No checksum in the meta data for " + lfn)
-        return False
+        return fname, lfn, None, None, 0.0
 
     current_sha256 = generate_sha256(fname)
 
-    ts_end = time.time()
+    return fname, lfn, expected_sha256, current_sha256, time.time() - ts_start
 
-    total_timing += ts_end - ts_start
+
+def record_integrity(fname, lfn, expected_sha256, current_sha256, timing, print_timings):
+    """
+    Compares the checksums from compute_integrity(), and keeps the counts
+    """
+
+    global count_succeeded
+    global count_failed
+    global total_timing
+
+    if expected_sha256 is None:
+        logger.error("No checksum in the meta data for " + lfn)
+        return False
+
+    total_timing += timing
 
     if print_timings:
         check_info_yaml(
@@ -363,7 +314,7 @@ def check_integrity(fname, lfn, meta_data, print_timings):
     if current_sha256 != expected_sha256:
         logger.error(
             "%s: Expected checksum (%s) does not match the calculated checksum (%s) (timing: %.3f)"
-            % (fname, expected_sha256, current_sha256, ts_end - ts_start)
+            % (fname, expected_sha256, current_sha256, timing)
         )
         count_failed += 1
         return False
@@ -372,6 +323,15 @@ def check_integrity(fname, lfn, meta_data, print_timings):
     return True
 
 
+def check_integrity(fname, lfn, meta_data, print_timings):
+    """
+    Checks the integrity of a file given a set of metadata
+    """
+    return record_integrity(
+        *compute_integrity(fname, lfn, meta_data), print_timings=print_timings
+    )
+
+
 def multipart_out(s):
     """
     returns a multipart fh if required
@@ -433,6 +393,7 @@ def dump_summary_yaml():
 
 
 def main():
+    global checksum_cache
     global threads
     global stats_start
     global stats_end
@@ -494,6 +455,42 @@ def main():
         dest="print_timings",
         help="Display timing data after verifying files",
     )
+    parser.add_option(
+        "-n",
+        "--threads",
+        action="store",
+        type="int",
+        dest="threads",
+        default=0,
+        help="Number of threads computing checksums."
+        + " Default is 4. This option can also be set"
+        + " via the PEGASUS_INTEGRITY_THREADS environment"
+        + " variable. The command line option takes"
+        + " precedence over the environment variable.",
+    )
+    parser.add_option(
+        "",
+        "--cache",
+        action="store",
+        dest="cache",
+        metavar="FILE",
+        help="Cache the checksums of unchanged files in FILE,"
+        + " a node-local database shared by all the jobs on"
+        + " the node. This option can also be set via the"
+        + " PEGASUS_INTEGRITY_CACHE environment variable.",
+    )
+    parser.add_option(
+        "",
+        "--cache-size",
+        action="store",
+        type="int",
+        dest="cache_size",
+        default=0,
+        help="Maximum number of checksums in the cache."
+        + " Default is 100000. This option can also be set"
+        + " via the PEGASUS_INTEGRITY_CACHE_SIZE environment"
+        + " variable.",
+    )
     parser.add_option(
         "",
         "--debug",
@@ -506,6 +503,22 @@ def main():
     (options, args) = parser.parse_args()
     setup_logger(options.debug)
 
+    if options.threads is None or options.threads == 0:
+        options.threads = env_int("PEGASUS_INTEGRITY_THREADS", 4)
+
+    if options.cache is None and "PEGASUS_INTEGRITY_CACHE" in os.environ:
+        options.cache = os.environ["PEGASUS_INTEGRITY_CACHE"]
+    if options.cache_size is None or options.cache_size == 0:
+        options.cache_size = env_int("PEGASUS_INTEGRITY_CACHE_SIZE", 100000)
+    if options.cache:
+        try:
+            checksum_cache = utils.ChecksumCache(options.cache, options.cache_size)
+        except Exception as err:
+            # checksums can always be computed without the cache
+            logger.warning(
+                "Unable to use the checksum cache %s: %s" % (options.cache, err)
+            )
+
     # sanity checks
     if (
         sum(
@@ -527,32 +540,28 @@ def main():
         sys.exit(1)
 
     if options.generate_files:
-        for f in str.split(options.generate_files, ":"):
-            results = generate_sha256(f)
+        files = str.split(options.generate_files, ":")
+        for f, results in zip(
+            files, map_files(generate_sha256, [(f,) for f in files], options.threads)
+        ):
             if not results:
                 myexit(1)
             print(results + "  " + f)
 
     elif options.generate_yaml:
-        for f in str.split(options.generate_yaml, ":"):
-            # lfn can be encoded in the file name in the format lfn=pfn
-            lfn = None
-            pfn = f
-            if "=" in f:
-                (lfn, pfn) = str.split(f, "=", 1)
-            results = generate_yaml(lfn, pfn)
+        for results in map_files(
+            generate_yaml, split_files(options.generate_yaml), options.threads
+        ):
             if not results:
                 myexit(1)
             print(results)
 
     elif options.generate_fullstat_yaml:
-        for f in str.split(options.generate_fullstat_yaml, ":"):
-            # lfn can be encoded in the file name in the format lfn=pfn
-            lfn = None
-            pfn = f
-            if "=" in f:
-                (lfn, pfn) = str.split(f, "=", 1)
-            results = generate_fullstat_yaml(lfn, pfn)
+        for results in map_files(
+            generate_fullstat_yaml,
+            split_files(options.generate_fullstat_yaml),
+            options.threads,
+        ):
             if not results:
                 myexit(1)
             # if lfn is not None and 'KICKSTART_INTEGRITY_DATA' in os.environ:
@@ -569,12 +578,7 @@ def main():
             multipart_out("- integrity_verification_attempts:\n")
 
         # read all the .meta files in the current working dir
-        meta_data = []
-        for meta_file in glob.glob("*.meta"):
-            logger.debug("Loading metadata from %s" % (meta_file))
-            all_md = read_meta_data(meta_file)
-            for entry in all_md:
-                meta_data.append(entry)
+        meta_data = utils.load_meta_data("*.meta")
 
         if options.debug:
             pprint.PrettyPrinter(indent=4).pprint(meta_data)
@@ -588,14 +592,9 @@ def main():
 
         # now check the files
         exit_code = 0
-        for f in str.split(files, ":"):
-            # lfn can be encoded in the file name in the format lfn=pfn
-            lfn = None
-            pfn = f
-            if "=" in f:
-                (lfn, pfn) = str.split(f, "=", 1)
-            results = check_integrity(pfn, lfn, meta_data, options.print_timings)
-            if not results:
+        items = [(pfn, lfn, meta_data) for lfn, pfn in split_files(files)]
+        for result in map_files(compute_integrity, items, options.threads):
+            if not record_integrity(*result, print_timings=options.print_timings):
                 exit_code = 1
 
         if options.print_timings:
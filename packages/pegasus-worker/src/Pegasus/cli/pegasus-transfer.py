@@ -344,6 +344,10 @@ class Transfer(TransferBase):
             False  # should we generate checksums as we transfer?
         )
 
+        # sha256 of the data, and the time it took, if computed while copying
+        self.sha256 = None
+        self.checksum_timing = 0.0
+
     def __str__(self):
         return "%s -> %s" % (self._src_urls[0].get_url(), self._dst_urls[0].get_url())
 
@@ -598,6 +602,8 @@ class TransferHandlerBase(object):
             if random.randint(1, 100) <= rate:
                 # modify the file by adding a few bytes to it
                 logger.info("Introducing an error into %s" % (transfer.get_dst_path()))
+                # the checksum computed while copying no longer matches
+                transfer.sha256 = None
                 try:
                     f = open(transfer.get_dst_path(), "a")
                     f.write("Here be dragons! Eh, I mean pegai!")
@@ -646,6 +652,37 @@ class TransferHandlerBase(object):
             # stats.add_integrity_generate(linkage, tc.get_duration())
             self.lock.release()
 
+    def _record_integrity_checksum(self, lfn, fname, linkage, sha256, timing):
+        """
+        Records a checksum computed in process while transferring, the same
+        way as _generate_integrity_checksum() does
+        """
+        global integrity_checksummed
+
+        with self.lock:
+            if lfn in integrity_checksummed:
+                return
+
+            yaml = utils.fullstat_yaml(lfn, fname, sha256, timing)
+            if "KICKSTART_INTEGRITY_DATA" in os.environ:
+                # the timing is in the kickstart record
+                try:
+                    f = open(os.environ["KICKSTART_INTEGRITY_DATA"], "a")
+                    f.write(yaml)
+                    f.close()
+                except (IOError, OSError) as err:
+                    logger.error(
+                        "Unable to write integrity data for %s: %s" % (lfn, err)
+                    )
+                    return
+            else:
+                # without kickstart to pick up the record, report the timing
+                # with the transfer stats
+                stats.add_integrity_generate(linkage, timing)
+
+            # track what lfns we have checksummed so far
+            integrity_checksummed.append(lfn)
+
     def _check_similar(self, a, b):
         """
         compares two transfers, and determines if they are similar enough to be
@@ -745,7 +782,7 @@ class TransferHandlerBase(object):
 
 class FileHandler(TransferHandlerBase):
     """
-    Uses system commands to act on file:// URLs
+    Acts on file:// URLs in process, without forking a command per file
     """
 
     _name = "FileHandler"
@@ -756,10 +793,9 @@ class FileHandler(TransferHandlerBase):
         successful_l = []
         failed_l = []
         for t in transfers:
-            cmd = "/bin/mkdir -p '%s' " % (t.get_path())
+            logger.info("mkdir -p '%s'" % (t.get_path()))
             try:
-                tc = utils.TimedCommand(cmd)
-                tc.run()
+                prepare_local_dir(t.get_path(), 0o0777)
             except RuntimeError as err:
                 logger.error(err)
                 failed_l.append(t)
@@ -770,9 +806,14 @@ class FileHandler(TransferHandlerBase):
     def do_transfers(self, transfers):
         successful_l = []
         failed_l = []
+
+        # create the destination directories once for the whole set
+        for dst_dir in set([os.path.dirname(t.get_dst_path()) for t in transfers]):
+            prepare_local_dir(dst_dir)
+
         for t in transfers:
             t_start = time.time()
-            prepare_local_dir(os.path.dirname(t.get_dst_path()))
+            t.sha256 = None
 
             # src has to exist and be readable
             if not verify_local_file(t.get_src_path()):
@@ -780,21 +821,28 @@ class FileHandler(TransferHandlerBase):
                 self._post_transfer_attempt(t, False, t_start)
                 continue
 
-            self._pre_transfer_attempt(t)
-
+            same_file = False
             if os.path.exists(t.get_src_path()) and os.path.exists(t.get_dst_path()):
                 # make sure src and target are not the same file - have to
                 # compare at the inode level as paths can differ
                 src_inode = os.stat(t.get_src_path())[stat.ST_INO]
                 dst_inode = os.stat(t.get_dst_path())[stat.ST_INO]
-                if src_inode == dst_inode:
-                    logger.warning(
-                        "cp: src (%s) and dst (%s) already exists and are the same file"
-                        % (t.get_src_path(), t.get_dst_path())
-                    )
-                    successful_l.append(t)
-                    self._post_transfer_attempt(t, True, t_start)
-                    continue
+                same_file = src_inode == dst_inode
+
+            # checksums are computed while copying, instead of reading the
+            # file again before and after the copy
+            checksum = not same_file and self._checksum_while_copying(t)
+            if not checksum:
+                self._pre_transfer_attempt(t)
+
+            if same_file:
+                logger.warning(
+                    "cp: src (%s) and dst (%s) already exists and are the same file"
+                    % (t.get_src_path(), t.get_dst_path())
+                )
+                successful_l.append(t)
+                self._post_transfer_attempt(t, True, t_start)
+                continue
 
             # first check that the src file exists, and that it can be opened
             if t.verify_symlink_source and not self._verify_read_access(
@@ -809,41 +857,74 @@ class FileHandler(TransferHandlerBase):
                 continue
 
             # some of the time, PegasusLite can tell us to take shortcut and symlink the files
-            if symlink_file_transfer:
-                cmd = "ln -f -s '%s' '%s'" % (t.get_src_path(), t.get_dst_path())
-            else:
-                cmd = "/bin/cp -f -R -L '%s' '%s'" % (
-                    t.get_src_path(),
-                    t.get_dst_path(),
-                )
             try:
-                tc = utils.TimedCommand(cmd)
-                tc.run()
-            except RuntimeError as err:
-                logger.error(err)
+                if symlink_file_transfer:
+                    logger.info(
+                        "ln -f -s '%s' '%s'" % (t.get_src_path(), t.get_dst_path())
+                    )
+                    utils.symlink_file(t.get_src_path(), t.get_dst_path())
+                elif checksum:
+                    logger.info(
+                        "cp -f -L '%s' '%s' (sha256)"
+                        % (t.get_src_path(), t.get_dst_path())
+                    )
+                    t.sha256, t.checksum_timing = utils.copy_file(
+                        t.get_src_path(), t.get_dst_path(), sha256=True
+                    )
+                else:
+                    logger.info(
+                        "cp -f -R -L '%s' '%s'" % (t.get_src_path(), t.get_dst_path())
+                    )
+                    utils.copy_tree(t.get_src_path(), t.get_dst_path())
+            except (IOError, OSError) as err:
+                logger.error(
+                    "Unable to transfer %s to %s: %s"
+                    % (t.get_src_path(), t.get_dst_path(), err)
+                )
+                # the directory might have been removed under us
+                forget_local_dirs(os.path.dirname(t.get_dst_path()))
                 failed_l.append(t)
                 self._post_transfer_attempt(t, False, t_start)
                 continue
+            if t.sha256 is not None and t.generate_checksum:
+                self._record_integrity_checksum(
+                    t.lfn, t.get_src_path(), t.linkage, t.sha256, t.checksum_timing
+                )
             successful_l.append(t)
             self._post_transfer_attempt(t, True, t_start)
 
         return [successful_l, failed_l]
 
+    def _checksum_while_copying(self, t):
+        """
+        Should the checksum of this transfer be computed while copying it?
+        """
+        if symlink_file_transfer or not os.path.isfile(t.get_src_path()):
+            return False
+        if t.verify_checksum_remote:
+            return True
+        return (
+            t.generate_checksum
+            and t.lfn is not None
+            and t.lfn != ""
+            and t.lfn not in integrity_checksummed
+        )
+
     def do_removes(self, transfers):
         successful_l = []
         failed_l = []
         for t in transfers:
-            cmd = "/bin/rm -f"
-            if t.get_recursive():
-                cmd += " -r "
-            cmd += " '%s' " % (t.get_path())
+            logger.info(
+                "rm -f %s'%s'" % ("-r " if t.get_recursive() else "", t.get_path())
+            )
             try:
-                tc = utils.TimedCommand(cmd)
-                tc.run()
-            except RuntimeError as err:
-                logger.error(err)
+                utils.remove(t.get_path(), t.get_recursive())
+            except (IOError, OSError) as err:
+                logger.error("Unable to remove %s: %s" % (t.get_path(), err))
                 failed_l.append(t)
                 continue
+            finally:
+                forget_local_dirs(t.get_path())
             successful_l.append(t)
         return [successful_l, failed_l]
 
@@ -1992,7 +2073,9 @@ class IRodsHandler(TransferHandlerBase):
 
 class S3Handler(TransferHandlerBase):
     """
-    Handler for S3 and S3 compatible services
+    Handler for S3 and S3 compatible services - the transfers are done in
+    process with the boto3 transfer manager of Pegasus.s3, using clients
+    shared by all the threads
     """
 
     _name = "S3Handler"
@@ -2008,10 +2091,12 @@ class S3Handler(TransferHandlerBase):
         "s3s->s3s",
     ]
 
+    # parsed S3 configuration files, by path
+    _configs = {}
+
     def do_mkdirs(self, mkdir_l):
-        tools = utils.Tools()
-        if tools.find("pegasus-s3", "help", None, [prog_dir]) is None:
-            logger.error("Unable to do S3 transfers because pegasus-s3 not found")
+        s3 = self._s3_module()
+        if s3 is None:
             return [[], mkdir_l]
 
         successful_l = []
@@ -2027,17 +2112,12 @@ class S3Handler(TransferHandlerBase):
             else:
                 raise RuntimeError("Unable to parse bucket: %s" % (bucket))
 
-            env = self._s3_cred_env(t.get_site_label())
-
-            cmd = tools.full_path("pegasus-s3")
-            if logger.isEnabledFor(logging.DEBUG):
-                cmd += " -v"
-            cmd += " mkdir " + bucket
-
+            logger.info("Creating bucket " + bucket)
             try:
-                tc = utils.TimedCommand(cmd, env_overrides=env)
-                tc.run()
-            except RuntimeError as err:
+                uri = s3.parse_uri(bucket)
+                config = self._s3_config(s3, t.get_site_label())
+                s3.create_bucket(self._s3_client(s3, config, uri), uri.bucket)
+            except Exception as err:
                 logger.error(err)
                 failed_l.append(t)
                 continue
@@ -2046,139 +2126,237 @@ class S3Handler(TransferHandlerBase):
         return [successful_l, failed_l]
 
     def do_transfers(self, transfers):
-
-        tools = utils.Tools()
-        if tools.find("pegasus-s3", "help", None, [prog_dir]) is None:
-            logger.error(
-                "Unable to do S3 transfers because pegasus-s3 could not be found"
-            )
+        s3 = self._s3_module()
+        if s3 is None:
             return [[], transfers]
 
         successful_l = []
         failed_l = []
-        for t in transfers:
 
-            self._pre_transfer_attempt(t)
+        # one transfer manager per client, which runs all the transfers of
+        # the set concurrently
+        managers = {}
+        pending = []
+        try:
+            for t in transfers:
 
-            t_start = time.time()
-            env = {}
+                self._pre_transfer_attempt(t)
 
-            # use cp for s3->s3 transfers, and get/put when one end is a file://
-            if (t.get_src_proto() == "s3" or t.get_src_proto() == "s3s") and (
-                t.get_dst_proto() == "s3" or t.get_dst_proto() == "s3s"
-            ):
-                # s3 -> s3
-                env = self._s3_cred_env(t.get_src_site_label())
-                cmd = tools.full_path("pegasus-s3") + " cp -f -c '%s' '%s'" % (
-                    t.src_url(),
-                    t.dst_url(),
-                )
-            elif t.get_dst_proto() == "file":
-                # this is a 'get'
-                env = self._s3_cred_env(t.get_src_site_label())
-                prepare_local_dir(os.path.dirname(t.get_dst_path()))
-                cmd = tools.full_path("pegasus-s3") + " get '%s' '%s'" % (
-                    t.src_url(),
-                    t.get_dst_path(),
+                t_start = time.time()
+                try:
+                    future = self._submit_transfer(s3, managers, t)
+                except Exception as err:
+                    logger.error(err)
+                    self._post_transfer_attempt(t, False, t_start)
+                    failed_l.append(t)
+                    continue
+                if future is None:
+                    failed_l.append(t)
+                    self._post_transfer_attempt(t, False, t_start)
+                    continue
+                pending.append((t, t_start, future))
+
+            for t, t_start, future in pending:
+                try:
+                    future.result()
+                except Exception as err:
+                    logger.error(
+                        "Transfer of %s to %s failed: %s"
+                        % (t.src_url(), t.dst_url(), err)
+                    )
+                    self._post_transfer_attempt(
+                        t, False, t_start, getattr(future, "t_end", None)
+                    )
+                    failed_l.append(t)
+                    continue
+                self._post_transfer_attempt(
+                    t, True, t_start, getattr(future, "t_end", None)
                 )
-            else:
-                # this is a 'put'
-                if t.get_src_proto() == "file":
-                    # src has to exist and be readable
-                    if not verify_local_file(t.get_src_path()):
-                        failed_l.append(t)
-                        self._post_transfer_attempt(t, False, t_start)
-                        continue
-                env = self._s3_cred_env(t.get_dst_site_label())
-                cmd = tools.full_path("pegasus-s3") + " put -f -b '%s' '%s'" % (
-                    t.get_src_path(),
-                    t.dst_url(),
+                successful_l.append(t)
+        finally:
+            for manager in itervalues(managers):
+                manager.shutdown()
+
+        return [successful_l, failed_l]
+
+    def _submit_transfer(self, s3, managers, t):
+        """
+        Hands a transfer to the transfer manager of its client, and returns
+        the future of the transfer, or None if it can not be done
+        """
+        # use copy for s3->s3 transfers, and download/upload when one end is a file://
+        if t.get_src_proto() in ["s3", "s3s"] and t.get_dst_proto() in ["s3", "s3s"]:
+            # s3 -> s3
+            src = s3.parse_uri(t.src_url())
+            dst = s3.parse_uri(t.dst_url())
+            if src.ident != dst.ident:
+                raise RuntimeError(
+                    "Identities for source and destination do not match: %s -> %s"
+                    % (src, dst)
                 )
+            logger.info("Copying %s to %s" % (src, dst))
+            config = self._s3_config(s3, t.get_src_site_label())
+            client = self._s3_client(s3, config, src)
+            self._create_bucket(s3, client, dst)
+            manager = self._transfer_manager(s3, managers, client, config, dst)
+            return manager.copy(
+                {"Bucket": src.bucket, "Key": src.key},
+                dst.bucket,
+                dst.key if dst.key is not None else src.key,
+                subscribers=[_S3TransferDone()],
+            )
+        elif t.get_dst_proto() == "file":
+            # this is a 'get'
+            src = s3.parse_uri(t.src_url())
+            logger.info("Downloading %s to %s" % (src, t.get_dst_path()))
+            config = self._s3_config(s3, t.get_src_site_label())
+            client = self._s3_client(s3, config, src)
+            prepare_local_dir(os.path.dirname(t.get_dst_path()))
+            manager = self._transfer_manager(s3, managers, client, config, src)
+            return manager.download(
+                src.bucket,
+                src.key,
+                t.get_dst_path(),
+                subscribers=[_S3TransferDone()],
+            )
+        else:
+            # this is a 'put'
+            if t.get_src_proto() == "file":
+                # src has to exist and be readable
+                if not verify_local_file(t.get_src_path()):
+                    return None
+            dst = s3.parse_uri(t.dst_url())
+            if dst.key is None:
+                dst.key = os.path.basename(t.get_src_path())
+            logger.info("Uploading %s to %s" % (t.get_src_path(), dst))
+            config = self._s3_config(s3, t.get_dst_site_label())
+            client = self._s3_client(s3, config, dst)
+            self._create_bucket(s3, client, dst)
+            manager = self._transfer_manager(s3, managers, client, config, dst)
+            return manager.upload(
+                t.get_src_path(),
+                dst.bucket,
+                dst.key,
+                subscribers=[_S3TransferDone()],
+            )
+
+    def do_removes(self, removes_list):
+        s3 = self._s3_module()
+        if s3 is None:
+            return [[], removes_list]
 
+        successful_l = []
+        failed_l = []
+
+        # group the keys by client and bucket, so that they can be deleted
+        # in batches
+        buckets = {}
+        for t in removes_list:
             try:
-                tc = utils.TimedCommand(cmd, env_overrides=env)
-                tc.run()
+                uri = s3.parse_uri(t.get_url())
+                if uri.bucket is None or uri.key is None:
+                    raise RuntimeError("URL for rm must contain a bucket and a key")
+                config = self._s3_config(s3, t.get_site_label())
+                client = self._s3_client(s3, config, uri)
+
+                # PM-790: recursive deletes are really a prefix match. For
+                # example, if told to remove the foo/bar directory, we need to
+                # remove all the keys under foo/bar/
+                if t.get_recursive():
+                    prefix = uri.key.rstrip("/") + "/"
+                    logger.info("Removing keys under %s" % (t.get_url()))
+                    keys = s3.list_keys(client, uri.bucket, prefix)
+                else:
+                    logger.info("Removing %s" % (t.get_url()))
+                    keys = [uri.key]
             except Exception as err:
                 logger.error(err)
-                self._post_transfer_attempt(t, False, t_start)
                 failed_l.append(t)
                 continue
 
-            self._post_transfer_attempt(t, True, t_start)
-            successful_l.append(t)
+            bucket_key = (id(client), uri.bucket)
+            if bucket_key not in buckets:
+                buckets[bucket_key] = (client, config, uri, [], [])
+            buckets[bucket_key][3].extend(keys)
+            buckets[bucket_key][4].append(t)
 
-        return [successful_l, failed_l]
+        # as we don't know which removes in a batch succeeded/failed, we have
+        # to mark them all the same (for example, one failure means all removes
+        # of the bucket gets marked as failed)
+        for client, config, uri, keys, removes in itervalues(buckets):
+            try:
+                s3.delete_keys(
+                    client,
+                    uri.bucket,
+                    keys,
+                    config.getboolean(uri.site, "batch_delete"),
+                    config.getint(uri.site, "batch_delete_size"),
+                )
+            except Exception as err:
+                logger.error(err)
+                failed_l.extend(removes)
+                continue
+            successful_l.extend(removes)
 
-    def do_removes(self, removes_list):
-        tools = utils.Tools()
-        if tools.find("pegasus-s3", "help", None, [prog_dir]) is None:
-            logger.error(
-                "Unable to do S3 transfers because pegasus-s3 could not be found"
-            )
-            return [[], removes_list]
+        return [successful_l, failed_l]
 
+    def _s3_module(self):
+        """
+        Pegasus.s3 is only imported when S3 transfers are needed, as boto3
+        is an optional dependency
+        """
         try:
-            tmp_fd, tmp_name = tempfile.mkstemp(
-                prefix="pegasus-transfer-", suffix=".lst"
-            )
-            tmp_file = io.open(tmp_fd, "w+")
-        except Exception:
-            raise RuntimeError("Unable to create tmp file for pegasus-s3 cleanup")
-
-        successful_l = []
-        failed_l = []
-        for t in removes_list:
-
-            fixed_url = t.get_url()
-
-            # PM-790: recursive deletes are really a pattern matching. For example,
-            # if told to remove the foo/bar directory, we need to translate it into
-            # foo/bar/*
-            if t.get_recursive():
-                # first make sure there are no trailing slashes
-                last_char = len(fixed_url) - 1
-                while (
-                    len(fixed_url) > 0 and last_char > 0 and fixed_url[last_char] == "/"
-                ):
-                    fixed_url = fixed_url[0:last_char]
-                    last_char -= 1
-                fixed_url += "/*"
-                logger.info("Transformed remote URL to " + fixed_url)
-
-            tmp_file.write("%s\n" % (fixed_url))
+            import boto3  # noqa: F401
+        except ImportError as err:
+            logger.error("Unable to do S3 transfers because boto3 is missing: %s" % err)
+            return None
 
-        tmp_file.close()
+        from Pegasus import s3
 
-        env = self._s3_cred_env(removes_list[0].get_site_label())
+        return s3
 
-        cmd = tools.full_path("pegasus-s3")
-        if logger.isEnabledFor(logging.DEBUG):
-            cmd += " -v"
-        cmd += " rm -f -F " + tmp_name
+    def _s3_config(self, s3, site_label):
+        """
+        Returns the S3 configuration for the site, which is only parsed once
+        """
+        path = self._s3_cred_env(site_label)["S3CFG"]
+        with self.lock:
+            if path not in self._configs:
+                self._configs[path] = s3.read_config(path)
+            return self._configs[path]
 
-        success = False
-        try:
-            tc = utils.TimedCommand(cmd, env_overrides=env)
-            tc.run()
-            success = True
-        except RuntimeError as err:
-            logger.error(err)
+    def _s3_client(self, s3, config, uri):
+        """
+        Returns the client for uri shared by all the threads, with enough
+        connections for the concurrent transfers of all the threads
+        """
+        concurrency = s3.get_transfer_config(config, uri).max_concurrency
+        return s3.get_pooled_s3_client(
+            config, uri, max(10, concurrency * max(1, len(threads)))
+        )
 
-        # as we don't know which removes in the set succeeded/failed, we have
-        # to mark them all the same (for example, one failure means all removes
-        # gets marked as failed)
-        for t in removes_list:
-            if success:
-                successful_l.append(t)
-            else:
-                failed_l.append(t)
+    def _create_bucket(self, s3, client, uri):
+        """
+        Creates the bucket of uri once per run, the same way as the -b/-c
+        options of pegasus-s3 put/cp
+        """
+        url = "%s/%s" % (uri.ident, uri.bucket)
+        if url in remote_dirs_created:
+            return
+        s3.create_bucket(client, uri.bucket)
+        remote_dirs_created[url] = True
 
-        try:
-            os.unlink(tmp_name)
-        except Exception:
-            pass
+    def _transfer_manager(self, s3, managers, client, config, uri):
+        """
+        Returns the transfer manager of the client for this set of transfers
+        """
+        if id(client) not in managers:
+            from boto3.s3.transfer import create_transfer_manager
 
-        return [successful_l, failed_l]
+            managers[id(client)] = create_transfer_manager(
+                client, s3.get_transfer_config(config, uri)
+            )
+        return managers[id(client)]
 
     def _s3_cred_env(self, site_label):
         env = {}
@@ -2198,6 +2376,22 @@ class S3Handler(TransferHandlerBase):
         return env
 
 
+try:
+    from s3transfer.subscribers import BaseSubscriber
+except ImportError:
+    BaseSubscriber = object
+
+
+class _S3TransferDone(BaseSubscriber):
+    """
+    Records when a transfer of the S3 transfer manager is done, as the
+    futures are only looked at once the whole set has been submitted
+    """
+
+    def on_done(self, future, **kwargs):
+        future.t_end = time.time()
+
+
 class GlobusOnlineHandler(TransferHandlerBase):
     """
     Handler for Globus Online transfers
@@ -3981,7 +4175,10 @@ class Stats:
         self._site_pair_bytes = {}
 
         # holder for transfers - this will be printed at the end
-        self._yaml = ""
+        self._yaml = []
+
+        # the work threads add stats concurrently
+        self.lock = threading.Lock()
 
         # integrity timings
         self._integrity_verify_count_succeeded = {}
@@ -3993,11 +4190,6 @@ class Stats:
     def add_stats(self, transfer, was_successful, t_start, t_end):
 
         key = transfer.get_src_site_label() + "->" + transfer.get_dst_site_label()
-        if key not in self._site_pair_count:
-            self._site_pair_count[key] = 0
-            self._site_pair_bytes[key] = 0
-        self._site_pair_count[key] += 1
-        self._total_count += 1
 
         # do we have a local component?
         local_filename = None
@@ -4007,14 +4199,10 @@ class Stats:
         elif transfer.get_dst_proto() == "file":
             local_filename = transfer.get_dst_path()
 
-        if local_filename is None:
-            self._detected_3rd_party = True
-        else:
+        if local_filename is not None:
             try:
                 s = os.stat(local_filename)
                 bytes = s[stat.ST_SIZE]
-                self._total_bytes += bytes
-                self._site_pair_bytes[key] += bytes
             except Exception:
                 pass  # ignore
 
@@ -4040,7 +4228,20 @@ class Stats:
             data += '    lfn: "%s"\n' % (transfer.lfn)
         if bytes > 0:
             data += "    bytes: %d\n" % (bytes)
-        self._yaml += data
+        if was_successful and transfer.sha256 is not None:
+            data += "    sha256: %s\n" % (transfer.sha256)
+
+        with self.lock:
+            if key not in self._site_pair_count:
+                self._site_pair_count[key] = 0
+                self._site_pair_bytes[key] = 0
+            self._site_pair_count[key] += 1
+            self._total_count += 1
+            if local_filename is None:
+                self._detected_3rd_party = True
+            self._total_bytes += bytes
+            self._site_pair_bytes[key] += bytes
+            self._yaml.append(data)
 
         # call out to panorama if asked to do so, but make sure that failures
         # do not stop us
@@ -4055,28 +4256,30 @@ class Stats:
         self._t_end_global = time.time()
 
     def add_integrity_generate(self, linkage, duration):
-        # this is not currently used, and thus does not handle
-        # success/failed counts
+        # this is only used for checksums computed while copying outside of
+        # kickstart, and thus does not handle success/failed counts
         if linkage is None or linkage == "":
             linkage = "unknown"
-        if linkage not in self._integrity_generate_count:
-            self._integrity_generate_count[linkage] = 0
-            self._integrity_generate_duration[linkage] = 0.0
-        self._integrity_generate_count[linkage] += 1
-        self._integrity_generate_duration[linkage] += duration
+        with self.lock:
+            if linkage not in self._integrity_generate_count:
+                self._integrity_generate_count[linkage] = 0
+                self._integrity_generate_duration[linkage] = 0.0
+            self._integrity_generate_count[linkage] += 1
+            self._integrity_generate_duration[linkage] += duration
 
     def add_integrity_verify(self, linkage, duration, success):
         if linkage is None or linkage == "":
             linkage = "unknown"
-        if linkage not in self._integrity_verify_count_succeeded:
-            self._integrity_verify_count_succeeded[linkage] = 0
-            self._integrity_verify_count_failed[linkage] = 0
-            self._integrity_verify_duration[linkage] = 0.0
-        if success:
-            self._integrity_verify_count_succeeded[linkage] += 1
-        else:
-            self._integrity_verify_count_failed[linkage] += 1
-        self._integrity_verify_duration[linkage] += duration
+        with self.lock:
+            if linkage not in self._integrity_verify_count_succeeded:
+                self._integrity_verify_count_succeeded[linkage] = 0
+                self._integrity_verify_count_failed[linkage] = 0
+                self._integrity_verify_duration[linkage] = 0.0
+            if success:
+                self._integrity_verify_count_succeeded[linkage] += 1
+            else:
+                self._integrity_verify_count_failed[linkage] += 1
+            self._integrity_verify_duration[linkage] += duration
 
     def stats_summary(self):
 
@@ -4089,7 +4292,7 @@ class Stats:
                     "w",
                 )
                 fh.write("- transfer_attempts:\n")
-                fh.write(self._yaml)
+                fh.write("".join(self._yaml))
                 fh.close()
             except Exception as e:
                 logger.error(
@@ -4254,6 +4457,8 @@ class SimilarWorkSet:
     _tmp_file = None
     _excessive_failures = False
 
+    _integrity_lock = threading.Lock()
+
     def __init__(self, transfers_l, completed_q, failed_q):
 
         self._transfers = transfers_l
@@ -4467,8 +4672,15 @@ class SimilarWorkSet:
                 local_name = None
                 temp_name = None
 
-                # local files are a special case
-                if t.get_dst_proto() == "file":
+                # local files are a special case, and the checksum might
+                # already have been computed while copying
+                if t.get_dst_proto() == "file" and t.sha256 is not None:
+                    if self.verify_copied_checksum(t):
+                        success_list.append(t)
+                    else:
+                        failed_list.append(t)
+                    continue
+                elif t.get_dst_proto() == "file":
                     local_name = t.get_dst_path()
                 else:
                     # first verify that we can actually pull the file back
@@ -4523,6 +4735,15 @@ class SimilarWorkSet:
         if count_total > 10 and (count_failed / float(count_total)) > 0.8:
             self._excessive_failures = True
 
+    def is_local(self):
+        """
+        Is this set only handled by the in-process FileHandler?
+        """
+        return (
+            isinstance(self._primary_handler, FileHandler)
+            and self._secondary_handler is None
+        )
+
     def excessive_failures(self):
         """
         Did the last transfer set see excessive failures?
@@ -4584,6 +4805,41 @@ class SimilarWorkSet:
             return False
         return True
 
+    def verify_copied_checksum(self, t):
+        """
+        Verifies the checksum computed while copying a transfer against the
+        one in the meta data, the same way as pegasus-integrity --verify
+        """
+        global integrity_meta_data
+
+        if t.lfn is None or t.lfn == "":
+            logger.error("lfn is required when enabling checksumming")
+            return False
+
+        with self._integrity_lock:
+            if integrity_meta_data is None or t.lfn not in integrity_meta_data:
+                # read all the .meta files in the current working dir, again
+                # if the lfn is missing as its .meta file may have arrived
+                # after the last read
+                integrity_meta_data = utils.load_meta_data("*.meta")
+            expected_sha256 = integrity_meta_data.get(t.lfn)
+
+        if expected_sha256 is None:
+            logger.error("No checksum in the meta data for " + t.lfn)
+            stats.add_integrity_verify(t.linkage, 0.0, False)
+            return False
+
+        if t.sha256 != expected_sha256:
+            logger.error(
+                "%s: Expected checksum (%s) does not match the calculated checksum (%s) (timing: %.3f)"
+                % (t.get_dst_path(), expected_sha256, t.sha256, t.checksum_timing)
+            )
+            stats.add_integrity_verify(t.linkage, t.checksum_timing, False)
+            return False
+
+        stats.add_integrity_verify(t.linkage, t.checksum_timing, True)
+        return True
+
     def get_temp_file(self):
         """
         Creates a new temporary file, returns the filename
@@ -4626,13 +4882,19 @@ class WorkThread(threading.Thread):
         self.daemon = True
 
     def run(self):
-        # give the threads a slow start
-        time.sleep(self.thread_id * 2)
         logger.debug("Started new WorkThread with id " + str(self.thread_id))
+        slow_start = True
         try:
             # Just keep grabbing SimilarWorkSets and executing them until
             # there are no more to process, then exit
             while True:
+                # give the threads a slow start, unless the remaining
+                # transfers are local and do not put any load on remote
+                # services. Sleep before dequeuing, so that no set is held
+                # by a sleeping thread
+                if slow_start and self._has_remote_sets():
+                    time.sleep(self.thread_id * 2)
+                slow_start = False
                 ts = self.queue.get(False)
                 logger.debug(
                     "Thread "
@@ -4651,6 +4913,13 @@ class WorkThread(threading.Thread):
             self.exception = e
             self.tb = traceback.format_exc()
 
+    def _has_remote_sets(self):
+        """
+        Are there SimilarWorkSets left in the queue which are not local?
+        """
+        with self.queue.mutex:
+            return any(not ts.is_local() for ts in self.queue.queue)
+
 
 class Alarm(Exception):
     pass
@@ -4676,9 +4945,15 @@ symlink_file_transfer = False
 # try to create them over and over again
 remote_dirs_created = {}
 
+# track local directories created, for the same reason
+local_dirs_created = set()
+
 # track which lfns we have already checksummed
 integrity_checksummed = []
 
+# checksums from the .meta files, loaded when first needed
+integrity_meta_data = None
+
 # many commands need to know how long the command line can be
 max_cmd_len = 0
 
@@ -4766,7 +5041,7 @@ def max_cmd_length():
             return (2 ** (n - 1)) / 2
 
     # we shouldn't really get here, but if we do, 2^20/2
-    return (2 ** 20) / 2
+    return (2**20) / 2
 
 
 def env_setup():
@@ -4860,18 +5135,34 @@ def verify_local_file(path):
     return True
 
 
-def prepare_local_dir(path):
+def prepare_local_dir(path, mode=0o0755):
     """
-    makes sure a local path exists before putting files into it
+    makes sure a local path exists before putting files into it - the
+    directories are remembered, so that transfers into the same directory
+    do not have to check again
     """
+    if path in local_dirs_created:
+        return
     if not (os.path.exists(path)):
         logger.debug("Creating local directory " + path)
         try:
-            os.makedirs(path, 0o0755)
+            os.makedirs(path, mode)
         except os.error as err:
             # if dir already exists, ignore the error
             if not (os.path.isdir(path)):
                 raise RuntimeError(err)
+    local_dirs_created.add(path)
+
+
+def forget_local_dirs(path):
+    """
+    forgets about the local directories created at or under path, for
+    example after path has been removed
+    """
+    prefix = os.path.join(path, "")
+    for d in list(local_dirs_created):
+        if d == path or d.startswith(prefix):
+            local_dirs_created.discard(d)
 
 
 def transfers_groupable(a, b):
@@ -19,6 +19,7 @@ import os
 import re
 import stat
 import sys
+import threading
 from argparse import ArgumentParser
 
 from six.moves.configparser import ConfigParser
@@ -27,14 +28,13 @@ from six.moves.urllib.parse import urlsplit
 try:
     import boto3
     import botocore
+    import botocore.config
+    import botocore.utils
+    from boto3.s3.transfer import TransferConfig
 except ImportError as e:
     sys.stderr.write("ERROR: Unable to load boto3 library: %s\n" % e)
     exit(1)
 
-# do not use http proxies for S3
-if "http_proxy" in os.environ:
-    del os.environ["http_proxy"]
-
 # Don't let apple hijack our cacerts
 os.environ["OPENSSL_X509_TEA_DISABLE"] = "1"
 
@@ -104,8 +104,14 @@ LOCATIONS = {
 DEFAULT_CONFIG = {
     "batch_delete": str(True),
     "batch_delete_size": str(1000),
+    "multipart_chunk_size": str(8),
+    "multipart_concurrency": str(10),
 }
 
+# clients shared by get_pooled_s3_client(), by endpoint and identity
+_clients = {}
+_clients_lock = threading.Lock()
+
 
 def fix_file(url):
     if url.startswith("file://"):
@@ -160,6 +166,10 @@ def get_config(options):
             # If the new default doesn't exist, try the old default
             cfg = os.path.expanduser("~/.s3cfg")
 
+    return read_config(cfg)
+
+
+def read_config(cfg):
     if not os.path.isfile(cfg):
         raise Exception("Config file not found")
 
@@ -191,7 +201,7 @@ def parse_endpoint(uri):
     return kwargs, location
 
 
-def get_s3_client(config, uri):
+def get_s3_client(config, uri, client_config=None):
     if not config.has_section(uri.site):
         raise Exception("Config file has no section for site '%s'" % uri.site)
 
@@ -209,9 +219,126 @@ def get_s3_client(config, uri):
         endpoint_url=endpoint,
         aws_access_key_id=aws_access_key_id,
         aws_secret_access_key=aws_secret_access_key,
+        config=client_config,
+    )
+
+
+def get_pooled_s3_client(config, uri, max_pool_connections=10):
+    """
+    Returns a client for the endpoint and identity of uri which is shared by
+    all the callers, as pegasus-transfer threads, so that they do not each
+    pay for a new session and keep the connections to the endpoint open.
+    boto3 clients are thread safe.
+    """
+    key = (
+        config.get(uri.site, "endpoint") if config.has_section(uri.site) else None,
+        uri.ident,
+    )
+    with _clients_lock:
+        if key not in _clients:
+            # do not use http proxies for S3 - an empty dict means no proxy,
+            # and endpoints in no_proxy get one
+            proxies = {}
+            if key[0] is not None:
+                proxies = dict(botocore.utils.get_environ_proxies(key[0]))
+                proxies.pop("http", None)
+                proxies.pop("no", None)
+            _clients[key] = get_s3_client(
+                config,
+                uri,
+                botocore.config.Config(
+                    max_pool_connections=max_pool_connections, proxies=proxies
+                ),
+            )
+        return _clients[key]
+
+
+def get_transfer_config(config, uri):
+    """
+    Returns the configuration of the boto3 transfer manager for multipart
+    uploads and ranged downloads for the site of uri
+    """
+    if config.has_section(uri.site):
+        chunk_size = config.getint(uri.site, "multipart_chunk_size")
+        concurrency = config.getint(uri.site, "multipart_concurrency")
+    else:
+        chunk_size = int(DEFAULT_CONFIG["multipart_chunk_size"])
+        concurrency = int(DEFAULT_CONFIG["multipart_concurrency"])
+
+    return TransferConfig(
+        multipart_threshold=chunk_size * MB,
+        multipart_chunksize=chunk_size * MB,
+        max_concurrency=concurrency,
     )
 
 
+def create_bucket(s3_client, bucket):
+    """
+    Creates bucket unless it already exists, returns True if it was created
+    """
+    try:
+        s3_client.head_bucket(Bucket=bucket)
+
+        # no exception, we already own this bucket
+        return False
+    except botocore.exceptions.ClientError as e:
+        code = e.response["Error"]["Code"]
+
+        # 403 forbidden means bucket already taken
+        if code == "403":
+            raise Exception(
+                "Bucket: {} is already taken. Unable to create bucket.".format(bucket)
+            )
+
+        # 404 not found means bucket can be created
+        elif code != "404":
+            raise e
+
+    s3_client.create_bucket(Bucket=bucket)
+    return True
+
+
+def delete_keys(s3_client, bucket, keys, batch_delete=True, batch_delete_size=1000):
+    """
+    Deletes keys from bucket, in batches of batch_delete_size keys if
+    batch_delete is True
+    """
+    if not batch_delete:
+        for key_name in keys:
+            log.info("Deleting %s" % key_name)
+            s3_client.delete_object(Bucket=bucket, Key=key_name)
+        return
+
+    log.info("Using batch deletes")
+    log.info("batch_delete_size: %d" % batch_delete_size)
+
+    keys = list(keys)
+    for i in range(0, len(keys), batch_delete_size):
+        batch = keys[i : i + batch_delete_size]
+        log.info("Deleting batch of %d keys" % len(batch))
+
+        resp = s3_client.delete_objects(
+            Bucket=bucket,
+            Delete={"Objects": [{"Key": item} for item in batch]},
+        )
+
+        if not len(resp.get("Deleted", [])) == len(batch):
+            raise Exception(
+                "Incomplete batch delete, some keys were not successfully deleted."
+            )
+
+
+def list_keys(s3_client, bucket, prefix):
+    """
+    Returns the keys of bucket starting with prefix
+    """
+    keys = []
+    paginator = s3_client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        keys.extend(obj["Key"] for obj in page.get("Contents", []))
+    return keys
+
+
 def is_bucket_available(s3_client, bucket):
     is_available = False
     try:
@@ -411,29 +538,7 @@ def cp(args):
 
     # Create the bucket if the user requested it and it does not exist
     if args.create:
-        can_create = True
-        try:
-            s3.head_bucket(Bucket=dest.bucket)
-
-            # no exception, we already own this bucket
-            can_create = False
-        except botocore.exceptions.ClientError as e:
-            code = e.response["Error"]["Code"]
-
-            # 403 forbidden means bucket already taken
-            if code == "403":
-                raise Exception(
-                    "Bucket: {} is already taken. Unable to create bucket.".format(
-                        dest.bucket
-                    )
-                )
-
-            # 404 not found means bucket can be created
-            elif code != "404":
-                raise e
-
-        if can_create:
-            s3.create_bucket(Bucket=dest.bucket)
+        create_bucket(s3, dest.bucket)
 
     # ensure that none of the keys in srcs exist in dest
     if not args.force:
@@ -467,12 +572,15 @@ def cp(args):
                 if error_code != 404:
                     raise e
 
+    transfer_config = get_transfer_config(config, dest)
+
     if dest.key == None:
         for src in srcs:
             s3.copy(
                 CopySource={"Bucket": src.bucket, "Key": src.key},
                 Bucket=dest.bucket,
                 Key=src.key,
+                Config=transfer_config,
             )
     else:
         assert len(srcs) == 1
@@ -481,6 +589,7 @@ def cp(args):
             CopySource={"Bucket": src.bucket, "Key": src.key},
             Bucket=dest.bucket,
             Key=dest.key,
+            Config=transfer_config,
         )
 
 
@@ -495,30 +604,7 @@ def mkdir(args):
     config = get_config(args)
     s3 = get_s3_client(config, uri)
 
-    can_create = True
-    try:
-        s3.head_bucket(Bucket=uri.bucket)
-
-        # no exception, we already own this bucket
-        can_create = False
-    except botocore.exceptions.ClientError as e:
-        code = e.response["Error"]["Code"]
-
-        # 403 forbidden means bucket already taken
-        if code == "403":
-            raise Exception(
-                "Bucket: {} is already taken. Unable to create bucket.".format(
-                    uri.bucket
-                )
-            )
-
-        # 404 not found means bucket can be created
-        elif code != "404":
-            raise e
-
-    if can_create:
-        s3.create_bucket(Bucket=uri.bucket)
-    else:
+    if not create_bucket(s3, uri.bucket):
         log.warning(
             "Bucket: {} exists and is already owned by user: {}".format(
                 uri.bucket, uri.ident
@@ -582,49 +668,13 @@ def rm(args):
 
             log.info("Deleting %d keys" % len(keys_to_delete))
 
-            batch_delete = config.getboolean(uri.site, "batch_delete")
-
-            if batch_delete:
-                log.info("Using batch deletes")
-
-                # Delete the keys in batches
-                batch_delete_size = config.getint(uri.site, "batch_delete_size")
-                log.info("batch_delete_size: %d" % batch_delete_size)
-                batch = []
-                for k in keys_to_delete:
-                    batch.append(k)
-                    if len(batch) == batch_delete_size:
-                        log.info("Deleting batch of %d keys" % len(batch))
-
-                        resp = s3.delete_objects(
-                            Bucket=uri.bucket,
-                            Delete={"Objects": [{"Key": item} for item in batch]},
-                        )
-
-                        if not len(resp["Deleted"]) == len(batch):
-                            raise Exception(
-                                "Incomplete batch delete, some keys were not successfully deleted."
-                            )
-
-                        batch = []
-
-                # Delete the final batch
-                if len(batch) > 0:
-                    log.info("Deleting batch of %d keys" % len(batch))
-                    resp = s3.delete_objects(
-                        Bucket=uri.bucket,
-                        Delete={"Objects": [{"Key": item} for item in batch]},
-                    )
-
-                    if not len(resp["Deleted"]) == len(batch):
-                        raise Exception(
-                            "Incomplete batch delete, some keys were not successfully deleted."
-                        )
-
-            else:
-                for key_name in keys_to_delete:
-                    log.info("Deleting %s" % key_name)
-                    s3.delete_object(Bucket=uri.bucket, Key=key_name)
+            delete_keys(
+                s3,
+                uri.bucket,
+                keys_to_delete,
+                config.getboolean(uri.site, "batch_delete"),
+                config.getint(uri.site, "batch_delete_size"),
+            )
 
         except s3.exceptions.NoSuchBucket:
             raise Exception("Invalid bucket: {}".format(uri.bucket))
@@ -686,21 +736,7 @@ def put(args):
 
     # Create the bucket if the user requested it and it does not exist
     if args.create_bucket:
-        can_create = True
-        try:
-            s3.head_bucket(Bucket=uri.bucket)
-
-            # no exception, we already own this bucket
-            can_create = False
-        except botocore.exceptions.ClientError as e:
-            code = e.response["Error"]["Code"]
-
-            if code != "404":
-                log.error(code)
-                raise e
-
-        if can_create:
-            s3.create_bucket(Bucket=uri.bucket)
+        create_bucket(s3, uri.bucket)
 
     if not args.force:
         # check if all keys do not yet exist
@@ -724,7 +760,7 @@ def put(args):
 
     try:
         key = path if uri.key is None else uri.key
-        s3.upload_file(path, uri.bucket, key)
+        s3.upload_file(path, uri.bucket, key, Config=get_transfer_config(config, uri))
         log.info(
             "Uploaded file: {file} to bucket: {bucket} as key: {key}".format(
                 file=path, bucket=uri.bucket, key=key
@@ -757,7 +793,12 @@ def get(args):
     s3 = get_s3_client(config, uri)
 
     try:
-        s3.download_file(Bucket=uri.bucket, Key=uri.key, Filename=output)
+        s3.download_file(
+            Bucket=uri.bucket,
+            Key=uri.key,
+            Filename=output,
+            Config=get_transfer_config(config, uri),
+        )
     except s3.exceptions.NoSuchBucket:
         raise Exception("Invalid bucket: {}".format(uri.bucket))
     except botocore.exceptions.ClientError as e:
@@ -914,6 +955,10 @@ def parse_args(args):
 
 # --- Entrypoint ---------------------------------------------------------------
 def main():
+    # do not use http proxies for S3
+    if "http_proxy" in os.environ:
+        del os.environ["http_proxy"]
+
     parser, args = parse_args(sys.argv[1:])
 
     configure_logging(args.verbose, args.debug)
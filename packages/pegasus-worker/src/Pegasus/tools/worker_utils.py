@@ -21,14 +21,22 @@
 
 from __future__ import print_function
 
+import errno
+import glob
+import hashlib
+import io
+import json
 import logging
 import os
 import re
+import shutil
+import stat
 import subprocess
 import sys
 import tempfile
 import threading
 import time
+from datetime import datetime
 
 import six
 from six.moves.builtins import int
@@ -36,6 +44,49 @@ from six.moves.builtins import int
 # Module variables
 logger = logging.getLogger("Pegasus")
 
+# block size for the read()/write() fallback of copy_file()
+COPY_BUFSIZE = 1024 * 1024
+
+# size of the reads of sha256_file() - a multiple of the page size and of the
+# block size of filesystems, so that the reads stay aligned
+HASH_BUFSIZE = 4 * 1024 * 1024
+
+# FICLONE from linux/fs.h - shares the extents of a file on filesystems
+# supporting reflinks, such as btrfs and xfs
+FICLONE = 0x40049409
+
+# errors which mean that a copy method is not supported for a pair of files,
+# and that the next one should be tried
+_COPY_UNSUPPORTED = frozenset(
+    [
+        errno.EBADF,
+        errno.EINVAL,
+        errno.ENOSYS,
+        errno.ENOTTY,
+        errno.EOPNOTSUPP,
+        errno.EPERM,
+        errno.EXDEV,
+    ]
+)
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import sqlite3
+except ImportError:
+    sqlite3 = None
+
+# for some reason, sometimes grp is missing, but we can do without it
+try:
+    import grp
+    import pwd
+except ImportError:
+    grp = None
+    pwd = None
+
 
 def force_str(s):
     """
@@ -328,3 +379,459 @@ class Tools(object):
                 return None
             finally:
                 self.lock.release()
+
+
+def sha256_file(path):
+    """
+    Returns the hex sha256 digest of the file at path, computed in process.
+    hashlib releases the GIL while hashing, so files can be hashed by
+    concurrent threads.
+    """
+    h = hashlib.sha256()
+    buf = bytearray(HASH_BUFSIZE)
+    view = memoryview(buf)
+    with io.open(path, "rb", buffering=0) as f:
+        _fadvise_sequential(f.fileno())
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            h.update(view[:n])
+    return h.hexdigest()
+
+
+def _fadvise_sequential(fd):
+    """
+    Tells the kernel that fd is going to be read sequentially, so that it
+    reads ahead more aggressively
+    """
+    if hasattr(os, "posix_fadvise"):
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        except OSError:
+            pass
+
+
+def _file_key(st):
+    """
+    Returns the identity of a file, as used by ChecksumCache, from its stat:
+    any change to the file changes its mtime or ctime
+    """
+    if hasattr(st, "st_mtime_ns"):
+        mtime_ns = st.st_mtime_ns
+        ctime_ns = st.st_ctime_ns
+    else:
+        mtime_ns = int(st.st_mtime * 1e9)
+        ctime_ns = int(st.st_ctime * 1e9)
+    return (st.st_dev, st.st_ino, st.st_size, mtime_ns, ctime_ns)
+
+
+class ChecksumCache(object):
+    """
+    A node-local cache of sha256 checksums, shared by concurrent processes
+    through a sqlite database. Entries are keyed by the identity of the
+    file - device, inode, size, mtime and ctime - so that a changed file is
+    hashed again. The least recently used entries are evicted once there
+    are more than max_entries.
+    """
+
+    # entries are only marked as used this often, so that most lookups do
+    # not have to write to the database
+    REFRESH_INTERVAL = 3600
+
+    # files modified this recently are not cached, as a change within the
+    # timestamp granularity of the filesystem would go unnoticed
+    RACY_INTERVAL = 2
+
+    def __init__(self, path, max_entries=100000):
+        if sqlite3 is None:
+            raise RuntimeError("sqlite3 is not available")
+
+        self._path = path
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+
+        # the cache must only be writable by the user, as its content is
+        # trusted - this also covers files created before by someone else
+        dirname = os.path.dirname(os.path.abspath(path))
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname, 0o700)
+        self._check_owner(dirname, os.stat(dirname))
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT, 0o600)
+        try:
+            self._check_owner(path, os.fstat(fd))
+        finally:
+            os.close(fd)
+
+        self._db = sqlite3.connect(
+            path, timeout=60, isolation_level=None, check_same_thread=False
+        )
+        try:
+            # readers do not block the writer, and the other way around
+            self._db.execute("PRAGMA journal_mode = WAL")
+        except sqlite3.Error:
+            pass
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS checksums ("
+            " dev INTEGER NOT NULL,"
+            " ino INTEGER NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " ctime_ns INTEGER NOT NULL,"
+            " sha256 TEXT NOT NULL,"
+            " used INTEGER NOT NULL,"
+            " PRIMARY KEY (dev, ino))"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS checksums_used ON checksums (used)"
+        )
+
+    @staticmethod
+    def _check_owner(path, st):
+        """
+        Raises RuntimeError unless path is owned by the user, and not
+        writable by anyone else
+        """
+        if st.st_uid != os.getuid():
+            raise RuntimeError("%s is not owned by the user" % (path))
+        if st.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+            raise RuntimeError("%s is writable by group or others" % (path))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def lookup(self, st):
+        """
+        Returns the cached checksum of the file with the given stat, or None
+        """
+        key = _file_key(st)
+        try:
+            with self._lock:
+                row = self._db.execute(
+                    "SELECT size, mtime_ns, ctime_ns, sha256, used FROM checksums"
+                    " WHERE dev = ? AND ino = ?",
+                    key[:2],
+                ).fetchone()
+                if row is None or tuple(row[:3]) != key[2:]:
+                    return None
+                now = int(time.time())
+                if now - row[4] > self.REFRESH_INTERVAL:
+                    self._db.execute(
+                        "UPDATE checksums SET used = ? WHERE dev = ? AND ino = ?",
+                        (now,) + key[:2],
+                    )
+        except sqlite3.Error as err:
+            logger.warning(
+                "Unable to read the checksum cache %s: %s" % (self._path, err)
+            )
+            return None
+        return row[3]
+
+    def store(self, st, sha256):
+        """
+        Caches the checksum of the file with the given stat
+        """
+        now = int(time.time())
+        if now - st.st_mtime < self.RACY_INTERVAL:
+            return
+        try:
+            with self._lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO checksums VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    _file_key(st) + (sha256, now),
+                )
+                (count,) = self._db.execute("SELECT COUNT(*) FROM checksums").fetchone()
+                if count > self._max_entries:
+                    # evict a tenth at a time, so that eviction is rare
+                    self._db.execute(
+                        "DELETE FROM checksums WHERE rowid IN"
+                        " (SELECT rowid FROM checksums ORDER BY used, rowid LIMIT ?)",
+                        (count - self._max_entries + self._max_entries // 10,),
+                    )
+        except sqlite3.Error as err:
+            logger.warning(
+                "Unable to write to the checksum cache %s: %s" % (self._path, err)
+            )
+
+    def sha256_file(self, path):
+        """
+        Returns the hex sha256 digest of the file at path, from the cache if
+        the file did not change since it was last hashed
+        """
+        st = os.stat(path)
+        sha256 = self.lookup(st)
+        if sha256 is not None:
+            return sha256
+
+        sha256 = sha256_file(path)
+
+        # do not cache the checksum of a file which changed while hashing
+        if _file_key(os.stat(path)) == _file_key(st):
+            self.store(st, sha256)
+        return sha256
+
+
+def _reflink(src_fd, dst_fd):
+    """
+    Tries to clone src_fd into dst_fd, returns True if the filesystem did it
+    """
+    if fcntl is None or not sys.platform.startswith("linux"):
+        return False
+    try:
+        fcntl.ioctl(dst_fd, FICLONE, src_fd)
+    except (IOError, OSError) as e:
+        if e.errno in _COPY_UNSUPPORTED:
+            return False
+        raise
+    return True
+
+
+def _copy_fd(src_fd, dst_fd, size):
+    """
+    Copies the content of src_fd to dst_fd, from their current offsets. The
+    kernel does the copy if it can, and copy_file_range() also lets network
+    filesystems copy server side.
+    """
+    if size > 0 and _reflink(src_fd, dst_fd):
+        return
+
+    # zero sized files might be special files which only have content when
+    # read(), such as the ones in /proc
+    if size > 0 and hasattr(os, "copy_file_range"):
+        try:
+            while os.copy_file_range(src_fd, dst_fd, COPY_BUFSIZE * 64) > 0:
+                pass
+            return
+        except OSError as e:
+            if e.errno not in _COPY_UNSUPPORTED:
+                raise
+
+    if size > 0 and hasattr(os, "sendfile") and sys.platform.startswith("linux"):
+        try:
+            while os.sendfile(dst_fd, src_fd, None, COPY_BUFSIZE * 64) > 0:
+                pass
+            return
+        except OSError as e:
+            if e.errno not in _COPY_UNSUPPORTED:
+                raise
+
+    while True:
+        buf = os.read(src_fd, COPY_BUFSIZE)
+        if not buf:
+            break
+        while buf:
+            buf = buf[os.write(dst_fd, buf) :]
+
+
+def _copy_fd_sha256(src_fd, dst_fd):
+    """
+    Copies the content of src_fd to dst_fd with read() and write(), hashing
+    the data as it goes through. Returns the hex sha256 digest of the data,
+    and the time spent hashing it.
+    """
+    h = hashlib.sha256()
+    timing = 0.0
+    buf = bytearray(HASH_BUFSIZE)
+    view = memoryview(buf)
+    _fadvise_sequential(src_fd)
+    f = io.FileIO(src_fd, "rb", closefd=False)
+    while True:
+        n = f.readinto(buf)
+        if not n:
+            break
+        t_start = time.time()
+        h.update(view[:n])
+        timing += time.time() - t_start
+        written = 0
+        while written < n:
+            written += os.write(dst_fd, view[written:n])
+    return h.hexdigest(), timing
+
+
+def copy_file(src, dst, sha256=False):
+    """
+    Copies the file src to dst in process, the same way as `cp -f -L`: src
+    is dereferenced, a dst directory gets a src file with the same name, and
+    new files get the mode of src.
+
+    If sha256 is True, the data is hashed while it is copied, and the hex
+    sha256 digest of src and the time spent hashing are returned. The kernel
+    side copy methods are not used then, as the data has to be read anyways.
+    """
+    if os.path.isdir(dst):
+        dst = os.path.join(dst, os.path.basename(src))
+
+    src_fd = os.open(src, os.O_RDONLY)
+    try:
+        st = os.fstat(src_fd)
+        flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+        try:
+            dst_fd = os.open(dst, flags, stat.S_IMODE(st.st_mode))
+        except OSError as e:
+            # -f: remove a destination which can not be opened, and try again
+            if e.errno not in (errno.EACCES, errno.EPERM, errno.ETXTBSY):
+                raise
+            os.unlink(dst)
+            dst_fd = os.open(dst, flags, stat.S_IMODE(st.st_mode))
+        try:
+            if sha256:
+                return _copy_fd_sha256(src_fd, dst_fd)
+            _copy_fd(src_fd, dst_fd, st.st_size)
+        finally:
+            os.close(dst_fd)
+    finally:
+        os.close(src_fd)
+
+
+def copy_tree(src, dst):
+    """
+    Copies src to dst in process, the same way as `cp -f -R -L`: files are
+    copied with copy_file(), and directories recursively, following symlinks.
+    """
+    if not os.path.isdir(src):
+        copy_file(src, dst)
+        return
+
+    if os.path.isdir(dst):
+        dst = os.path.join(dst, os.path.basename(os.path.normpath(src)))
+
+    for dirpath, dirnames, filenames in os.walk(src, followlinks=True):
+        target = os.path.join(dst, os.path.relpath(dirpath, src))
+        if not os.path.isdir(target):
+            os.makedirs(target, stat.S_IMODE(os.stat(dirpath).st_mode))
+        for name in filenames:
+            copy_file(os.path.join(dirpath, name), os.path.join(target, name))
+
+
+def symlink_file(src, dst):
+    """
+    Symlinks src to dst, the same way as `ln -f -s`: an existing dst is
+    replaced, and a dst directory gets a link with the same name as src.
+    """
+    if os.path.isdir(dst):
+        dst = os.path.join(dst, os.path.basename(src))
+    try:
+        os.symlink(src, dst)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+        os.unlink(dst)
+        os.symlink(src, dst)
+
+
+def remove(path, recursive=False):
+    """
+    Removes path, the same way as `rm -f` or `rm -f -r` if recursive is True:
+    a missing path is not an error.
+    """
+
+    def onerror(function, p, exc_info):
+        if getattr(exc_info[1], "errno", None) != errno.ENOENT:
+            raise exc_info[1]
+
+    try:
+        if recursive and os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path, onerror=onerror)
+        else:
+            os.unlink(path)
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
+
+
+def iso8601(ts):
+    """
+    Formats a UNIX timestamp in ISO 8601 format
+    """
+    dt = datetime.utcfromtimestamp(ts)
+    return dt.isoformat()
+
+
+def fullstat_yaml(lfn, pfn, sha256, timing):
+    """
+    Formats the kickstart yaml for the file pfn, registered as lfn, with its
+    stat information and checksum. Returns an empty string if pfn can not be
+    stat()ed.
+    """
+    try:
+        s = os.stat(pfn)
+    except Exception:
+        return ""
+
+    uname = ""
+    try:
+        uname = pwd.getpwuid(s.st_uid).pw_name
+    except Exception:
+        pass
+    gname = ""
+    try:
+        gname = grp.getgrgid(s.st_gid).gr_name
+    except Exception:
+        pass
+
+    yaml = ""
+    yaml += '    "%s":\n' % (lfn)
+    yaml += "      comment: entry generated by pegasus-integrity\n"
+    yaml += '      file_name: "%s"\n' % (pfn)
+    yaml += (
+        "      mode: 0o%o\n"
+        "      size: %d\n"
+        "      inode: %d\n"
+        "      nlink: %d\n"
+        "      mtime: %s\n"
+        "      atime: %s\n"
+        "      ctime: %s\n"
+        "      uid: %d\n"
+        "      user: %s\n"
+        "      gid: %d\n"
+        "      group: %s\n"
+        "      output: True\n"
+        % (
+            s.st_mode,
+            s.st_size,
+            s.st_ino,
+            s.st_nlink,
+            iso8601(s.st_mtime),
+            iso8601(s.st_atime),
+            iso8601(s.st_ctime),
+            s.st_uid,
+            uname,
+            s.st_gid,
+            gname,
+        )
+    )
+    yaml += "      sha256: %s\n" "      checksum_timing: %.3f\n" % (sha256, timing)
+    return yaml
+
+
+def read_meta_data(f):
+    """
+    Reads the entries of a JSON .meta file
+    """
+    data = []
+    try:
+        fp = open(f, "r")
+        data = json.load(fp)
+        fp.close()
+    except Exception as err:
+        logger.critical("Error parsing the meta data: " + str(err))
+    return data
+
+
+def load_meta_data(pattern):
+    """
+    Loads the .meta files matching pattern, and indexes the checksums they
+    contain by lfn
+    """
+    meta_data = {}
+    for meta_file in sorted(glob.glob(pattern)):
+        logger.debug("Loading metadata from %s" % (meta_file))
+        for entry in read_meta_data(meta_file):
+            if (
+                "_id" in entry
+                and "_attributes" in entry
+                and "checksum.value" in entry["_attributes"]
+            ):
+                meta_data[entry["_id"]] = entry["_attributes"]["checksum.value"]
+    return meta_data
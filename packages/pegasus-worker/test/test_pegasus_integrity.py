@@ -0,0 +1,111 @@
+import hashlib
+import importlib
+import json
+import os
+
+import pytest
+
+from Pegasus.tools import worker_utils
+
+pegasus_integrity = importlib.import_module("Pegasus.cli.pegasus-integrity")
+
+
+def _meta(lfn, sha256):
+    return {
+        "_id": lfn,
+        "_type": "file",
+        "_attributes": {"checksum.type": "sha256", "checksum.value": sha256},
+    }
+
+
+@pytest.fixture
+def files(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    files = {}
+    for i in range(5):
+        data = ("file %d\n" % i).encode() * (i * 1000)
+        (tmp_path / ("f%d" % i)).write_bytes(data)
+        files["f%d" % i] = hashlib.sha256(data).hexdigest()
+    (tmp_path / "a.meta").write_text(
+        json.dumps(
+            [_meta("f0", "0" * 64), {"_id": "f1", "_type": "file"}]
+            + [_meta(lfn, sha256) for lfn, sha256 in files.items()]
+        )
+    )
+    (tmp_path / "b.meta").write_text(json.dumps([_meta("f4", "4" * 64)]))
+    return files
+
+
+def test_load_meta_data(files):
+    meta_data = worker_utils.load_meta_data("*.meta")
+
+    assert meta_data == dict(files, f4="4" * 64)
+
+
+def test_generate_sha256(files):
+    assert pegasus_integrity.generate_sha256("f3") == files["f3"]
+    assert pegasus_integrity.generate_sha256("missing") is None
+
+
+def test_generate_sha256_cache(files, monkeypatch, tmp_path):
+    cache = worker_utils.ChecksumCache(str(tmp_path / "cache.db"))
+    monkeypatch.setattr(pegasus_integrity, "checksum_cache", cache)
+    os.utime("f3", (1000000000, 1000000000))
+
+    assert pegasus_integrity.generate_sha256("f3") == files["f3"]
+    assert cache.lookup(os.stat("f3")) == files["f3"]
+    assert pegasus_integrity.generate_sha256("f3") == files["f3"]
+    assert pegasus_integrity.generate_sha256("missing") is None
+    cache.close()
+
+
+def test_generate_fullstat_yaml(files):
+    yaml = pegasus_integrity.generate_fullstat_yaml("lfn", "f2")
+
+    assert yaml.startswith('    "lfn":\n')
+    assert '      file_name: "f2"\n' in yaml
+    assert "      size: 14000\n" in yaml
+    assert "      sha256: %s\n" % files["f2"] in yaml
+
+
+@pytest.mark.parametrize("threads", [1, 4])
+def test_verify(files, monkeypatch, threads):
+    monkeypatch.setattr(pegasus_integrity, "count_succeeded", 0)
+    monkeypatch.setattr(pegasus_integrity, "count_failed", 0)
+    meta_data = worker_utils.load_meta_data("a.meta")
+    items = [
+        (pfn, lfn, meta_data)
+        for lfn, pfn in pegasus_integrity.split_files("f0:f1:f2=f3:f3:missing")
+    ]
+
+    results = [
+        pegasus_integrity.record_integrity(*result, print_timings=False)
+        for result in pegasus_integrity.map_files(
+            pegasus_integrity.compute_integrity, items, threads
+        )
+    ]
+
+    assert results == [True, True, False, True, False]
+    assert pegasus_integrity.count_succeeded == 3
+    assert pegasus_integrity.count_failed == 1
+
+
+def test_check_integrity(files, monkeypatch):
+    monkeypatch.setattr(pegasus_integrity, "count_failed", 0)
+    meta_data = {"f1": files["f2"]}
+
+    assert not pegasus_integrity.check_integrity("f1", None, meta_data, False)
+    assert pegasus_integrity.count_failed == 1
+
+
+@pytest.mark.parametrize(
+    "value, threads", [(None, 4), ("2", 2), ("0", 4), ("-1", 4), ("many", 4)]
+)
+def test_env_int(monkeypatch, caplog, value, threads):
+    if value is None:
+        monkeypatch.delenv("PEGASUS_INTEGRITY_THREADS", raising=False)
+    else:
+        monkeypatch.setenv("PEGASUS_INTEGRITY_THREADS", value)
+
+    assert pegasus_integrity.env_int("PEGASUS_INTEGRITY_THREADS", 4) == threads
+    assert ("Invalid value" in caplog.text) == (value is not None and threads == 4)
@@ -0,0 +1,327 @@
+import hashlib
+import importlib
+import json
+import os
+
+import pytest
+from six.moves import queue
+
+pegasus_transfer = importlib.import_module("Pegasus.cli.pegasus-transfer")
+
+
+def _transfer(src_label, src_url, dst_label, dst_url, lfn=None):
+    t = pegasus_transfer.Transfer()
+    t.set_lfn(lfn)
+    t.add_src(src_label, src_url)
+    t.add_dst(dst_label, dst_url)
+    return t
+
+
+@pytest.fixture
+def stats(monkeypatch):
+    stats = pegasus_transfer.Stats()
+    monkeypatch.setattr(pegasus_transfer, "stats", stats)
+    return stats
+
+
+@pytest.fixture(scope="module")
+def s3_endpoint():
+    server = pytest.importorskip("moto.server").ThreadedMotoServer(port=0)
+    server.start()
+    host, port = server.get_host_and_port()
+    yield "http://%s:%d" % (host, port)
+    server.stop()
+
+
+@pytest.fixture
+def s3cfg(s3_endpoint, tmp_path, monkeypatch):
+    path = tmp_path / "s3cfg"
+    path.write_text(
+        "[moto]\n"
+        "endpoint = %s\n"
+        "multipart_chunk_size = 5\n"
+        "multipart_concurrency = 4\n"
+        "\n"
+        "[test@moto]\n"
+        "access_key = testing\n"
+        "secret_key = testing\n" % s3_endpoint
+    )
+    path.chmod(0o600)
+    monkeypatch.setenv("S3CFG_moto", str(path))
+    monkeypatch.setattr(pegasus_transfer, "remote_dirs_created", {})
+    return str(path)
+
+
+def test_file_handler(tmp_path, stats):
+    (tmp_path / "src").mkdir()
+    for i in range(3):
+        (tmp_path / "src" / str(i)).write_text(str(i))
+    transfers = [
+        _transfer(
+            "local",
+            "file://%s/src/%d" % (tmp_path, i),
+            "local",
+            "file://%s/dst/a/%d" % (tmp_path, i),
+            str(i),
+        )
+        for i in range(4)
+    ]
+
+    successful_l, failed_l = pegasus_transfer.FileHandler().do_transfers(transfers)
+
+    assert successful_l == transfers[:3]
+    assert failed_l == transfers[3:]
+    for i in range(3):
+        assert (tmp_path / "dst" / "a" / str(i)).read_text() == str(i)
+    assert stats._total_count == 4
+    assert "".join(stats._yaml).count("success: True") == 3
+
+    removes = pegasus_transfer.Remove()
+    removes.set_url("local", "file://%s/dst" % tmp_path)
+    removes.set_recursive(True)
+
+    successful_l, failed_l = pegasus_transfer.FileHandler().do_removes([removes])
+
+    assert successful_l == [removes]
+    assert not (tmp_path / "dst").exists()
+
+
+@pytest.fixture
+def checksums(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(pegasus_transfer, "integrity_checksummed", [])
+    monkeypatch.setattr(pegasus_transfer, "integrity_meta_data", None)
+    checksums = {}
+    for name in ["a", "b"]:
+        data = os.urandom(1024)
+        (tmp_path / name).write_bytes(data)
+        checksums[name] = hashlib.sha256(data).hexdigest()
+    return checksums
+
+
+def test_file_handler_generate_checksum(tmp_path, stats, checksums, monkeypatch):
+    monkeypatch.setenv("KICKSTART_INTEGRITY_DATA", str(tmp_path / "integrity"))
+    transfers = [
+        _transfer(
+            "local",
+            "file://%s/%s" % (tmp_path, lfn),
+            "local",
+            "file://%s/out/%s" % (tmp_path, lfn),
+            lfn,
+        )
+        for lfn in ["a", "b", "a"]
+    ]
+    for t in transfers:
+        t.generate_checksum = True
+
+    successful_l, failed_l = pegasus_transfer.FileHandler().do_transfers(transfers)
+
+    assert (successful_l, failed_l) == (transfers, [])
+    assert (tmp_path / "out" / "a").read_bytes() == (tmp_path / "a").read_bytes()
+    integrity = (tmp_path / "integrity").read_text()
+    assert integrity.count("sha256:") == 2
+    assert '    "a":\n' in integrity
+    assert "      sha256: %s\n" % checksums["b"] in integrity
+    assert "".join(stats._yaml).count("sha256: %s" % checksums["a"]) == 1
+
+
+def test_file_handler_generate_checksum_stats(tmp_path, stats, checksums, monkeypatch):
+    monkeypatch.delenv("KICKSTART_INTEGRITY_DATA", raising=False)
+    t = _transfer(
+        "local", "file://%s/a" % tmp_path, "local", "file://%s/c" % tmp_path, "a"
+    )
+    t.generate_checksum = True
+    t.linkage = "input"
+
+    successful_l, failed_l = pegasus_transfer.FileHandler().do_transfers([t])
+
+    assert (successful_l, failed_l) == ([t], [])
+    assert t.sha256 == checksums["a"]
+    assert stats._integrity_generate_count == {"input": 1}
+
+
+def test_verify_checksum_while_copying(tmp_path, stats, checksums):
+    (tmp_path / "a.meta").write_text(
+        json.dumps(
+            [
+                {"_id": "a", "_attributes": {"checksum.value": checksums["a"]}},
+                {"_id": "b", "_attributes": {"checksum.value": "0" * 64}},
+            ]
+        )
+    )
+    transfers = [
+        _transfer(
+            "local",
+            "file://%s/%s" % (tmp_path, lfn),
+            "local",
+            "file://%s/out/%s" % (tmp_path, lfn),
+            lfn,
+        )
+        for lfn in ["a", "b"]
+    ]
+    for t in transfers:
+        t.verify_checksum_remote = True
+    completed_q = queue.Queue()
+    failed_q = queue.Queue()
+
+    pegasus_transfer.SimilarWorkSet(transfers, completed_q, failed_q).do_transfers()
+
+    assert completed_q.get_nowait() is transfers[0]
+    assert completed_q.empty()
+    assert failed_q.get_nowait() is transfers[1]
+    assert stats._integrity_verify_count_succeeded == {"unknown": 1}
+    assert stats._integrity_verify_count_failed == {"unknown": 1}
+
+
+def test_verify_checksum_meta_data_arrives_later(tmp_path, stats, checksums):
+    transfers = [
+        _transfer(
+            "local",
+            "file://%s/%s" % (tmp_path, lfn),
+            "local",
+            "file://%s/out/%s" % (tmp_path, lfn),
+            lfn,
+        )
+        for lfn in ["a", "b"]
+    ]
+    for t in transfers:
+        t.verify_checksum_remote = True
+
+    for t in transfers:
+        (tmp_path / (t.lfn + ".meta")).write_text(
+            json.dumps(
+                [{"_id": t.lfn, "_attributes": {"checksum.value": checksums[t.lfn]}}]
+            )
+        )
+        completed_q = queue.Queue()
+        failed_q = queue.Queue()
+
+        pegasus_transfer.SimilarWorkSet([t], completed_q, failed_q).do_transfers()
+
+        assert completed_q.get_nowait() is t
+        assert failed_q.empty()
+
+    assert stats._integrity_verify_count_succeeded == {"unknown": 2}
+
+
+class _WorkSet:
+    def __init__(self, local):
+        self.local = local
+        self.done = False
+
+    def is_local(self):
+        return self.local
+
+    def do_transfers(self):
+        self.done = True
+
+    def excessive_failures(self):
+        return False
+
+
+@pytest.mark.parametrize("local", [True, False])
+def test_work_thread_slow_start(monkeypatch, local):
+    q = queue.Queue()
+    ts = _WorkSet(local)
+    q.put(ts)
+    sleeps = []
+    monkeypatch.setattr(
+        pegasus_transfer.time, "sleep", lambda secs: sleeps.append((secs, q.qsize()))
+    )
+
+    thread = pegasus_transfer.WorkThread(3, q, 0, queue.Queue())
+    thread.run()
+
+    assert thread.exception is None
+    assert ts.done
+    # remote sets are left in the queue while the thread sleeps
+    assert sleeps == ([] if local else [(6, 1)])
+
+
+def test_s3_handler(s3cfg, tmp_path, stats):
+    data = os.urandom(6 * 1024 * 1024)
+    (tmp_path / "big").write_bytes(data)
+    (tmp_path / "small").write_text("small")
+    handler = pegasus_transfer.S3Handler()
+
+    # put, creating the bucket
+    puts = [
+        _transfer(
+            "local",
+            "file://%s/%s" % (tmp_path, name),
+            "moto",
+            "s3://test@moto/bucket/dir/%s" % name,
+            name,
+        )
+        for name in ["big", "small"]
+    ]
+    successful_l, failed_l = handler.do_transfers(puts)
+    assert (successful_l, failed_l) == (puts, [])
+
+    # s3 -> s3
+    copies = [
+        _transfer(
+            "moto",
+            "s3://test@moto/bucket/dir/big",
+            "moto",
+            "s3://test@moto/copies/big",
+            "big",
+        )
+    ]
+    successful_l, failed_l = handler.do_transfers(copies)
+    assert (successful_l, failed_l) == (copies, [])
+
+    # get, and a missing key
+    gets = [
+        _transfer(
+            "moto",
+            "s3://test@moto/%s" % key,
+            "local",
+            "file://%s/out/%s" % (tmp_path, name),
+            name,
+        )
+        for key, name in [
+            ("copies/big", "big"),
+            ("bucket/dir/small", "small"),
+            ("bucket/dir/missing", "missing"),
+        ]
+    ]
+    successful_l, failed_l = handler.do_transfers(gets)
+    assert (successful_l, failed_l) == (gets[:2], gets[2:])
+    assert (tmp_path / "out" / "big").read_bytes() == data
+    assert (tmp_path / "out" / "small").read_text() == "small"
+
+    assert stats._total_count == 6
+    assert "".join(stats._yaml).count("success: True") == 5
+
+    # recursive remove
+    remove = pegasus_transfer.Remove()
+    remove.set_url("moto", "s3://test@moto/bucket/dir/")
+    remove.set_recursive(True)
+    successful_l, failed_l = handler.do_removes([remove])
+    assert (successful_l, failed_l) == ([remove], [])
+
+    successful_l, failed_l = handler.do_transfers([gets[1]])
+    assert (successful_l, failed_l) == ([], [gets[1]])
+
+
+def test_s3_handler_mkdirs(s3cfg):
+    mkdir = pegasus_transfer.Mkdir()
+    mkdir.set_url("moto", "s3://test@moto/new-bucket/some/dir")
+
+    successful_l, failed_l = pegasus_transfer.S3Handler().do_mkdirs([mkdir])
+
+    assert (successful_l, failed_l) == ([mkdir], [])
+
+
+def test_s3_handler_missing_credentials(monkeypatch, tmp_path, stats):
+    monkeypatch.delenv("S3CFG", raising=False)
+    monkeypatch.delenv("S3CFG_moto", raising=False)
+    (tmp_path / "f").write_text("f")
+    t = _transfer(
+        "local", "file://%s/f" % tmp_path, "moto", "s3://test@moto/bucket/f", "f"
+    )
+
+    successful_l, failed_l = pegasus_transfer.S3Handler().do_transfers([t])
+
+    assert (successful_l, failed_l) == ([], [t])
@@ -809,5 +809,31 @@ class TestGet:
         s3_client.delete_bucket(Bucket=BUCKET)
 
 
+@pytest.mark.parametrize(
+    "endpoint, expected",
+    [
+        ("https://s3.example.org", {}),
+        ("https://s3.example.com", {"https": "http://proxy.example.com:3128"}),
+        ("http://s3.example.com", {"https": "http://proxy.example.com:3128"}),
+    ],
+)
+def test_get_pooled_s3_client_proxies(monkeypatch, endpoint, expected):
+    monkeypatch.setattr(s3, "_clients", {})
+    monkeypatch.setenv("http_proxy", "http://proxy.example.com:3128")
+    monkeypatch.setenv("https_proxy", "http://proxy.example.com:3128")
+    monkeypatch.setenv("no_proxy", "s3.example.org")
+    config = ConfigParser()
+    config.read_dict(
+        {
+            "site": {"endpoint": endpoint},
+            "ident@site": {"access_key": "key", "secret_key": "secret"},
+        }
+    )
+
+    client = s3.get_pooled_s3_client(config, s3.parse_uri("s3://ident@site/bucket"))
+
+    assert client.meta.config.proxies == expected
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,260 @@
+import errno
+import hashlib
+import os
+
+import pytest
+
+from Pegasus.tools import worker_utils
+
+
+@pytest.fixture
+def src(tmp_path):
+    src = tmp_path / "src"
+    src.write_bytes(os.urandom(3 * 1024 * 1024 + 17))
+    src.chmod(0o640)
+    return src
+
+
+@pytest.mark.parametrize("size", [0, 1, 4096, 3 * 1024 * 1024 + 17])
+def test_copy_file(tmp_path, size):
+    src = tmp_path / "src"
+    src.write_bytes(os.urandom(size))
+    dst = tmp_path / "dst"
+
+    worker_utils.copy_file(str(src), str(dst))
+
+    assert dst.read_bytes() == src.read_bytes()
+
+
+def test_copy_file_mode(src, tmp_path):
+    dst = tmp_path / "dst"
+
+    worker_utils.copy_file(str(src), str(dst))
+
+    assert dst.stat().st_mode & 0o777 == 0o640 & ~_umask()
+
+
+def test_copy_file_overwrite(src, tmp_path):
+    dst = tmp_path / "dst"
+    dst.write_bytes(b"x" * (5 * 1024 * 1024))
+    dst.chmod(0o444)
+
+    worker_utils.copy_file(str(src), str(dst))
+
+    assert dst.read_bytes() == src.read_bytes()
+
+
+def test_copy_file_into_directory(src, tmp_path):
+    dst = tmp_path / "dir"
+    dst.mkdir()
+
+    worker_utils.copy_file(str(src), str(dst))
+
+    assert (dst / "src").read_bytes() == src.read_bytes()
+
+
+def test_copy_file_dereferences_symlink(src, tmp_path):
+    link = tmp_path / "link"
+    link.symlink_to(src)
+    dst = tmp_path / "dst"
+
+    worker_utils.copy_file(str(link), str(dst))
+
+    assert not dst.is_symlink()
+    assert dst.read_bytes() == src.read_bytes()
+
+
+@pytest.mark.parametrize(
+    "unsupported",
+    [[], ["copy_file_range"], ["copy_file_range", "sendfile"]],
+)
+def test_copy_file_fallbacks(src, tmp_path, monkeypatch, unsupported):
+    def raise_exdev(*args):
+        raise OSError(errno.EXDEV, os.strerror(errno.EXDEV))
+
+    monkeypatch.setattr(worker_utils, "_reflink", lambda src_fd, dst_fd: False)
+    for name in unsupported:
+        monkeypatch.setattr(os, name, raise_exdev, raising=False)
+    dst = tmp_path / "dst"
+
+    worker_utils.copy_file(str(src), str(dst))
+
+    assert dst.read_bytes() == src.read_bytes()
+
+
+@pytest.mark.parametrize("size", [0, 1, worker_utils.HASH_BUFSIZE + 1])
+def test_copy_file_sha256(tmp_path, size):
+    src = tmp_path / "src"
+    src.write_bytes(os.urandom(size))
+    dst = tmp_path / "dst"
+
+    sha256, timing = worker_utils.copy_file(str(src), str(dst), sha256=True)
+
+    assert dst.read_bytes() == src.read_bytes()
+    assert sha256 == hashlib.sha256(src.read_bytes()).hexdigest()
+    assert timing >= 0.0
+
+
+def test_copy_file_missing_src(tmp_path):
+    with pytest.raises(OSError):
+        worker_utils.copy_file(str(tmp_path / "missing"), str(tmp_path / "dst"))
+
+
+def test_copy_tree(src, tmp_path):
+    tree = tmp_path / "tree"
+    (tree / "a" / "b").mkdir(parents=True)
+    (tree / "a" / "b" / "f").write_text("f")
+    (tree / "g").write_text("g")
+    (tree / "link").symlink_to(src)
+
+    worker_utils.copy_tree(str(tree), str(tmp_path / "dst"))
+
+    assert (tmp_path / "dst" / "a" / "b" / "f").read_text() == "f"
+    assert (tmp_path / "dst" / "g").read_text() == "g"
+    assert not (tmp_path / "dst" / "link").is_symlink()
+    assert (tmp_path / "dst" / "link").read_bytes() == src.read_bytes()
+
+    # like cp -R, an existing destination directory gets a copy of the tree
+    worker_utils.copy_tree(str(tree), str(tmp_path / "dst"))
+
+    assert (tmp_path / "dst" / "tree" / "g").read_text() == "g"
+
+
+def test_symlink_file(src, tmp_path):
+    dst = tmp_path / "dst"
+    dst.write_text("old")
+
+    worker_utils.symlink_file(str(src), str(dst))
+
+    assert os.readlink(str(dst)) == str(src)
+
+
+@pytest.mark.parametrize("recursive", [False, True])
+def test_remove(tmp_path, recursive):
+    f = tmp_path / "f"
+    f.write_text("f")
+
+    worker_utils.remove(str(f), recursive)
+    worker_utils.remove(str(f), recursive)
+
+    assert not f.exists()
+
+
+def test_remove_directory(tmp_path):
+    d = tmp_path / "d"
+    (d / "e").mkdir(parents=True)
+    (d / "e" / "f").write_text("f")
+
+    with pytest.raises(OSError):
+        worker_utils.remove(str(d))
+
+    worker_utils.remove(str(d), recursive=True)
+
+    assert not d.exists()
+
+
+@pytest.mark.parametrize("size", [0, 1, worker_utils.HASH_BUFSIZE + 1])
+def test_sha256_file(tmp_path, size):
+    f = tmp_path / "f"
+    f.write_bytes(os.urandom(size))
+
+    assert (
+        worker_utils.sha256_file(str(f)) == hashlib.sha256(f.read_bytes()).hexdigest()
+    )
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = worker_utils.ChecksumCache(str(tmp_path / "cache" / "checksums.db"), 10)
+    yield cache
+    cache.close()
+
+
+@pytest.fixture
+def hashed(monkeypatch):
+    hashed = []
+
+    def sha256_file(path):
+        hashed.append(path)
+        return hashlib.sha256(open(path, "rb").read()).hexdigest()
+
+    monkeypatch.setattr(worker_utils, "sha256_file", sha256_file)
+    return hashed
+
+
+def _old_file(path, data):
+    path.write_bytes(data)
+    os.utime(str(path), (1000000000, 1000000000))
+    return str(path)
+
+
+def test_checksum_cache(tmp_path, cache, hashed):
+    f = _old_file(tmp_path / "f", b"f")
+
+    assert cache.sha256_file(f) == hashlib.sha256(b"f").hexdigest()
+    assert cache.sha256_file(f) == hashlib.sha256(b"f").hexdigest()
+    assert hashed == [f]
+    assert (tmp_path / "cache" / "checksums.db").stat().st_mode & 0o777 == 0o600
+
+    # shared with other processes
+    other = worker_utils.ChecksumCache(str(tmp_path / "cache" / "checksums.db"))
+    assert other.lookup(os.stat(f)) == hashlib.sha256(b"f").hexdigest()
+    other.close()
+
+
+@pytest.mark.parametrize("name", ["dir", "dir/checksums.db"])
+def test_checksum_cache_writable_by_others(tmp_path, name):
+    (tmp_path / "dir").mkdir(mode=0o700)
+    (tmp_path / "dir" / "checksums.db").touch(mode=0o600)
+    (tmp_path / name).chmod(0o620)
+
+    with pytest.raises(RuntimeError):
+        worker_utils.ChecksumCache(str(tmp_path / "dir" / "checksums.db"))
+
+
+@pytest.mark.skipif(os.getuid() != 0, reason="needs to chown")
+def test_checksum_cache_owned_by_others(tmp_path):
+    db = tmp_path / "checksums.db"
+    db.touch(mode=0o600)
+    os.chown(str(db), 12345, 12345)
+
+    with pytest.raises(RuntimeError):
+        worker_utils.ChecksumCache(str(db))
+
+
+def test_checksum_cache_changed_file(tmp_path, cache, hashed):
+    f = _old_file(tmp_path / "f", b"f")
+    cache.sha256_file(f)
+
+    # same size and mtime, but the ctime changes
+    _old_file(tmp_path / "f", b"g")
+
+    assert cache.sha256_file(f) == hashlib.sha256(b"g").hexdigest()
+    assert hashed == [f, f]
+
+
+def test_checksum_cache_recent_file(tmp_path, cache, hashed):
+    f = tmp_path / "f"
+    f.write_text("f")
+
+    cache.sha256_file(str(f))
+    cache.sha256_file(str(f))
+
+    assert hashed == [str(f), str(f)]
+
+
+def test_checksum_cache_eviction(tmp_path, cache):
+    files = [_old_file(tmp_path / str(i), b"%d" % i) for i in range(12)]
+    for f in files:
+        cache.sha256_file(f)
+
+    cached = [cache.lookup(os.stat(f)) is not None for f in files]
+
+    assert sum(cached) <= 10
+    assert cached[-1]
+
+
+def _umask():
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask